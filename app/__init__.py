@@ -1,3 +1,6 @@
+from . import arranque  # primero: marca el inicio de la importación
+import os
+import time
 from flask import Flask
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager
@@ -5,29 +8,75 @@ from .models.user import db
 from .routes.auth_routes import auth_bp
 from .routes.constancy_routes import constancy_bp
 from .routes.carnet_routes import carnet_bp  # Importar el nuevo blueprint
-import os
+from .routes.metrics_routes import metricas_bp
+from .routes.estudiantes_routes import estudiantes_bp
+from .services.metrics import init_metricas
+from .services.card_generator.encoding import configurar_salida
+from .services.card_generator.photo_store import CARPETA_FOTOS
+from .commands import register_commands
+from .services.pdf_generator.render_cache import RenderCache
+from .services.auth.profile_cache import init_perfiles
+from .services.card_generator.imagenes_carnet import init_imagenes
+from .services.card_generator.verificacion import init_vigencia
+from .services.directorio import init_directorio
+from .config import obtener_config
+from .database import opciones_engines, configurar_sqlite, migrar_carnets, asegurar_columnas, asegurar_indices
 
-def create_app():
+def create_app(config_name=None):
+    inicio = time.perf_counter()
     app = Flask(__name__)
     
-    # Calcular ruta base a partir del directorio actual donde está __init__.py
-    basedir = os.path.abspath(os.path.dirname(__file__))
-    # Construir la ruta absoluta al archivo SQLite; asume que el archivo está en el directorio raíz del proyecto
-    db_path = os.path.join(basedir, '..', 'Base de datos UNEXCA.db')
-    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + db_path
-    
-    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-    app.config['JWT_SECRET_KEY'] = '7481592630'
+    # Configuración según el entorno (APP_ENV: development, production o testing)
+    app.config.from_object(obtener_config(config_name))
+    app.config.update(opciones_engines(app.config))
     
     CORS(app)
     db.init_app(app)
+    configurar_sqlite(app)
+    migrar_carnets(app)
+    asegurar_columnas(app)
+    asegurar_indices(app)
     JWTManager(app)
     
+    app.extensions['constancy_cache'] = RenderCache(
+        max_entradas=app.config['CONSTANCY_CACHE_ENTRIES'],
+        directorio=app.config['CONSTANCY_CACHE_DIR']
+    )
+    init_perfiles(app)
+    init_imagenes(app)
+    init_vigencia(app)
+    init_directorio(app)
+    
     app.register_blueprint(auth_bp, url_prefix='/api/auth')
     app.register_blueprint(constancy_bp, url_prefix='/api/constancy')
     app.register_blueprint(carnet_bp, url_prefix='/api/carnet')
+    app.register_blueprint(metricas_bp, url_prefix='/api/metricas')
+    app.register_blueprint(estudiantes_bp, url_prefix='/api/estudiantes')
+    
+    if app.config['ASYNC_RENDER']:
+        from .services.jobs.render_jobs import init_jobs
+        from .routes.jobs_routes import jobs_bp
+        init_jobs(app)
+        app.register_blueprint(jobs_bp, url_prefix='/api/jobs')
+    
+    register_commands(app)
+    
+    init_metricas(app)
+    
+    configurar_salida(app.config)
+    # Carpeta de subidas (relativa al directorio de trabajo)
+    os.makedirs(CARPETA_FOTOS, exist_ok=True)
+    
+    # Generadores, plantilla, fuentes y reverso: en la primera solicitud que los use,
+    # o aquí si se pide precargarlos (gunicorn con preload_app, ver gunicorn.conf.py)
+    segundos_precarga = None
+    if app.config['PRECARGAR_RENDER']:
+        inicio_precarga = time.perf_counter()
+        arranque.precargar_render()
+        segundos_precarga = time.perf_counter() - inicio_precarga
+    arranque.registrar_arranque(app, inicio, segundos_precarga)
     
     return app
 
 
-app = create_app()
+arranque.importacion_terminada()
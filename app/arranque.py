@@ -0,0 +1,70 @@
+# arranque.py
+"""
+Tiempos de arranque de la aplicación y precarga opcional de los generadores.
+
+Las rutas importan los generadores de PDF e imágenes (reportlab, qrcode, babel,
+dateutil) en su primera solicitud, así que un proceso nuevo arranca sin ellos.
+Con PRECARGAR_RENDER=1 se importan y se cargan sus recursos dentro de create_app;
+es lo que hace gunicorn.conf.py con preload_app: el máster los carga una sola vez
+y los workers los heredan al hacer fork (páginas compartidas copy-on-write).
+"""
+import importlib
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+# Este módulo es lo primero que importa el paquete app
+INICIO_IMPORTACION = time.perf_counter()
+_segundos_importacion = None
+
+# Módulos que las rutas importan en la primera solicitud que los usa
+MODULOS_RENDER = (
+    '.services.card_generator.carnet_service',
+    '.services.card_generator.carnet_pdf',
+    '.services.card_generator.carnet_vectorial',
+    '.services.card_generator.imposicion',
+    '.services.pdf_generator.constancy_generator',
+    '.services.pdf_generator.constancy_batch',
+)
+
+
+def importacion_terminada():
+    """Se llama al final de app/__init__.py."""
+    global _segundos_importacion
+    _segundos_importacion = time.perf_counter() - INICIO_IMPORTACION
+
+
+def precargar_render():
+    """Importa los generadores y carga sus recursos (plantillas, fuentes, reverso)."""
+    for modulo in MODULOS_RENDER:
+        importlib.import_module(modulo, __package__)
+
+    from .services.card_generator.assets import precargar_assets
+    from .services.card_generator.carnet_pdf import obtener_reverso
+    from .services.card_generator.carnet_vectorial import obtener_generador_vectorial
+    from .services.pdf_generator.constancy_generator import obtener_generador_constancias
+
+    precargar_assets()
+    obtener_reverso()
+    try:
+        obtener_generador_vectorial()
+        obtener_generador_constancias()
+    except FileNotFoundError as e:
+        # Igual que precargar_assets: el error se reporta al generar
+        print(f"No se pudieron precargar los generadores: {str(e)}")
+
+
+def registrar_arranque(app, inicio, segundos_precarga=None):
+    """Guarda en app.extensions['arranque'] los tiempos del arranque (se ven en /api/metricas)."""
+    arranque = {
+        'pid': os.getpid(),
+        'importacion_s': round(_segundos_importacion, 4) if _segundos_importacion is not None else None,
+        'create_app_s': round(time.perf_counter() - inicio, 4),
+        'precarga_render_s': round(segundos_precarga, 4) if segundos_precarga is not None else None,
+    }
+    app.extensions['arranque'] = arranque
+    logger.info("Aplicación lista: importación %ss, create_app %ss, precarga %ss",
+                arranque['importacion_s'], arranque['create_app_s'], arranque['precarga_render_s'])
+    return arranque
@@ -0,0 +1,9 @@
+from .carnet_commands import carnet_cli
+from .database_commands import basedatos_cli
+from .estudiantes_commands import estudiantes_cli
+
+def register_commands(app):
+    """Registra los comandos de la CLI de Flask (flask --app run <grupo> <comando>)."""
+    app.cli.add_command(carnet_cli)
+    app.cli.add_command(basedatos_cli)
+    app.cli.add_command(estudiantes_cli)
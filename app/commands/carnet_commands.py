@@ -0,0 +1,94 @@
+# commands/carnet_commands.py
+import click
+from flask.cli import AppGroup
+from ..services.card_generator.batch_service import generar_lote, CARPETA_FOTOS, TAMANO_LOTE
+from ..services.card_generator.photo_store import AlmacenFotos, recolectar
+
+carnet_cli = AppGroup('carnet', help='Comandos para la gestión de carnets estudiantiles.')
+
+@carnet_cli.command('generar-lote')
+@click.option('--cedula', 'cedulas', multiple=True, help='Cédula a procesar (se puede repetir).')
+@click.option('--archivo-cedulas', type=click.File('r'), help='Archivo con una cédula por línea.')
+@click.option('--carrera', help='Filtrar por carrera.')
+@click.option('--seccion', help='Filtrar por sección.')
+@click.option('--periodo', help='Filtrar por periodo.')
+@click.option('--nucleo', help='Filtrar por núcleo.')
+@click.option('--fotos-zip', type=click.Path(exists=True, dir_okay=False), help='Zip con las fotos (nombre = cédula).')
+@click.option('--carpeta-fotos', default=CARPETA_FOTOS, show_default=True)
+@click.option('--workers', type=int, help='Procesos de render (por defecto, uno por CPU).')
+@click.option('--tamano-lote', type=int, default=TAMANO_LOTE, show_default=True, help='Carnets por transacción.')
+def generar_lote_cmd(cedulas, archivo_cedulas, carrera, seccion, periodo, nucleo,
+                     fotos_zip, carpeta_fotos, workers, tamano_lote):
+    """Genera carnets de forma masiva por cédulas o por filtro."""
+    cedulas = list(cedulas)
+    if archivo_cedulas:
+        cedulas.extend(linea.strip() for linea in archivo_cedulas if linea.strip())
+
+    filtros = {'carrera': carrera, 'seccion': seccion, 'periodo': periodo, 'nucleo': nucleo}
+    try:
+        reporte = generar_lote(
+            cedulas=cedulas,
+            filtros=filtros,
+            fotos_zip=fotos_zip,
+            carpeta_fotos=carpeta_fotos,
+            workers=workers,
+            tamano_lote=tamano_lote
+        )
+    except ValueError as e:
+        raise click.UsageError(str(e))
+
+    click.echo(
+        f"Generados {reporte['generados']} de {reporte['solicitados']} carnets en "
+        f"{reporte['segundos']} s ({reporte['carnets_por_segundo']} carnets/s, {reporte['workers']} procesos); "
+        f"{reporte['reutilizados']} sin cambios"
+    )
+    for fallo in reporte['fallidos']:
+        click.echo(f"  ERROR {fallo['cedula']}: {fallo['error']}", err=True)
+
+
+@carnet_cli.command('limpiar')
+@click.option('--carpeta-fotos', default=CARPETA_FOTOS, show_default=True)
+@click.option('--presupuesto-mb', type=float, help='Espacio máximo de fotos y carnets; por encima se borran las fotos de carnets anteriores.')
+@click.option('--gracia', type=int, default=3600, show_default=True, help='Segundos que se respeta un archivo recién escrito.')
+@click.option('--simular', is_flag=True, help='Solo informa lo que se borraría.')
+def limpiar_cmd(carpeta_fotos, presupuesto_mb, gracia, simular):
+    """Borra fotos huérfanas y carnets reemplazados (pensado para ejecutarse desde cron)."""
+    from ..services.card_generator.carnet_service import obtener_generador
+
+    presupuesto = int(presupuesto_mb * 1024 * 1024) if presupuesto_mb is not None else None
+    reporte = recolectar(AlmacenFotos(carpeta_fotos), obtener_generador().carnets_dir,
+                         presupuesto=presupuesto, gracia=gracia, simular=simular)
+
+    borrados = {k: v for k, v in reporte.items() if k not in ('bytes_liberados', 'bytes_totales', 'simulado')}
+    click.echo(
+        f"{'Se borrarían' if simular else 'Borrados'} {sum(borrados.values())} archivos "
+        f"({reporte.get('bytes_liberados', 0) / 1024 / 1024:.1f} MB); "
+        f"quedan {reporte['bytes_totales'] / 1024 / 1024:.1f} MB"
+    )
+    for motivo, cantidad in sorted(borrados.items()):
+        click.echo(f"  {motivo}: {cantidad}")
+
+
+@carnet_cli.command('reporte-vencimientos')
+@click.option('--dias', type=int, default=30, show_default=True, help='Días de la ventana "por vencer".')
+@click.option('--estado', help='Estados separados por coma: vigente, por_vencer, vencido, sin_carnet.')
+@click.option('--carrera', help='Filtrar por carrera.')
+@click.option('--seccion', help='Filtrar por sección.')
+@click.option('--periodo', help='Filtrar por periodo.')
+@click.option('--nucleo', help='Filtrar por núcleo.')
+@click.option('--resumen', is_flag=True, help='Conteos por núcleo/carrera/sección en lugar del detalle.')
+@click.option('--formato', type=click.Choice(['csv', 'ndjson']), default='csv', show_default=True)
+@click.option('--salida', type=click.File('w', encoding='utf-8'), default='-', help='Archivo de salida (por defecto, la consola).')
+def reporte_vencimientos_cmd(dias, estado, carrera, seccion, periodo, nucleo, resumen, formato, salida):
+    """Reporte de carnets vencidos o por vencer de todos los estudiantes."""
+    from ..database import engine_lectura
+    from ..services.card_generator.vencimientos import stream_reporte, leer_estados
+
+    try:
+        estados = leer_estados(estado)
+    except ValueError as e:
+        raise click.UsageError(str(e))
+    filtros = {'carrera': carrera, 'seccion': seccion, 'periodo': periodo, 'nucleo': nucleo}
+    for texto in stream_reporte(engine_lectura(), formato, filtros=filtros, estados=estados,
+                                dias=dias, resumen=resumen):
+        salida.write(texto)
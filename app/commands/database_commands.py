@@ -0,0 +1,38 @@
+# commands/database_commands.py
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from ..database import migrar_carnets, asegurar_indices, explicar_consultas
+
+basedatos_cli = AppGroup('basedatos', help='Mantenimiento y diagnóstico de la base de datos.')
+
+@basedatos_cli.command('indices')
+def indices_cmd():
+    """Crea los índices de las consultas de las rutas si no existen."""
+    creados = asegurar_indices(current_app)
+    click.echo(f"Índices creados: {', '.join(creados)}" if creados else "Todos los índices ya existen")
+
+@basedatos_cli.command('migrar')
+def migrar_cmd():
+    """Quita la restricción UNIQUE de carnets.cedula (también se hace al arrancar)."""
+    if migrar_carnets(current_app):
+        asegurar_indices(current_app)
+        click.echo("Tabla carnets migrada")
+    else:
+        click.echo("La tabla carnets no necesita migración")
+
+@basedatos_cli.command('explicar')
+@click.option('--cedula', default='0', help='Cédula de ejemplo para las consultas.')
+@click.option('--sql', 'mostrar_sql', is_flag=True, help='Mostrar también el SQL de cada consulta.')
+def explicar_cmd(cedula, mostrar_sql):
+    """Muestra el plan (EXPLAIN QUERY PLAN) de cada consulta y marca los recorridos completos."""
+    completas = 0
+    for nombre, sql, plan, completa in explicar_consultas(cedula):
+        marca = 'RECORRIDO COMPLETO' if completa else 'ok'
+        completas += completa
+        click.echo(f"[{marca}] {nombre}")
+        if mostrar_sql:
+            click.echo('    ' + ' '.join(sql.split()))
+        for linea in plan:
+            click.echo(f"    {linea}")
+    click.echo(f"{completas} consulta(s) recorren una tabla completa")
@@ -0,0 +1,46 @@
+# commands/estudiantes_commands.py
+import click
+from flask.cli import AppGroup
+from ..services.importacion import importar_estudiantes, abrir_texto, ImportacionInvalida
+
+estudiantes_cli = AppGroup('estudiantes', help='Comandos para la nómina de estudiantes.')
+
+@estudiantes_cli.command('importar')
+@click.argument('archivo', type=click.File('rb'))
+@click.option('--periodo', help='Periodo de las filas que no lo traen.')
+@click.option('--crear-usuarios', is_flag=True, help='Crea el usuario de las cédulas que no lo tienen (contraseña inicial: la del archivo o una generada al azar).')
+@click.option('--contrasenas', type=click.File('w'), help='CSV donde escribir las contraseñas generadas (si no, se muestran).')
+@click.option('--simular', is_flag=True, help='Solo informa las diferencias, sin guardar.')
+@click.option('--codificacion', default='utf-8-sig', show_default=True)
+def importar_cmd(archivo, periodo, crear_usuarios, contrasenas, simular, codificacion):
+    """Importa la nómina desde un CSV (cedula, apellido, nombre, carrera, seccion, turno, periodo, nucleo[, rol])."""
+    try:
+        reporte = importar_estudiantes(abrir_texto(archivo, codificacion), periodo=periodo,
+                                       crear_usuarios=crear_usuarios, simular=simular)
+    except ImportacionInvalida as e:
+        raise click.UsageError(str(e))
+
+    click.echo(
+        f"{'Simulación: ' if simular else ''}{reporte['filas_leidas']} filas en {reporte['segundos']} s "
+        f"({reporte['filas_por_segundo']} filas/s; escritura {reporte['segundos_escritura']} s"
+        f"{', índices diferidos' if reporte['indices_diferidos'] else ''})"
+    )
+    click.echo(f"  nuevos: {reporte['nuevos']}  modificados: {reporte['modificados']}  "
+               f"sin cambios: {reporte['sin_cambios']}")
+    click.echo(f"  usuarios nuevos: {reporte['usuarios_nuevos']}  roles modificados: {reporte['roles_modificados']}")
+    if reporte['contrasenas_generadas']:
+        # Se muestran una sola vez: no quedan guardadas en ningún otro lado
+        destino = contrasenas or click.get_text_stream('stdout')
+        if contrasenas is None:
+            click.echo(f"  {len(reporte['contrasenas_generadas'])} contraseña(s) generadas (anótelas ahora):")
+        destino.write('cedula,contrasena\n')
+        for generada in reporte['contrasenas_generadas']:
+            destino.write(f"{generada['cedula']},{generada['contrasena']}\n")
+        if contrasenas is not None:
+            click.echo(f"  {len(reporte['contrasenas_generadas'])} contraseña(s) generadas en {contrasenas.name}")
+    if reporte['repetidas']:
+        click.echo(f"  {reporte['repetidas']} cédula(s) repetidas en el archivo (vale la última fila)")
+    if reporte['invalidas']:
+        click.echo(f"  {reporte['invalidas']} fila(s) inválidas:", err=True)
+        for error in reporte['errores']:
+            click.echo(f"    línea {error['linea']}: {error['error']}", err=True)
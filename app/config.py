@@ -0,0 +1,128 @@
+# config.py
+import os
+
+basedir = os.path.abspath(os.path.dirname(__file__))
+
+
+def _entero(nombre, defecto):
+    return int(os.environ.get(nombre, defecto))
+
+
+class Config:
+    """Configuración común a todos los entornos."""
+    # Ruta absoluta al archivo SQLite; el archivo está en el directorio raíz del proyecto
+    DB_PATH = os.environ.get('DB_PATH', os.path.join(basedir, '..', 'Base de datos UNEXCA.db'))
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+    JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY', '7481592630')
+
+    # PRAGMAs aplicados a cada conexión SQLite.
+    # WAL permite lecturas concurrentes mientras otro proceso escribe.
+    SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',
+        'busy_timeout': _entero('SQLITE_BUSY_TIMEOUT', 5000),  # ms esperando el bloqueo
+        'synchronous': 'NORMAL',                               # seguro en modo WAL
+        'mmap_size': _entero('SQLITE_MMAP_SIZE', 64 * 1024 * 1024),
+        'cache_size': _entero('SQLITE_CACHE_SIZE', -16000),    # negativo = KiB
+        'temp_store': 'MEMORY',
+    }
+    # Conexiones por proceso del engine de escritura (ORM) y del de solo lectura
+    SQLITE_WRITE_POOL_SIZE = _entero('SQLITE_WRITE_POOL_SIZE', 2)
+    SQLITE_READ_POOL_SIZE = _entero('SQLITE_READ_POOL_SIZE', 4)
+    SQLITE_MAX_OVERFLOW = _entero('SQLITE_MAX_OVERFLOW', 4)
+    SQLITE_POOL_TIMEOUT = _entero('SQLITE_POOL_TIMEOUT', 30)
+
+    # Modo asíncrono (opcional) para la generación de carnets y constancias
+    ASYNC_RENDER = os.environ.get('ASYNC_RENDER', '0') == '1'
+    JOB_STORE = os.environ.get('JOB_STORE', 'sqlite')  # 'sqlite' o 'memoria'
+    JOB_WORKERS = _entero('JOB_WORKERS', 2)
+    JOB_DB_PATH = os.path.join(basedir, '..', 'trabajos.db')
+    # Segundos en proceso tras los que un trabajo se da por abandonado y se reintenta,
+    # hasta JOB_MAX_INTENTOS veces (services/jobs/job_queue.py)
+    JOB_PLAZO = _entero('JOB_PLAZO', 3600)
+    JOB_MAX_INTENTOS = _entero('JOB_MAX_INTENTOS', 3)
+
+    # Caché de constancias: LRU en memoria y, si se indica una carpeta, también en disco
+    CONSTANCY_CACHE_ENTRIES = _entero('CONSTANCY_CACHE_ENTRIES', 256)
+    CONSTANCY_CACHE_DIR = os.environ.get('CONSTANCY_CACHE_DIR')
+
+    # Caché de perfiles de /api/auth/perfil (segundos de vida por cédula)
+    PERFIL_CACHE_TTL = _entero('PERFIL_CACHE_TTL', 60)
+    PERFIL_CACHE_ENTRIES = _entero('PERFIL_CACHE_ENTRIES', 4096)
+
+    # Directorio de estudiantes en memoria (services/directorio.py): segundos entre
+    # revisiones de cambios en la base y entre recargas completas
+    DIRECTORIO_ESTUDIANTES = os.environ.get('DIRECTORIO_ESTUDIANTES', '1') == '1'
+    DIRECTORIO_REVISION = _entero('DIRECTORIO_REVISION', 5)
+    DIRECTORIO_RECARGA = _entero('DIRECTORIO_RECARGA', 900)
+
+    # Imagen de los carnets: png, png-rgb, paleta, webp o webp-lossy
+    # (ver services/card_generator/encoding.py y benchmarks/bench_codificacion_carnet.py)
+    CARNET_FORMATO = os.environ.get('CARNET_FORMATO', 'png')
+    CARNET_PNG_NIVEL = _entero('CARNET_PNG_NIVEL', 6)
+    CARNET_WEBP_CALIDAD = _entero('CARNET_WEBP_CALIDAD', 90)
+    CARNET_MINIATURA_ANCHO = _entero('CARNET_MINIATURA_ANCHO', 160)  # 0 = sin miniatura
+
+    # PDF de /descargar-pdf: 'raster' (imagen guardada) o 'vectorial' (dibujado en ReportLab;
+    # si los datos o la foto ya no son los del carnet emitido, se usa la imagen guardada)
+    CARNET_PDF_MODO = os.environ.get('CARNET_PDF_MODO', 'raster')
+
+    # Codificar en ASCII85 las imágenes y el contenido de todos los PDF (lo predeterminado
+    # de ReportLab); en binario son más rápidos de generar (services/pdf_generator/__init__.py)
+    PDF_ASCII85 = os.environ.get('PDF_ASCII85', '0') == '1'
+
+    # /api/carnet/imagen: rutas resueltas en memoria, segundos de caché en el navegador
+    # (0 = revalidar siempre con ETag) y entrega opcional por el proxy:
+    # 'x-accel' (nginx, location interna CARNET_SENDFILE_PREFIJO -> CARNET_SENDFILE_RAIZ) o 'x-sendfile'
+    CARNET_IMAGEN_RUTAS = _entero('CARNET_IMAGEN_RUTAS', 8192)
+    CARNET_IMAGEN_MAX_AGE = _entero('CARNET_IMAGEN_MAX_AGE', 0)
+    CARNET_SENDFILE = os.environ.get('CARNET_SENDFILE', '')
+    CARNET_SENDFILE_RAIZ = os.environ.get('CARNET_SENDFILE_RAIZ', os.path.join(basedir, 'assets', 'carnets'))
+    CARNET_SENDFILE_PREFIJO = os.environ.get('CARNET_SENDFILE_PREFIJO', '/_carnets/')
+
+    # Importar y cargar los generadores de PDF e imágenes dentro de create_app en lugar
+    # de en la primera solicitud (gunicorn.conf.py lo activa junto con preload_app)
+    PRECARGAR_RENDER = os.environ.get('PRECARGAR_RENDER', '0') == '1'
+
+    # QR firmado del carnet y verificación en la entrada (services/card_generator/verificacion.py):
+    # clave del HMAC y segundos entre puestas al día / recargas completas del índice en memoria
+    CARNET_QR_CLAVE = os.environ.get('CARNET_QR_CLAVE', JWT_SECRET_KEY)
+    CARNET_VIGENCIA_REVISION = _entero('CARNET_VIGENCIA_REVISION', 30)
+    CARNET_VIGENCIA_RECARGA = _entero('CARNET_VIGENCIA_RECARGA', 600)
+
+    # Log de cada medición de las métricas por etapa (/api/metricas, solo administradores)
+    RENDER_DEBUG_LOG = os.environ.get('RENDER_DEBUG_LOG', '0') == '1'
+    # Carpeta donde cada worker publica sus métricas para sumarlas entre todos
+    # (gunicorn.conf.py la define); sin carpeta, /api/metricas es del worker que responde
+    METRICAS_DIR = os.environ.get('METRICAS_DIR')
+
+
+class DevelopmentConfig(Config):
+    DEBUG = True
+
+
+class ProductionConfig(Config):
+    SQLITE_PRAGMAS = dict(
+        Config.SQLITE_PRAGMAS,
+        mmap_size=_entero('SQLITE_MMAP_SIZE', 256 * 1024 * 1024),
+        cache_size=_entero('SQLITE_CACHE_SIZE', -64000),
+    )
+    SQLITE_READ_POOL_SIZE = _entero('SQLITE_READ_POOL_SIZE', 8)
+
+
+class TestingConfig(Config):
+    TESTING = True
+    SQLITE_PRAGMAS = dict(Config.SQLITE_PRAGMAS, synchronous='OFF')
+    PERFIL_CACHE_TTL = 0
+
+
+config_por_entorno = {
+    'development': DevelopmentConfig,
+    'production': ProductionConfig,
+    'testing': TestingConfig,
+}
+
+
+def obtener_config(nombre=None):
+    """Clase de configuración del entorno indicado (o de APP_ENV; por defecto, producción)."""
+    nombre = nombre or os.environ.get('APP_ENV', 'production')
+    return config_por_entorno.get(nombre, ProductionConfig)
@@ -0,0 +1,286 @@
+# database.py
+import re
+import sqlite3
+from datetime import date, timedelta
+from sqlalchemy import event, pool, text
+from .models.user import db
+
+# Nombre del bind de solo lectura (mismo archivo SQLite, otro pool de conexiones)
+BIND_LECTURA = 'lectura'
+
+
+def opciones_engines(config):
+    """
+    Opciones de los dos engines sobre el mismo archivo SQLite:
+    el principal (ORM, escrituras) y uno de solo lectura para las consultas directas.
+    """
+    uri = 'sqlite:///' + config['DB_PATH']
+    comunes = {
+        'poolclass': pool.QueuePool,
+        'pool_timeout': config['SQLITE_POOL_TIMEOUT'],
+        'max_overflow': config['SQLITE_MAX_OVERFLOW'],
+        # Los hilos de la cola de trabajos comparten el pool del proceso
+        'connect_args': {'check_same_thread': False, 'timeout': config['SQLITE_PRAGMAS']['busy_timeout'] / 1000},
+    }
+    return {
+        'SQLALCHEMY_DATABASE_URI': uri,
+        'SQLALCHEMY_ENGINE_OPTIONS': dict(comunes, pool_size=config['SQLITE_WRITE_POOL_SIZE']),
+        'SQLALCHEMY_BINDS': {
+            BIND_LECTURA: dict(comunes, url=uri, pool_size=config['SQLITE_READ_POOL_SIZE']),
+        },
+    }
+
+
+def aplicar_pragmas(conexion, pragmas, solo_lectura=False):
+    """Aplica los PRAGMAs de rendimiento a una conexión sqlite3."""
+    cursor = conexion.cursor()
+    for nombre, valor in pragmas.items():
+        cursor.execute(f"PRAGMA {nombre} = {valor}")
+    if solo_lectura:
+        cursor.execute("PRAGMA query_only = 1")
+    cursor.close()
+
+
+def configurar_sqlite(app):
+    """
+    Registra los PRAGMAs en cada conexión nueva de los engines de la aplicación.
+    Se llama después de db.init_app(app).
+    """
+    pragmas = app.config['SQLITE_PRAGMAS']
+    with app.app_context():
+        for bind, engine in db.engines.items():
+            solo_lectura = bind == BIND_LECTURA
+
+            @event.listens_for(engine, 'connect')
+            def _al_conectar(conexion, registro, solo_lectura=solo_lectura):
+                aplicar_pragmas(conexion, pragmas, solo_lectura)
+
+
+def descartar_conexiones(app):
+    """
+    Suelta las conexiones del pool sin cerrarlas. Se llama en cada worker de gunicorn
+    después del fork (preload_app): las conexiones SQLite que abrió el máster al
+    arrancar no deben usarse desde dos procesos, así que cada worker abre las suyas.
+    """
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+
+
+def engine_lectura():
+    """Engine de solo lectura para consultas directas (perfil, reportes, listados)."""
+    return db.engines[BIND_LECTURA]
+
+
+# Índices de los accesos que hacen las rutas. Se crean al arrancar si no existen
+# (la tabla ESTUDIANTES se carga desde fuera de la aplicación y no trae ninguno;
+# usuarios.cedula ya tiene el índice de su restricción UNIQUE).
+INDICES = (
+    ('ix_carnets_cedula_fecha', 'carnets', '(cedula, fecha_emision)'),
+    # Listado de carnets paginado por (fecha_emision, id) (services/card_generator/listado.py)
+    ('ix_carnets_fecha', 'carnets', '(fecha_emision, id)'),
+    ('ix_estudiantes_cedula', 'ESTUDIANTES', '(cedula)'),
+    # Mismas expresiones que filtrar_estudiantes(); sirve a los lotes por núcleo[/carrera[/sección]]
+    ('ix_estudiantes_filtros', 'ESTUDIANTES', '(lower(trim(nucleo)), lower(trim(carrera)), lower(trim(seccion)))'),
+)
+
+
+# Columnas agregadas después de crear las tablas: (tabla, columna, tipo).
+# db.create_all() no modifica tablas existentes, así que se agregan con ALTER TABLE.
+COLUMNAS = (
+    ('carnets', 'huella', 'VARCHAR(64)'),  # huella de los datos del render (services/card_generator/huella.py)
+    ('carnets', 'foto_hash', 'VARCHAR(64)'),  # foto en el almacén (services/card_generator/photo_store.py)
+)
+
+
+# Tabla carnets sin la restricción UNIQUE de la base original (cedula TEXT UNIQUE NOT NULL):
+# cada emisión es un registro nuevo y el último por fecha_emision es el vigente
+CARNETS = (
+    'CREATE TABLE "{nombre}" (id INTEGER PRIMARY KEY, cedula TEXT NOT NULL, fecha_emision NUMERIC, '
+    'fecha_vencimiento NUMERIC, ruta_imagen TEXT, huella VARCHAR(64), foto_hash VARCHAR(64))'
+)
+
+
+def _cedula_unica(conexion):
+    """True si carnets tiene una restricción UNIQUE solo sobre cedula."""
+    for fila in conexion.execute('PRAGMA index_list("carnets")'):
+        nombre, unico, origen = fila[1], fila[2], fila[3]
+        if unico and origen == 'u':
+            columnas = [col[2] for col in conexion.execute(f'PRAGMA index_info("{nombre}")')]
+            if columnas == ['cedula']:
+                return True
+    return False
+
+
+def migrar_tabla_carnets(conexion):
+    """
+    Reconstruye carnets sin UNIQUE(cedula) si la base la trae: copia los registros a
+    una tabla nueva con el esquema de CARNETS y la renombra, en una sola transacción.
+    conexion: sqlite3 sin transacción abierta. Devuelve True si se migró la tabla.
+    """
+    if not _cedula_unica(conexion):
+        return False
+    # Se vuelve a comprobar con el bloqueo tomado (otro proceso pudo migrarla)
+    conexion.execute('BEGIN IMMEDIATE')
+    try:
+        if not _cedula_unica(conexion):
+            conexion.execute('ROLLBACK')
+            return False
+        anteriores = {fila[1] for fila in conexion.execute('PRAGMA table_info("carnets")')}
+        conexion.execute('DROP TABLE IF EXISTS carnets_migracion')
+        conexion.execute(CARNETS.format(nombre='carnets_migracion'))
+        nuevas = [fila[1] for fila in conexion.execute('PRAGMA table_info("carnets_migracion")')]
+        columnas = ', '.join(columna for columna in nuevas if columna in anteriores)
+        conexion.execute(f'INSERT INTO carnets_migracion ({columnas}) SELECT {columnas} FROM carnets')
+        conexion.execute('DROP TABLE carnets')
+        conexion.execute('ALTER TABLE carnets_migracion RENAME TO carnets')
+        conexion.execute('COMMIT')
+    except Exception:
+        conexion.execute('ROLLBACK')
+        raise
+    return True
+
+
+def migrar_carnets(app):
+    """
+    Migración de carnets (migrar_tabla_carnets) sobre la base de la aplicación.
+    Los índices de INDICES se recrean después con asegurar_indices().
+    """
+    conexion = sqlite3.connect(app.config['DB_PATH'], isolation_level=None,
+                               timeout=app.config['SQLITE_PRAGMAS']['busy_timeout'] / 1000)
+    try:
+        return migrar_tabla_carnets(conexion)
+    except Exception as e:
+        # No se impide el arranque (p. ej. base de datos de solo lectura)
+        print(f"No se pudo migrar la tabla carnets: {str(e)}")
+        return False
+    finally:
+        conexion.close()
+
+
+def asegurar_columnas(app):
+    """Agrega las columnas que falten. Devuelve la lista de columnas agregadas (tabla.columna)."""
+    agregadas = []
+    with app.app_context():
+        try:
+            with db.engine.begin() as conn:
+                for tabla, columna, tipo in COLUMNAS:
+                    existentes = {fila[1].lower() for fila in conn.execute(text(f'PRAGMA table_info("{tabla}")'))}
+                    if not existentes or columna.lower() in existentes:
+                        continue
+                    conn.execute(text(f'ALTER TABLE "{tabla}" ADD COLUMN {columna} {tipo}'))
+                    agregadas.append(f'{tabla}.{columna}')
+        except Exception as e:
+            # No se impide el arranque (p. ej. base de datos de solo lectura)
+            print(f"No se pudieron agregar las columnas: {str(e)}")
+    return agregadas
+
+
+def asegurar_indices(app):
+    """Crea los índices que falten. Devuelve la lista de índices creados."""
+    creados = []
+    with app.app_context():
+        try:
+            with db.engine.begin() as conn:
+                existentes = {
+                    fila[0] for fila in conn.execute(text("SELECT name FROM sqlite_master WHERE type = 'index'"))
+                }
+                tablas = {
+                    fila[0] for fila in conn.execute(text("SELECT name FROM sqlite_master WHERE type = 'table'"))
+                }
+                for nombre, tabla, columnas in INDICES:
+                    if nombre in existentes or tabla not in tablas:
+                        continue
+                    conn.execute(text(f'CREATE INDEX IF NOT EXISTS {nombre} ON "{tabla}" {columnas}'))
+                    creados.append(nombre)
+        except Exception as e:
+            # No se impide el arranque (p. ej. base de datos de solo lectura)
+            print(f"No se pudieron crear los índices: {str(e)}")
+    return creados
+
+
+def consultas_rutas(cedula='0'):
+    """
+    Consultas que emiten las rutas, tal como las arma el ORM o el servicio que
+    las ejecuta. Las de texto van con sus parámetros (sql, parametros).
+    Se usan para revisar su plan de ejecución.
+    """
+    from flask import current_app
+    from .models.carnet import Carnet
+    from .models.student import Student, filtrar_estudiantes
+    from .models.user import User
+    from .services.card_generator.listado import CAMPOS_DEFECTO, codificar_cursor, consulta_listado
+    from .services.card_generator.vencimientos import consulta_detalle
+
+    ultimo_carnet = Carnet.query.filter_by(cedula=cedula).order_by(Carnet.fecha_emision.desc())
+    filtros = {'nucleo': 'altagracia', 'carrera': 'informatica'}
+    hoy = date.today()
+    fechas_reporte = {'hoy': hoy.isoformat(), 'limite': (hoy + timedelta(days=30)).isoformat()}
+    detalle, parametros_detalle = consulta_detalle()
+    detalle_filtrado, parametros_filtrado = consulta_detalle(filtros)
+    return {
+        'auth.login (usuario por cédula)': User.query.filter_by(cedula=cedula).limit(1),
+        # Sin directorio en memoria (o sin la cédula en él): la consulta de profile_cache
+        'auth.perfil (estudiante por cédula)': current_app.extensions['perfil_cache'].consulta(),
+        'carnet.generar (estudiante)': Student.query.filter_by(cedula=cedula).limit(1),
+        'carnet.generar (rol)': User.query.filter_by(cedula=cedula).limit(1),
+        'carnet.descargar-pdf / verificar-vigencia (último carnet)': ultimo_carnet.limit(1),
+        'carnet.listar (carnets por cédula)': ultimo_carnet,
+        'carnet.imagen (carnet por id)': Carnet.query.filter_by(id=1),
+        'carnet.listado (primera página)': consulta_listado(list(CAMPOS_DEFECTO)),
+        'carnet.listado (página siguiente, con filtros)': consulta_listado(
+            list(CAMPOS_DEFECTO) + ['nombre', 'carrera'], filtros=filtros,
+            cursor=codificar_cursor('2024-01-01 00:00:00', 1)
+        ),
+        'carnet.imprimir (últimos carnets de las cédulas)': Carnet.query.filter(Carnet.cedula.in_([cedula]))
+            .order_by(Carnet.cedula, Carnet.fecha_emision.desc()),
+        'carnet.reporte-vencimientos (toda la universidad)': (detalle, {**parametros_detalle, **fechas_reporte}),
+        'carnet.reporte-vencimientos (con filtros)': (detalle_filtrado, {**parametros_filtrado, **fechas_reporte}),
+        'generar-lote / constancias batch (filtro)': filtrar_estudiantes(Student.query, filtros),
+    }
+
+
+# FROM/JOIN <tabla o CTE> [AS] <alias>, para saber a qué corresponde cada SCAN del plan
+_ORIGEN = re.compile(r'\b(?:FROM|JOIN)\s+"?(\w+)"?(?:\s+(?:AS\s+)?(\w+))?', re.IGNORECASE)
+
+
+def recorre_tabla_completa(sql, plan, tablas):
+    """
+    True si el plan recorre una tabla entera sin índice (SCAN <tabla> sin USING).
+    Los SCAN de CTE y subconsultas (sus filas ya salen de otra parte del plan) no cuentan.
+    """
+    origenes = {}
+    for tabla, alias in _ORIGEN.findall(sql):
+        origenes.setdefault(tabla.lower(), tabla.lower())
+        if alias:
+            origenes.setdefault(alias.lower(), tabla.lower())
+    for linea in plan:
+        if not linea.startswith('SCAN ') or ' USING ' in linea:
+            continue
+        nombre = linea.split()[1].lower()
+        if origenes.get(nombre, nombre) in tablas:
+            return True
+    return False
+
+
+def explicar_consultas(cedula='0'):
+    """
+    Ejecuta EXPLAIN QUERY PLAN para cada consulta de las rutas.
+    Devuelve (nombre, sql, líneas del plan, recorre_tabla_completa).
+    """
+    resultados = []
+    consultas = consultas_rutas(cedula)
+    with db.engine.connect() as conn:
+        tablas = {
+            fila[0].lower() for fila in conn.execute(text("SELECT name FROM sqlite_master WHERE type = 'table'"))
+        }
+        for nombre, consulta in consultas.items():
+            if hasattr(consulta, 'statement'):
+                sql = str(consulta.statement.compile(dialect=conn.dialect, compile_kwargs={'literal_binds': True}))
+                filas = conn.exec_driver_sql('EXPLAIN QUERY PLAN ' + sql).fetchall()
+            else:
+                sql, parametros = consulta if isinstance(consulta, tuple) else (str(consulta), {'cedula': cedula})
+                filas = conn.execute(text('EXPLAIN QUERY PLAN ' + sql), parametros).fetchall()
+            plan = [fila[-1] for fila in filas]
+            resultados.append((nombre, sql, plan, recorre_tabla_completa(sql, plan, tablas)))
+    return resultados
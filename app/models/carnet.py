@@ -5,15 +5,37 @@ from .user import db
 
 class Carnet(db.Model):
     __tablename__ = 'carnets'  # Corregido de _tablename_ a __tablename__
+    # Último carnet por cédula: filter_by(cedula).order_by(fecha_emision.desc())
+    __table_args__ = (db.Index('ix_carnets_cedula_fecha', 'cedula', 'fecha_emision'),)
     
     id = db.Column(db.Integer, primary_key=True)
     cedula = db.Column(db.String(20), db.ForeignKey('ESTUDIANTES.cedula'), nullable=False)
     fecha_emision = db.Column(db.DateTime, default=datetime.utcnow)
     fecha_vencimiento = db.Column(db.DateTime)
     ruta_imagen = db.Column(db.String(255))
+    huella = db.Column(db.String(64))  # datos del render; igual huella = misma imagen
+    foto_hash = db.Column(db.String(64))  # sha256 de la foto usada (almacén de fotos)
     
-    def __init__(self, cedula, duracion_meses=12):  # Corregido de _init_ a __init__
+    def __init__(self, cedula, duracion_meses=12, fecha_emision=None):  # Corregido de _init_ a __init__
         self.cedula = cedula
-        self.fecha_emision = datetime.utcnow()
+        # La misma fecha que se firmó en el QR (preparar_datos) si se indica
+        self.fecha_emision = fecha_emision or datetime.utcnow()
         self.fecha_vencimiento = self.fecha_emision + timedelta(days=30 * duracion_meses)
-        self.ruta_imagen = f"img/carnets/{cedula}.png"
\ No newline at end of file
+        self.ruta_imagen = f"img/carnets/{cedula}.png"
+
+# Límite de parámetros por consulta IN en SQLite
+_TAMANO_IN = 500
+
+def ultimos_carnets(cedulas):
+    """
+    Último carnet emitido de cada cédula (por bloques, usando ix_carnets_cedula_fecha).
+    Devuelve un diccionario cédula -> Carnet.
+    """
+    cedulas = [str(c) for c in cedulas]
+    ultimos = {}
+    for i in range(0, len(cedulas), _TAMANO_IN):
+        query = Carnet.query.filter(Carnet.cedula.in_(cedulas[i:i + _TAMANO_IN])) \
+            .order_by(Carnet.cedula, Carnet.fecha_emision.desc())
+        for carnet in query:
+            ultimos.setdefault(str(carnet.cedula), carnet)
+    return ultimos
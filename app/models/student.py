@@ -1,3 +1,4 @@
+from sqlalchemy import func
 from app import db
 
 # Debería verse algo como esto
@@ -10,4 +11,38 @@ class Student(db.Model):
     seccion = db.Column('seccion', db.String)  # Nota el espacio
     turno = db.Column('turno', db.String)  # Nota el espacio
     periodo = db.Column('periodo', db.String)  # Nota el espacio
-    nucleo = db.Column('nucleo', db.String)  # Nota el espacio
\ No newline at end of file
+    nucleo = db.Column('nucleo', db.String)  # Nota el espacio
+
+
+# Campos por los que se puede filtrar el listado de estudiantes
+FILTROS_ESTUDIANTE = ('carrera', 'seccion', 'periodo', 'nucleo')
+
+def filtrar_estudiantes(query, filtros):
+    """
+    Aplica filtros de carrera/sección/periodo/núcleo a una consulta de Student.
+    Los valores de la tabla traen espacios al inicio, por eso se comparan recortados.
+    """
+    for campo in FILTROS_ESTUDIANTE:
+        valor = (filtros or {}).get(campo)
+        if valor is None or str(valor).strip() == '':
+            continue
+        columna = getattr(Student, campo)
+        query = query.filter(func.lower(func.trim(columna)) == str(valor).strip().lower())
+    return query
+
+
+# Límite de parámetros por consulta IN en SQLite
+_TAMANO_IN = 500
+
+def buscar_estudiantes(cedulas=None, filtros=None):
+    """
+    Trae en una sola consulta (por bloques de cédulas) los estudiantes pedidos.
+    """
+    if cedulas:
+        cedulas = list(cedulas)
+        estudiantes = []
+        for i in range(0, len(cedulas), _TAMANO_IN):
+            query = Student.query.filter(Student.cedula.in_(cedulas[i:i + _TAMANO_IN]))
+            estudiantes.extend(filtrar_estudiantes(query, filtros).all())
+        return estudiantes
+    return filtrar_estudiantes(Student.query, filtros).all()
@@ -1,30 +1,51 @@
 # routes/carnet_routes.py
-from flask import Blueprint, request, jsonify, send_file
-from flask_jwt_extended import jwt_required, get_jwt_identity
-from werkzeug.utils import secure_filename
+from flask import Blueprint, request, jsonify, send_file, Response, current_app, url_for
+from flask_jwt_extended import jwt_required
 import os
-from ..services.card_generator.carnet_service import CarnetGenerator
-from ..services.card_generator import carnet_pdf
-from ..models.carnet import Carnet
-from ..models.user import db
+from ..services.card_generator.batch_service import generar_lote
+from ..services.card_generator.photo_ingest import FotoInvalidaError, MAX_BYTES_FOTO
+from ..services.card_generator.photo_store import obtener_almacen, CARPETA_FOTOS
+from ..services.card_generator.verificacion import CodigoInvalido, vencimiento_impreso
+from ..models.student import FILTROS_ESTUDIANTE
+from ..services.directorio import buscar_estudiantes
+from ..services.procesos import leer_workers
+from .decorators import rol_requerido, ROLES_ADMIN
+from ..models.carnet import Carnet, ultimos_carnets
 import datetime
 
 carnet_bp = Blueprint('carnet', __name__)
 
-# Configuración para subir archivos
-UPLOAD_FOLDER = 'uploads/fotos'
+# Los generadores (reportlab, qrcode, dateutil) se importan dentro de cada ruta:
+# así un worker nuevo arranca sin cargarlos (ver app/arranque.py)
+
+# Configuración para subir archivos (create_app crea la carpeta)
+UPLOAD_FOLDER = CARPETA_FOTOS
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg'}
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def foto_excede_limite():
+    """Rechaza la subida por su Content-Length antes de leer el cuerpo."""
+    return request.content_length is not None and request.content_length > MAX_BYTES_FOTO + 64 * 1024
+
+def guardar_foto(foto):
+    """
+    Valida la foto directamente desde el stream de la subida y la guarda ya
+    normalizada al tamaño del carnet, en el almacén de fotos (por su hash).
+    Lanza FotoInvalidaError si no es válida.
+    """
+    return obtener_almacen().guardar(foto.stream)
+
 @carnet_bp.route('/generar', methods=['POST'])
 @jwt_required()
 def generar_carnet():
     """
     Endpoint para generar un carnet estudiantil
     """
+    if foto_excede_limite():
+        return jsonify({'error': 'La foto excede el tamaño máximo permitido'}), 413
+    
     # Verificar que la solicitud tenga la parte 'file'
     if 'foto' not in request.files:
         return jsonify({'error': 'No se proporcionó archivo de foto'}), 400
@@ -40,14 +61,16 @@ def generar_carnet():
         return jsonify({'error': 'No se seleccionó ninguna foto'}), 400
     
     if foto and allowed_file(foto.filename):
-        # Guardar la foto con un nombre seguro basado en la cédula
-        filename = secure_filename(f"{cedula}_{foto.filename}")
-        filepath = os.path.join(UPLOAD_FOLDER, filename)
-        foto.save(filepath)
+        # Guardar la foto normalizada en el almacén (el nombre es su hash)
+        try:
+            filepath = guardar_foto(foto)
+        except FotoInvalidaError as e:
+            return jsonify({'error': str(e)}), 400
         
         try:
             # Generar el carnet
-            carnet_generator = CarnetGenerator()
+            from ..services.card_generator.carnet_service import obtener_generador
+            carnet_generator = obtener_generador()
             carnet = carnet_generator.generar_carnet(cedula, filepath)
             
             return jsonify({
@@ -63,11 +86,55 @@ def generar_carnet():
     
     return jsonify({'error': 'Formato de archivo no permitido'}), 400
 
+@carnet_bp.route('/generar-lote', methods=['POST'])
+@jwt_required()
+@rol_requerido(*ROLES_ADMIN)
+def generar_carnets_lote():
+    """
+    Endpoint para generar carnets de forma masiva.
+    Acepta JSON ({"cedulas": [...], "filtros": {...}}) o un formulario con
+    "cedulas" separadas por coma, los filtros y un zip opcional de fotos en "fotos".
+    """
+    fotos_zip = None
+    if request.is_json:
+        data = request.get_json() or {}
+        cedulas = data.get('cedulas') or []
+        filtros = data.get('filtros') or {}
+        workers = data.get('workers')
+    else:
+        cedulas = [c for c in request.form.get('cedulas', '').split(',') if c.strip()]
+        filtros = {campo: request.form.get(campo) for campo in FILTROS_ESTUDIANTE}
+        workers = request.form.get('workers')
+        fotos_zip = request.files.get('fotos')
+        if fotos_zip and not fotos_zip.filename.lower().endswith('.zip'):
+            return jsonify({'error': 'Las fotos deben enviarse en un archivo .zip'}), 400
+
+    try:
+        workers = leer_workers(workers)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    try:
+        reporte = generar_lote(
+            cedulas=cedulas,
+            filtros=filtros,
+            fotos_zip=fotos_zip.stream if fotos_zip else None,
+            carpeta_fotos=UPLOAD_FOLDER,
+            workers=workers
+        )
+        return jsonify(reporte), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': f'Error al generar carnets: {str(e)}'}), 500
+
 @carnet_bp.route('/descargar-pdf/<string:cedula>', methods=['GET'])
 @jwt_required()
 def descargar_pdf_carnet(cedula):
     """
     Descarga el carnet estudiantil en formato PDF (generado en memoria).
+    Por defecto usa la imagen guardada (CARNET_PDF_MODO); ?modo=vectorial lo dibuja a partir
+    de los datos y la foto, y si no coincide con el carnet emitido se usa la imagen guardada.
     """
     try:
         # Buscar el carnet más reciente
@@ -75,18 +142,24 @@ def descargar_pdf_carnet(cedula):
         if not carnet:
             return jsonify({'error': 'No se encontró carnet para esta cédula'}), 404
 
+        if request.args.get('modo', current_app.config['CARNET_PDF_MODO']) == 'vectorial':
+            from ..services.card_generator.carnet_vectorial import pdf_vectorial
+            pdf_buffer = pdf_vectorial(carnet, carpeta_fotos=UPLOAD_FOLDER)
+            if pdf_buffer is not None:
+                return send_file(
+                    pdf_buffer,
+                    mimetype='application/pdf',
+                    as_attachment=True,
+                    download_name=f'carnet_{cedula}.pdf'
+                )
+
         # Verificar que exista la imagen del carnet
         if not os.path.exists(carnet.ruta_imagen):
             return jsonify({'error': 'Imagen del carnet no encontrada'}), 404
 
-        # Ruta al reverso (si lo tienes fijo)
-        reverso_path = os.path.join('app', 'assets', 'card', 'carnetposterior.png')
-        if not os.path.exists(reverso_path):
-            reverso_path = None
-
-        # Generar PDF en memoria
+        # Generar PDF en memoria (el reverso se lee una sola vez por proceso)
         from ..services.card_generator.carnet_pdf import generar_pdf_en_memoria
-        pdf_buffer = generar_pdf_en_memoria(carnet.ruta_imagen, reverso_path, cedula,)
+        pdf_buffer = generar_pdf_en_memoria(carnet.ruta_imagen, cedula=cedula)
 
         # Retornar PDF sin guardarlo
         return send_file(
@@ -101,6 +174,92 @@ def descargar_pdf_carnet(cedula):
 
 
 
+@carnet_bp.route('/imprimir', methods=['POST'])
+@jwt_required()
+@rol_requerido(*ROLES_ADMIN)
+def imprimir_carnets():
+    """
+    Hojas de impresión con varios carnets por página (y reversos para doble cara).
+    JSON: {"cedulas": [...]} o {"filtros": {...}}, más "pagina" (carta|a4), "duplex",
+    "volteo" (largo|corto) y "marcas_corte". Hasta HOJAS_POR_PARTE hojas se devuelve
+    un PDF; las tiradas más grandes se envían como un ZIP de varios PDF.
+    """
+    from ..services.card_generator.imposicion import Imposicion, stream_partes_zip, HOJAS_POR_PARTE
+
+    data = request.get_json() or {}
+    cedulas = [str(c).strip() for c in data.get('cedulas') or [] if str(c).strip()]
+    filtros = data.get('filtros') or {}
+
+    if not cedulas and not any(filtros.values()):
+        return jsonify({'error': 'Se requiere una lista de cédulas o al menos un filtro'}), 400
+
+    try:
+        imposicion = Imposicion(
+            pagina=data.get('pagina', 'carta'),
+            duplex=bool(data.get('duplex', True)),
+            volteo=data.get('volteo', 'largo'),
+            marcas_corte=bool(data.get('marcas_corte', True))
+        )
+        workers = leer_workers(data.get('workers'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    if not cedulas:
+        cedulas = [str(e.cedula) for e in buscar_estudiantes(filtros=filtros)]
+    carnets = ultimos_carnets(cedulas)
+    anversos = [carnets[c].ruta_imagen for c in cedulas
+                if c in carnets and os.path.exists(carnets[c].ruta_imagen)]
+    if not anversos:
+        return jsonify({'error': 'No se encontraron carnets emitidos'}), 404
+
+    encabezados = {'X-Carnets-Omitidos': str(len(cedulas) - len(anversos))}
+    if imposicion.hojas_necesarias(len(anversos)) <= HOJAS_POR_PARTE:
+        encabezados['Content-Disposition'] = 'attachment; filename=carnets.pdf'
+        return Response(imposicion.generar_pdf(anversos), mimetype='application/pdf', headers=encabezados)
+
+    encabezados['Content-Disposition'] = 'attachment; filename=carnets.zip'
+    return Response(
+        stream_partes_zip(anversos, imposicion, workers=workers),
+        mimetype='application/zip',
+        headers=encabezados
+    )
+
+@carnet_bp.route('/reporte-vencimientos', methods=['GET'])
+@jwt_required()
+@rol_requerido(*ROLES_ADMIN)
+def reporte_vencimientos():
+    """
+    Vencimiento del último carnet de cada estudiante, en una sola consulta.
+    Parámetros: formato (csv|ndjson), dias (ventana de "por vencer", 30 por defecto),
+    estado (vigente,por_vencer,vencido,sin_carnet), resumen=1 (conteos por
+    núcleo/carrera/sección) y los filtros nucleo, carrera, seccion y periodo.
+    La respuesta se envía a medida que se leen las filas.
+    """
+    from ..services.card_generator.vencimientos import stream_reporte, leer_estados, FORMATOS
+    from ..database import engine_lectura
+
+    formato = request.args.get('formato', 'csv')
+    if formato not in FORMATOS:
+        return jsonify({'error': f'Formato no soportado: {formato}'}), 400
+    try:
+        dias = int(request.args.get('dias', 30))
+        estados = leer_estados(request.args.get('estado'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if dias < 0:
+        return jsonify({'error': 'dias no puede ser negativo'}), 400
+
+    filtros = {campo: request.args.get(campo) for campo in FILTROS_ESTUDIANTE}
+    resumen = request.args.get('resumen') in ('1', 'true')
+    contenido = stream_reporte(engine_lectura(), formato, filtros=filtros, estados=estados,
+                               dias=dias, resumen=resumen)
+    nombre = f"vencimientos{'_resumen' if resumen else ''}.{formato}"
+    return Response(
+        contenido,
+        mimetype='text/csv' if formato == 'csv' else 'application/x-ndjson',
+        headers={'Content-Disposition': f'attachment; filename={nombre}'}
+    )
+
 @carnet_bp.route('/listar', methods=['GET'])
 @jwt_required()
 def listar_carnets():
@@ -125,48 +284,71 @@ def listar_carnets():
         ]
     }), 200
     
+@carnet_bp.route('/listado', methods=['GET'])
+@jwt_required()
+@rol_requerido(*ROLES_ADMIN)
+def listado_carnets():
+    """
+    Carnets de todos los estudiantes, del más reciente al más antiguo, por páginas.
+    Parámetros: limite (100 por defecto), cursor (el "siguiente" de la página
+    anterior), campos (separados por coma, también los del estudiante), cedula,
+    desde y hasta (AAAA-MM-DD, fecha de emisión) y nucleo, carrera, seccion, periodo.
+    """
+    from ..services.card_generator.listado import stream_listado, leer_campos, ListadoInvalido, LIMITE_DEFECTO
+    from ..database import engine_lectura
+
+    try:
+        contenido = stream_listado(
+            engine_lectura(),
+            leer_campos(request.args.get('campos')),
+            limite=int(request.args.get('limite', LIMITE_DEFECTO)),
+            filtros={campo: request.args.get(campo) for campo in FILTROS_ESTUDIANTE},
+            cedula=request.args.get('cedula'),
+            desde=request.args.get('desde'),
+            hasta=request.args.get('hasta'),
+            cursor=request.args.get('cursor')
+        )
+    except ListadoInvalido as e:
+        return jsonify({'error': str(e)}), 400
+    except ValueError:
+        return jsonify({'error': 'limite debe ser un número entero'}), 400
+    return Response(contenido, mimetype='application/json')
+
 @carnet_bp.route('/carnet/verificar-vigencia/<string:cedula>', methods=['GET'])
 @jwt_required()
 def verificar_vigencia(cedula):
     """
     Endpoint para verificar si un estudiante tiene un carnet vigente
+    (último carnet de la cédula, tomado del índice en memoria de verificacion.py)
     """
     try:
-        # Buscar el carnet más reciente del estudiante
-        carnet = Carnet.query.filter_by(cedula=cedula).order_by(Carnet.fecha_emision.desc()).first()
+        entrada = current_app.extensions['vigencia_carnets'].buscar(cedula.strip())
         
-        if not carnet:
+        if not entrada:
             return jsonify({
                 'vigente': False,
                 'mensaje': 'No se encontró ningún carnet para este estudiante'
             }), 200
         
-        # Verificar si el carnet está vigente (menos de 6 meses desde su emisión)
-        hoy = datetime.now()
-        fecha_emision = carnet.fecha_emision
-        fecha_vencimiento = carnet.fecha_vencimiento
+        # Vence lo que ocurra primero: la fecha impresa (6 meses desde la emisión)
+        # o la fecha de vencimiento registrada
+        _, fecha_emision, fecha_vencimiento = entrada
+        vence = vencimiento_impreso(fecha_emision)
+        if fecha_vencimiento and fecha_vencimiento < vence:
+            vence = fecha_vencimiento
         
-        # Calcular la diferencia en meses
-        diff_meses = (hoy.year - fecha_emision.year) * 12 + (hoy.month - fecha_emision.month)
+        hoy = datetime.date.today()
+        vigente = hoy <= vence
         
-        # Un carnet es vigente si tiene menos de 6 meses desde su emisión
-        vigente = fecha_emision <= 6
-        
-        # Calcular fecha de vencimiento (6 meses después de la emisión)
-        fecha_vencimiento = carnet.fecha_vencimiento if hasattr(carnet, 'fecha_vencimiento') else None
-        if not fecha_vencimiento:
-            # Si no tiene fecha de vencimiento explícita, calcularla
-            fecha_vencimiento = fecha_emision.replace(
-                month=fecha_emision.month + 6 if fecha_emision.month <= 6 else (fecha_emision.month + 6) % 12,
-                year=fecha_emision.year if fecha_emision.month <= 6 else fecha_emision.year + 1
-            )
+        # Meses completos que le quedan
+        meses_restantes = (vence.year - hoy.year) * 12 + (vence.month - hoy.month) - (vence.day < hoy.day)
         
         return jsonify({
             'vigente': vigente,
             'mensaje': 'El carnet está vigente' if vigente else 'El carnet ha expirado',
             'fecha_emision': fecha_emision.strftime('%Y-%m-%d'),
-            'fecha_vencimiento': fecha_vencimiento.strftime('%Y-%m-%d'),
-            'meses_restantes': 6 - diff_meses if vigente else 0
+            'fecha_vencimiento': vence.strftime('%Y-%m-%d'),
+            'meses_restantes': max(meses_restantes, 0) if vigente else 0
         }), 200
         
     except Exception as e:
@@ -174,36 +356,32 @@ def verificar_vigencia(cedula):
             'error': 'Error al verificar la vigencia del carnet',
             'detalle': str(e)
         }), 500
+
+@carnet_bp.route('/verificar/<string:codigo>', methods=['GET'])
+def verificar_codigo(codigo):
+    """
+    Verificación del QR del carnet para los lectores de la entrada (sin JWT).
+    Comprueba la firma del código y lo compara con el último carnet de la cédula
+    en el índice en memoria, sin consultar la base en cada lectura.
+    """
+    try:
+        resultado = current_app.extensions['vigencia_carnets'].verificar(codigo)
+    except CodigoInvalido as e:
+        return jsonify({'valido': False, 'motivo': 'codigo_invalido', 'error': str(e)}), 400
+    
+    # Foto del carnet para que el vigilante la compare con la persona
+    if resultado['carnet_id'] is not None:
+        resultado['imagen'] = url_for('carnet.mostrar_imagen_carnet', carnet_id=resultado['carnet_id'], miniatura=1)
+    return jsonify(resultado), 200
     
 @carnet_bp.route('/imagen/<int:carnet_id>', methods=['GET'])
 def mostrar_imagen_carnet(carnet_id):
     """
-    Endpoint para mostrar la imagen del carnet
+    Endpoint para mostrar la imagen del carnet (?miniatura=1 para la vista previa).
+    Responde 304 si el navegador ya tiene la versión actual (ETag / Last-Modified).
     """
-    # Buscar el carnet por ID
-    carnet = Carnet.query.get(carnet_id)
-    
-    if not carnet:
-        return jsonify({'error': 'Carnet no encontrado'}), 404
-    
-    # Verificar si el archivo existe
-    if not os.path.exists(carnet.ruta_imagen):
-        # Si la ruta es relativa, convertirla a absoluta
-        if not os.path.isabs(carnet.ruta_imagen):
-            # Intentar buscar en diferentes ubicaciones
-            posibles_rutas = [
-                carnet.ruta_imagen,  # Ruta relativa original
-                os.path.join('app', carnet.ruta_imagen),  # Desde directorio app
-                os.path.join('app/assets', 'carnets', f"{carnet.cedula}.png")  # Directorio específico
-            ]
-            
-            for ruta in posibles_rutas:
-                if os.path.exists(ruta):
-                    return send_file(ruta, mimetype='image/png')
-        
-        # Si no se encuentra en ninguna parte
+    respuesta = current_app.extensions['imagenes_carnet'].responder(
+        carnet_id, miniatura=request.args.get('miniatura') in ('1', 'true'))
+    if respuesta is None:
         return jsonify({'error': 'Imagen del carnet no encontrada'}), 404
-    
-    # Devolver la imagen
-    return send_file(carnet.ruta_imagen, mimetype='image/png')
-
+    return respuesta
@@ -1,33 +1,115 @@
-from flask import Blueprint, request, jsonify, Response
-from app.services.pdf_generator.constancy_generator import ConstancyPDFGenerator
+from flask import Blueprint, request, jsonify, Response, current_app
+from flask_jwt_extended import jwt_required
+from app.services.pdf_generator.render_cache import clave_constancia
+from app.services.directorio import buscar_estudiantes
+from app.services.procesos import leer_workers
+from app.routes.decorators import rol_requerido, ROLES_ADMIN
 
 constancy_bp = Blueprint('constancy', __name__, url_prefix='/api/constancy')
 
+REQUIRED_FIELDS = ['nombre', 'apellido', 'cedula', 'nucleo', 'periodo', 'carrera', 'seccion', 'turno']
+
+def validar_campos(data):
+    """Devuelve el mensaje de error si falta algún campo obligatorio, o None."""
+    if not data:
+        return 'No se recibieron datos'
+    for field in REQUIRED_FIELDS:
+        if field not in data or not data[field]:
+            return f'El campo {field} es obligatorio'
+    return None
+
 @constancy_bp.route('/generate', methods=['POST'])
 def generate_constancy():
+    # reportlab y babel se cargan en la primera constancia (ver app/arranque.py)
+    from app.services.pdf_generator.constancy_generator import obtener_generador_constancias, fecha_constancia
     try:
         # Obtener datos del formulario
         data = request.json
-        required_fields = ['nombre', 'apellido', 'cedula', 'nucleo', 'periodo', 'carrera', 'seccion', 'turno']
         
         # Verificar que todos los campos requeridos estén presentes
-        for field in required_fields:
-            if field not in data or not data[field]:
-                return jsonify({'error': f'El campo {field} es obligatorio'}), 400
+        error = validar_campos(data)
+        if error:
+            return jsonify({'error': error}), 400
+        
+        # La constancia solo depende de los datos y de la fecha: se identifica por su hash
+        hoy = fecha_constancia()
+        clave = clave_constancia(data, hoy)
         
-        # Generar el PDF
-        pdf_generator = ConstancyPDFGenerator()
-        pdf_buffer = pdf_generator.generate_pdf(data)
+        # Si el cliente ya tiene esta misma constancia no se vuelve a enviar
+        if request.if_none_match.contains(clave):
+            response = Response(status=304)
+            response.set_etag(clave)
+            return response
+        
+        # Generar el PDF (o tomarlo del caché)
+        cache = current_app.extensions['constancy_cache']
+        pdf = cache.obtener_o_generar(
+            clave,
+            lambda: obtener_generador_constancias().generate_pdf(data, hoy).getvalue()
+        )
         
         # Devolver el PDF como respuesta
-        return Response(
-            pdf_buffer.getvalue(),
+        response = Response(
+            pdf,
             mimetype='application/pdf',
             headers={
                 'Content-Disposition': 'inline; filename=constancia.pdf',
                 'Content-Type': 'application/pdf'
             }
         )
+        response.set_etag(clave)
+        return response
     
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
\ No newline at end of file
+        return jsonify({'error': str(e)}), 500
+
+@constancy_bp.route('/batch', methods=['POST'])
+@jwt_required()
+@rol_requerido(*ROLES_ADMIN)
+def generate_constancy_batch():
+    """
+    Genera las constancias de varios estudiantes (por lista de cédulas o por filtro
+    de carrera/sección/periodo/núcleo) como un solo PDF o como un ZIP. En el ZIP,
+    las constancias que no se pudieron generar se listan en errores.txt.
+    """
+    from app.services.pdf_generator.constancy_generator import fecha_constancia
+    from app.services.pdf_generator.constancy_batch import datos_constancia, stream_zip, stream_pdf_unico
+
+    data = request.get_json() or {}
+    cedulas = [str(c).strip() for c in data.get('cedulas') or [] if str(c).strip()]
+    filtros = data.get('filtros') or {}
+    formato = data.get('formato', 'pdf')
+
+    if formato not in ('pdf', 'zip'):
+        return jsonify({'error': 'El formato debe ser "pdf" o "zip"'}), 400
+
+    if not cedulas and not any(filtros.values()):
+        return jsonify({'error': 'Se requiere una lista de cédulas o al menos un filtro'}), 400
+
+    try:
+        workers = leer_workers(data.get('workers'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    try:
+        # Todas las filas en una sola consulta, antes de empezar a enviar la respuesta
+        lista_datos = [datos_constancia(e) for e in buscar_estudiantes(cedulas, filtros)]
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+    if not lista_datos:
+        return jsonify({'error': 'No se encontraron estudiantes'}), 404
+
+    hoy = fecha_constancia()
+    if formato == 'zip':
+        return Response(
+            stream_zip(lista_datos, hoy, workers=workers),
+            mimetype='application/zip',
+            headers={'Content-Disposition': 'attachment; filename=constancias.zip'}
+        )
+
+    return Response(
+        stream_pdf_unico(lista_datos, hoy),
+        mimetype='application/pdf',
+        headers={'Content-Disposition': 'attachment; filename=constancias.pdf'}
+    )
@@ -0,0 +1,23 @@
+# routes/decorators.py
+from functools import wraps
+from flask import jsonify
+from flask_jwt_extended import get_jwt
+
+# Roles con acceso a las operaciones administrativas (masivas)
+ROLES_ADMIN = ('admin', 'administrador', 'control_estudios')
+
+def rol_requerido(*roles):
+    """
+    Restringe un endpoint a los roles indicados (se usa debajo de @jwt_required()).
+    """
+    roles = tuple(r.lower() for r in (roles or ROLES_ADMIN))
+
+    def decorador(fn):
+        @wraps(fn)
+        def envoltura(*args, **kwargs):
+            rol = str(get_jwt().get('rol', '')).lower()
+            if rol not in roles:
+                return jsonify({'error': 'No tiene permisos para realizar esta operación'}), 403
+            return fn(*args, **kwargs)
+        return envoltura
+    return decorador
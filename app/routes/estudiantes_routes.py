@@ -0,0 +1,33 @@
+# routes/estudiantes_routes.py
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required
+from ..services.importacion import importar_estudiantes, abrir_texto, ImportacionInvalida
+from .decorators import rol_requerido, ROLES_ADMIN
+
+estudiantes_bp = Blueprint('estudiantes', __name__)
+
+@estudiantes_bp.route('/importar', methods=['POST'])
+@jwt_required()
+@rol_requerido(*ROLES_ADMIN)
+def importar_nomina():
+    """
+    Importa la nómina desde un CSV (multipart, campo "archivo").
+    Campos opcionales: periodo, crear_usuarios=1 y simular=1 (solo las diferencias).
+    Devuelve el reporte: nuevos, modificados, sin cambios, filas inválidas y filas/s.
+    Con crear_usuarios, los usuarios nuevos sin contraseña en el archivo reciben una
+    generada al azar, que solo aparece en este reporte (contrasenas_generadas).
+    """
+    archivo = request.files.get('archivo')
+    if not archivo or not archivo.filename:
+        return jsonify({'error': 'Se requiere el archivo CSV de la nómina'}), 400
+
+    try:
+        reporte = importar_estudiantes(
+            abrir_texto(archivo.stream),
+            periodo=(request.form.get('periodo') or '').strip() or None,
+            crear_usuarios=request.form.get('crear_usuarios') in ('1', 'true'),
+            simular=request.form.get('simular') in ('1', 'true')
+        )
+    except ImportacionInvalida as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(reporte), 200
@@ -0,0 +1,113 @@
+# routes/jobs_routes.py
+from flask import Blueprint, request, jsonify, send_file, current_app, url_for
+from flask_jwt_extended import jwt_required
+import os
+from ..services.jobs.job_queue import COMPLETADO, FALLIDO
+from ..services.card_generator.photo_ingest import FotoInvalidaError
+from .carnet_routes import allowed_file, foto_excede_limite, guardar_foto
+from .constancy_routes import validar_campos
+
+jobs_bp = Blueprint('jobs', __name__)
+
+def _cola():
+    return current_app.extensions['job_queue']
+
+def _respuesta_encolado(job_id):
+    return jsonify({
+        'job_id': job_id,
+        'estado': 'pendiente',
+        'estado_url': url_for('jobs.estado_trabajo', job_id=job_id),
+        'resultado_url': url_for('jobs.resultado_trabajo', job_id=job_id)
+    }), 202
+
+@jobs_bp.route('/carnet', methods=['POST'])
+@jwt_required()
+def encolar_carnet():
+    """
+    Encola la generación de un carnet y devuelve el id del trabajo de inmediato
+    """
+    if foto_excede_limite():
+        return jsonify({'error': 'La foto excede el tamaño máximo permitido'}), 413
+
+    if 'foto' not in request.files:
+        return jsonify({'error': 'No se proporcionó archivo de foto'}), 400
+
+    foto = request.files['foto']
+    cedula = request.form.get('cedula')
+
+    if not cedula:
+        return jsonify({'error': 'Se requiere la cédula del estudiante'}), 400
+
+    if foto.filename == '' or not allowed_file(foto.filename):
+        return jsonify({'error': 'Formato de archivo no permitido'}), 400
+
+    try:
+        filepath = guardar_foto(foto)
+    except FotoInvalidaError as e:
+        return jsonify({'error': str(e)}), 400
+
+    job_id = _cola().encolar('carnet', {'cedula': cedula, 'foto_path': filepath})
+    return _respuesta_encolado(job_id)
+
+@jobs_bp.route('/constancia', methods=['POST'])
+def encolar_constancia():
+    """
+    Encola la generación de una constancia de estudios
+    """
+    data = request.json
+    error = validar_campos(data)
+    if error:
+        return jsonify({'error': error}), 400
+
+    job_id = _cola().encolar('constancia', data)
+    return _respuesta_encolado(job_id)
+
+@jobs_bp.route('/<string:job_id>', methods=['GET'])
+def estado_trabajo(job_id):
+    """
+    Consulta el estado de un trabajo
+    """
+    trabajo = _cola().obtener(job_id)
+    if not trabajo:
+        return jsonify({'error': 'Trabajo no encontrado'}), 404
+
+    return jsonify({
+        'job_id': trabajo['id'],
+        'tipo': trabajo['tipo'],
+        'estado': trabajo['estado'],
+        'error': trabajo['error'],
+        'creado': trabajo['creado'],
+        'iniciado': trabajo['iniciado'],
+        'terminado': trabajo['terminado']
+    }), 200
+
+@jobs_bp.route('/<string:job_id>/resultado', methods=['GET'])
+def resultado_trabajo(job_id):
+    """
+    Devuelve el PNG/PDF generado por el trabajo (202 si aún no termina)
+    """
+    trabajo = _cola().obtener(job_id)
+    if not trabajo:
+        return jsonify({'error': 'Trabajo no encontrado'}), 404
+
+    if trabajo['estado'] == FALLIDO:
+        return jsonify({'estado': trabajo['estado'], 'error': trabajo['error']}), 500
+
+    if trabajo['estado'] != COMPLETADO:
+        return jsonify({'estado': trabajo['estado']}), 202
+
+    if not trabajo['resultado'] or not os.path.exists(trabajo['resultado']):
+        return jsonify({'error': 'El resultado del trabajo ya no está disponible'}), 410
+
+    return send_file(
+        trabajo['resultado'],
+        mimetype=trabajo['mimetype'],
+        download_name=trabajo['nombre']
+    )
+
+@jobs_bp.route('/metricas', methods=['GET'])
+def metricas_cola():
+    """
+    Profundidad de la cola y tiempos de espera
+    """
+    return jsonify(_cola().metricas()), 200
@@ -0,0 +1,50 @@
+# routes/metrics_routes.py
+import os
+from flask import Blueprint, request, jsonify, Response, current_app
+from flask_jwt_extended import jwt_required
+from .decorators import rol_requerido, ROLES_ADMIN
+
+metricas_bp = Blueprint('metricas', __name__)
+
+@metricas_bp.route('', methods=['GET'])
+@jwt_required()
+@rol_requerido(*ROLES_ADMIN)
+def obtener_metricas():
+    """
+    Histogramas por etapa de la generación de carnets, sumados entre todos los workers
+    (METRICAS_DIR; sin ella, los del proceso que atiende la solicitud).
+    Con ?formato=prometheus se devuelven en el formato de texto de Prometheus.
+    """
+    compartidas = current_app.extensions['metricas']
+    metricas, procesos = compartidas.agregadas()
+    if request.args.get('formato') == 'prometheus':
+        return Response(metricas.prometheus(), mimetype='text/plain; version=0.0.4')
+    directorio = current_app.extensions.get('directorio')
+    return jsonify({
+        'pid': os.getpid(),
+        'procesos': procesos,
+        'log_debug': compartidas.log_debug_activo(),
+        'arranque': current_app.extensions.get('arranque'),
+        'directorio': directorio.estadisticas() if directorio is not None else None,
+        'etapas': metricas.resumen()
+    }), 200
+
+@metricas_bp.route('/debug', methods=['POST'])
+@jwt_required()
+@rol_requerido(*ROLES_ADMIN)
+def cambiar_log_debug():
+    """
+    Activa o desactiva el log de cada medición: {"activo": true|false}
+    Los demás workers lo aplican en su próxima publicación de métricas.
+    """
+    data = request.get_json(silent=True) or {}
+    activo = current_app.extensions['metricas'].activar_log_debug(bool(data.get('activo')))
+    return jsonify({'pid': os.getpid(), 'log_debug': activo}), 200
+
+@metricas_bp.route('', methods=['DELETE'])
+@jwt_required()
+@rol_requerido(*ROLES_ADMIN)
+def reiniciar_metricas():
+    """Vacía los histogramas de todos los workers."""
+    current_app.extensions['metricas'].reiniciar()
+    return jsonify({'pid': os.getpid(), 'etapas': {}}), 200
@@ -1,7 +1,9 @@
+from flask import current_app
 from flask_jwt_extended import create_access_token, get_jwt_identity
 from datetime import timedelta
 from ...models.user import User
 from ...models.student import Student
+from ..directorio import obtener_directorio
 
 class AuthService:
     @staticmethod
@@ -25,24 +27,10 @@ class AuthService:
     
     @staticmethod
     def get_student_data(cedula):
-        from sqlalchemy import text
-        from app import db  # Ajusta esta importación según tu estructura
-        
-        # Primero, obtén los nombres de las columnas
-        column_query = db.session.execute(text("PRAGMA table_info(ESTUDIANTES)"))
-        columns = [row[1] for row in column_query]
-        print("Columnas en la tabla ESTUDIANTES:", columns)
-        
-        query = f"SELECT * FROM ESTUDIANTES WHERE cedula = :cedula"
-        result = db.session.execute(text(query), {"cedula": cedula})
-        row = result.fetchone()
-        print("Columnas en la tabla ESTUDIANTES:", columns)
-
-        
-        if row:
-            #  diccionario con los nombres de columnas y valores
-            student_dict = {}
-            for i, col in enumerate(result.keys()):
-                student_dict[col.lower()] = row[i]
-            return student_dict
-        return None
\ No newline at end of file
+        # Del directorio en memoria; si no está (o no tiene la cédula), una consulta
+        # indexada por cédula, o ninguna si el perfil está en caché
+        directorio = obtener_directorio()
+        registro = directorio.estudiante(cedula) if directorio is not None else None
+        if registro is not None:
+            return registro.perfil()
+        return current_app.extensions['perfil_cache'].obtener(cedula)
@@ -0,0 +1,110 @@
+# services/auth/profile_cache.py
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app
+from sqlalchemy import text
+from ...database import engine_lectura
+
+# Campos que devuelve /api/auth/perfil (en el orden de la tabla)
+CAMPOS_PERFIL = ('cedula', 'apellido', 'nombre', 'carrera', 'seccion', 'turno', 'periodo', 'nucleo')
+
+_AUSENTE = object()
+
+
+class PerfilCache:
+    """
+    Perfiles de estudiante por cédula con TTL corto.
+    El esquema de ESTUDIANTES se resuelve una sola vez y la consulta se arma
+    con columnas explícitas; el texto SQL es siempre el mismo, así que sqlite3
+    reutiliza la sentencia preparada de cada conexión.
+    """
+    def __init__(self, ttl=60, max_entradas=4096):
+        self.ttl = ttl
+        self.max_entradas = max_entradas
+        self._consulta = None
+        self._entradas = OrderedDict()
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+
+    def resolver_esquema(self, conn):
+        """Lee las columnas de ESTUDIANTES y prepara la consulta del perfil."""
+        columnas = {fila[1].strip().lower(): fila[1] for fila in conn.execute(text("PRAGMA table_info(ESTUDIANTES)"))}
+        if not columnas:
+            raise RuntimeError("La tabla ESTUDIANTES no existe")
+        seleccion = ', '.join(f'"{columnas[campo]}" AS {campo}' for campo in CAMPOS_PERFIL if campo in columnas)
+        self._consulta = text(
+            f'SELECT {seleccion} FROM "ESTUDIANTES" WHERE "{columnas["cedula"]}" = :cedula LIMIT 1'
+        )
+
+    def consulta(self):
+        """Sentencia del perfil (la misma que ejecuta obtener); para revisar su plan."""
+        if self._consulta is None:
+            with engine_lectura().connect() as conn:
+                self.resolver_esquema(conn)
+        return self._consulta
+
+    def _buscar(self, cedula):
+        with engine_lectura().connect() as conn:
+            if self._consulta is None:
+                self.resolver_esquema(conn)
+            fila = conn.execute(self._consulta, {"cedula": cedula}).mappings().first()
+        return dict(fila) if fila else None
+
+    def obtener(self, cedula):
+        """Perfil del estudiante (dict) o None si no existe."""
+        clave = str(cedula).strip()
+        ahora = time.monotonic()
+        with self._lock:
+            entrada = self._entradas.get(clave, _AUSENTE)
+            if entrada is not _AUSENTE and entrada[0] > ahora:
+                self._entradas.move_to_end(clave)
+                self.aciertos += 1
+                return entrada[1]
+            self.fallos += 1
+
+        perfil = self._buscar(clave)
+        with self._lock:
+            self._entradas[clave] = (ahora + self.ttl, perfil)
+            self._entradas.move_to_end(clave)
+            while len(self._entradas) > self.max_entradas:
+                self._entradas.popitem(last=False)
+        return perfil
+
+    def invalidar(self, cedula=None):
+        """Descarta el perfil de una cédula, o todos si no se indica ninguna."""
+        with self._lock:
+            if cedula is None:
+                self._entradas.clear()
+            else:
+                self._entradas.pop(str(cedula).strip(), None)
+
+    def estadisticas(self):
+        with self._lock:
+            return {
+                'entradas': len(self._entradas),
+                'aciertos': self.aciertos,
+                'fallos': self.fallos
+            }
+
+
+def init_perfiles(app):
+    """Crea el caché de perfiles y resuelve el esquema de ESTUDIANTES al arrancar."""
+    cache = PerfilCache(ttl=app.config['PERFIL_CACHE_TTL'], max_entradas=app.config['PERFIL_CACHE_ENTRIES'])
+    with app.app_context():
+        try:
+            with engine_lectura().connect() as conn:
+                cache.resolver_esquema(conn)
+        except Exception as e:
+            # Se reintenta en la primera consulta
+            print(f"No se pudo leer el esquema de ESTUDIANTES: {str(e)}")
+    app.extensions['perfil_cache'] = cache
+    return cache
+
+
+def invalidar_perfil(cedula=None):
+    """Invalida el caché de perfiles de la aplicación actual (usar al modificar ESTUDIANTES)."""
+    cache = current_app.extensions.get('perfil_cache')
+    if cache is not None:
+        cache.invalidar(cedula)
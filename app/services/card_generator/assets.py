@@ -0,0 +1,113 @@
+# services/card_generator/assets.py
+import hashlib
+import os
+import threading
+import time
+from PIL import Image, ImageDraw, ImageFont
+
+# Rutas de los recursos del carnet (relativas a la raíz de la aplicación)
+APP_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+RUTA_FONDO = os.path.join(APP_ROOT, "assets", "card", "carnet.png")
+RUTA_REVERSO = os.path.join(APP_ROOT, "assets", "card", "carnetposterior.png")
+RUTA_FUENTE_BOLD = os.path.join(APP_ROOT, "assets", "fonts", "Poppins-Bold.ttf")
+RUTA_FUENTE_REGULAR = os.path.join(APP_ROOT, "assets", "fonts", "Poppins-Regular.ttf")
+
+# Tamaño del marco de la foto y radio de las esquinas redondeadas
+TAM_FOTO = (230, 260)
+RADIO_FOTO = 30
+
+# Cada cuántos segundos se revisan las fechas de modificación de los recursos
+INTERVALO_REVISION = 5.0
+
+
+class CarnetAssets:
+    """
+    Recursos ya decodificados que comparten todos los renders del proceso:
+    plantilla RGBA, fuentes Poppins y máscara de la foto.
+    """
+    def __init__(self, fondo, fuentes, mascara, mtimes, version=''):
+        self.fondo = fondo
+        self.fuentes = fuentes
+        self.mascara = mascara
+        self.mtimes = mtimes
+        # Hash del contenido de los recursos; cambia si se reemplaza la plantilla o una fuente
+        self.version = version
+
+    def nueva_imagen(self):
+        """Devuelve una copia de la plantilla sobre la que se puede dibujar."""
+        return self.fondo.copy()
+
+
+def _mtimes():
+    rutas = (RUTA_FONDO, RUTA_FUENTE_BOLD, RUTA_FUENTE_REGULAR)
+    mtimes = {}
+    for ruta in rutas:
+        if not os.path.exists(ruta):
+            raise FileNotFoundError(f"No se encontró el recurso del carnet en {ruta}")
+        mtimes[ruta] = os.path.getmtime(ruta)
+    return mtimes
+
+
+def _version(rutas):
+    digest = hashlib.sha256(f"{TAM_FOTO}:{RADIO_FOTO}".encode())
+    for ruta in sorted(rutas):
+        with open(ruta, 'rb') as archivo:
+            digest.update(archivo.read())
+    return digest.hexdigest()
+
+
+def _cargar():
+    mtimes = _mtimes()
+
+    with Image.open(RUTA_FONDO) as fondo:
+        fondo = fondo.convert('RGBA')
+        fondo.load()
+
+    # Se definen las fuentes y tamaños
+    fuentes = {
+        'nombre': ImageFont.truetype(RUTA_FUENTE_BOLD, 30),
+        'ci': ImageFont.truetype(RUTA_FUENTE_REGULAR, 25),
+        'carrera': ImageFont.truetype(RUTA_FUENTE_REGULAR, 26),
+        'rol': ImageFont.truetype(RUTA_FUENTE_BOLD, 50),
+        'vence': ImageFont.truetype(RUTA_FUENTE_BOLD, 22),
+    }
+
+    # Máscara de rectángulo con esquinas redondeadas para la foto
+    mascara = Image.new("L", TAM_FOTO, 0)
+    ImageDraw.Draw(mascara).rounded_rectangle((0, 0, TAM_FOTO[0], TAM_FOTO[1]), radius=RADIO_FOTO, fill=255)
+
+    return CarnetAssets(fondo, fuentes, mascara, mtimes, _version(mtimes))
+
+
+_assets = None
+_ultima_revision = 0.0
+_lock = threading.Lock()
+
+
+def obtener_assets():
+    """
+    Devuelve los recursos del carnet cargados una sola vez por proceso.
+    Se recargan si cambia la fecha de modificación de algún archivo.
+    """
+    global _assets, _ultima_revision
+
+    ahora = time.monotonic()
+    if _assets is not None and ahora - _ultima_revision < INTERVALO_REVISION:
+        return _assets
+
+    with _lock:
+        if _assets is None:
+            _assets = _cargar()
+        elif ahora - _ultima_revision >= INTERVALO_REVISION and _mtimes() != _assets.mtimes:
+            _assets = _cargar()
+        _ultima_revision = ahora
+        return _assets
+
+
+def precargar_assets():
+    """Carga los recursos por adelantado (se llama desde create_app)."""
+    try:
+        obtener_assets()
+    except FileNotFoundError as e:
+        # No se impide el arranque; el error se reporta al generar un carnet
+        print(f"No se pudieron precargar los recursos del carnet: {str(e)}")
@@ -0,0 +1,253 @@
+# services/card_generator/batch_service.py
+import os
+import time
+import zipfile
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from .huella import huella_carnet, carnets_reutilizables
+from ..metrics import metricas, medir
+from .photo_ingest import FotoInvalidaError, MAX_BYTES_FOTO
+from .photo_store import AlmacenFotos, CARPETA_FOTOS, hash_de_ruta
+from .verificacion import registrar_carnets
+from ...models.carnet import Carnet, ultimos_carnets
+from ..directorio import buscar_estudiantes
+from ...models.user import User, db
+
+EXTENSIONES_FOTO = {'png', 'jpg', 'jpeg'}
+
+# Cantidad de carnets que se registran por transacción
+TAMANO_LOTE = 200
+
+# Límite de parámetros por consulta IN en SQLite
+_TAMANO_IN = 500
+
+
+def _renderizar(datos):
+    # Se ejecuta en los procesos del pool (los recursos se cargan una vez por proceso).
+    # Se devuelven también los tiempos por etapa para sumarlos a las métricas del proceso principal.
+    from .carnet_service import obtener_generador
+    metricas.reiniciar()
+    ruta = obtener_generador()._generar_imagen(**datos)
+    return ruta, metricas.exportar()
+
+
+def _en_bloques(valores, tamano=_TAMANO_IN):
+    valores = list(valores)
+    for i in range(0, len(valores), tamano):
+        yield valores[i:i + tamano]
+
+
+def _buscar_roles(cedulas):
+    roles = {}
+    for bloque in _en_bloques(cedulas):
+        for cedula, rol in db.session.query(User.cedula, User.rol).filter(User.cedula.in_(bloque)):
+            roles[str(cedula)] = rol
+    return roles
+
+
+def _cedula_de_archivo(nombre):
+    return os.path.basename(nombre).rsplit('.', 1)[0].split('_', 1)[0].strip()
+
+
+def _extension_valida(nombre):
+    return '.' in nombre and nombre.rsplit('.', 1)[1].lower() in EXTENSIONES_FOTO
+
+
+def extraer_fotos_zip(fotos_zip, carpeta_fotos=CARPETA_FOTOS, errores=None):
+    """
+    Extrae las fotos de un zip al almacén de fotos, ya normalizadas al tamaño del carnet.
+    Cada archivo debe llamarse con la cédula ("12345678.jpg" o "12345678_algo.jpg").
+    Devuelve un diccionario cédula -> ruta de la foto; las fotos inválidas se agregan a errores.
+    """
+    fotos = {}
+    almacen = AlmacenFotos(carpeta_fotos)
+    with zipfile.ZipFile(fotos_zip) as archivo:
+        for info in archivo.infolist():
+            nombre = os.path.basename(info.filename)
+            if info.is_dir() or not _extension_valida(nombre):
+                continue
+            cedula = _cedula_de_archivo(nombre)
+            if not cedula:
+                continue
+            try:
+                if info.file_size > MAX_BYTES_FOTO:
+                    raise FotoInvalidaError("La foto excede el tamaño máximo permitido")
+                with archivo.open(info) as origen:
+                    fotos[cedula] = almacen.guardar(origen)
+            except FotoInvalidaError as e:
+                if errores is not None:
+                    errores.append({'cedula': cedula, 'error': f'{nombre}: {str(e)}'})
+    return fotos
+
+
+def buscar_fotos_previas(carpeta_fotos=CARPETA_FOTOS):
+    """
+    Fotos del formato anterior ("<cédula>.png" sueltas en la carpeta): recorre una
+    sola vez la carpeta y devuelve la foto más reciente de cada cédula.
+    """
+    fotos = {}
+    if not os.path.isdir(carpeta_fotos):
+        return fotos
+    fechas = {}
+    with os.scandir(carpeta_fotos) as entradas:
+        for entrada in entradas:
+            if not entrada.is_file() or not _extension_valida(entrada.name):
+                continue
+            cedula = _cedula_de_archivo(entrada.name)
+            mtime = entrada.stat().st_mtime
+            if mtime > fechas.get(cedula, -1):
+                fechas[cedula] = mtime
+                fotos[cedula] = entrada.path
+    return fotos
+
+
+def foto_previa(cedula, carpeta_fotos=CARPETA_FOTOS):
+    """
+    Foto del formato anterior de una sola cédula ("<cédula>.png" o "<cédula>_<archivo>",
+    como las guardaba /generar): la más reciente, o None.
+    """
+    cedula = str(cedula).strip()
+    mejor, fecha = None, -1
+    if not os.path.isdir(carpeta_fotos):
+        return None
+    with os.scandir(carpeta_fotos) as entradas:
+        for entrada in entradas:
+            if not entrada.name.startswith(cedula) or not entrada.is_file() or not _extension_valida(entrada.name):
+                continue
+            if _cedula_de_archivo(entrada.name) != cedula:
+                continue
+            mtime = entrada.stat().st_mtime
+            if mtime > fecha:
+                mejor, fecha = entrada.path, mtime
+    return mejor
+
+
+def fotos_registradas(cedulas, carpeta_fotos=CARPETA_FOTOS):
+    """Foto del almacén que usó el último carnet de cada cédula (si sigue en disco)."""
+    almacen = AlmacenFotos(carpeta_fotos)
+    fotos = {}
+    for cedula, carnet in ultimos_carnets(cedulas).items():
+        if carnet.foto_hash:
+            ruta = almacen.ruta(carnet.foto_hash)
+            if os.path.exists(ruta):
+                fotos[cedula] = ruta
+    return fotos
+
+
+def _registrar(pendientes, fallidos):
+    """
+    Registra un bloque de carnets en una sola transacción.
+    Si el bloque falla, se reintenta uno por uno para aislar los registros con error.
+    """
+    if not pendientes:
+        return 0
+    bloque = list(pendientes)
+    pendientes.clear()
+    try:
+        db.session.add_all(bloque)
+        with medir('lote.commit'):
+            db.session.commit()
+        registrar_carnets(bloque)
+        return len(bloque)
+    except Exception:
+        db.session.rollback()
+
+    registrados = 0
+    for carnet in bloque:
+        nuevo = Carnet(cedula=carnet.cedula, fecha_emision=carnet.fecha_emision)
+        nuevo.ruta_imagen = carnet.ruta_imagen
+        nuevo.huella = carnet.huella
+        nuevo.foto_hash = carnet.foto_hash
+        try:
+            db.session.add(nuevo)
+            db.session.commit()
+            registrar_carnets([nuevo])
+            registrados += 1
+        except Exception as e:
+            # La imagen es un archivo nuevo: el carnet anterior de la cédula sigue intacto
+            db.session.rollback()
+            fallidos.append({'cedula': carnet.cedula, 'error': f'Error al registrar carnet: {str(e).splitlines()[0]}'})
+    return registrados
+
+
+def generar_lote(cedulas=None, filtros=None, fotos_zip=None, carpeta_fotos=CARPETA_FOTOS,
+                 workers=None, tamano_lote=TAMANO_LOTE):
+    """
+    Genera carnets de forma masiva para una lista de cédulas o un filtro sobre ESTUDIANTES.
+    Las imágenes se renderizan en un pool de procesos y los registros se guardan por bloques.
+    Devuelve un reporte con el rendimiento y los errores por cédula.
+    """
+    inicio = time.perf_counter()
+    fallidos = []
+
+    cedulas = [str(c).strip() for c in (cedulas or []) if str(c).strip()]
+    if not cedulas and not any((filtros or {}).values()):
+        raise ValueError("Se requiere una lista de cédulas o al menos un filtro")
+
+    estudiantes = buscar_estudiantes(cedulas, filtros)
+    encontrados = {str(e.cedula) for e in estudiantes}
+    for cedula in cedulas:
+        if cedula not in encontrados:
+            fallidos.append({'cedula': cedula, 'error': f'No se encontró estudiante con cédula {cedula}'})
+
+    roles = _buscar_roles(encontrados)
+
+    # Fotos: primero las del zip y, si no hay, la del último carnet del estudiante
+    # (o su foto del formato anterior)
+    fotos = buscar_fotos_previas(carpeta_fotos)
+    fotos.update(fotos_registradas(encontrados, carpeta_fotos))
+    if fotos_zip:
+        fotos.update(extraer_fotos_zip(fotos_zip, carpeta_fotos, fallidos))
+
+    from .carnet_service import obtener_generador
+    generador = obtener_generador()
+    # Una sola fecha de emisión para todo el lote: la firmada en cada QR y la de cada registro
+    fecha_emision = datetime.utcnow()
+    trabajos = {}
+    for estudiante in estudiantes:
+        cedula = str(estudiante.cedula)
+        rol = roles.get(cedula, "ESTUDIANTE")
+        trabajos[cedula] = generador.preparar_datos(estudiante, rol, fotos.get(cedula), fecha_emision)
+
+    # Los carnets cuyo último registro tiene la misma huella no se vuelven a generar
+    huellas = {cedula: huella_carnet(datos) for cedula, datos in trabajos.items()}
+    reutilizados = carnets_reutilizables(huellas)
+    for cedula in reutilizados:
+        del trabajos[cedula]
+
+    generados = 0
+    pendientes = []
+    workers = workers or os.cpu_count() or 1
+    if trabajos:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futuros = {pool.submit(_renderizar, dict(datos, huella=huellas[cedula])): cedula
+                       for cedula, datos in trabajos.items()}
+            for futuro in as_completed(futuros):
+                cedula = futuros[futuro]
+                try:
+                    ruta_imagen, tiempos = futuro.result()
+                    metricas.fusionar(tiempos)
+                except Exception as e:
+                    fallidos.append({'cedula': cedula, 'error': str(e)})
+                    continue
+
+                carnet = Carnet(cedula=cedula, fecha_emision=fecha_emision)
+                carnet.ruta_imagen = ruta_imagen
+                carnet.huella = huellas[cedula]
+                carnet.foto_hash = hash_de_ruta(trabajos[cedula]['foto'])
+                pendientes.append(carnet)
+                if len(pendientes) >= tamano_lote:
+                    generados += _registrar(pendientes, fallidos)
+
+        generados += _registrar(pendientes, fallidos)
+
+    segundos = time.perf_counter() - inicio
+    return {
+        'solicitados': len(cedulas) if cedulas else len(estudiantes),
+        'generados': generados,
+        'reutilizados': len(reutilizados),
+        'fallidos': fallidos,
+        'workers': workers,
+        'segundos': round(segundos, 3),
+        'carnets_por_segundo': round(generados / segundos, 2) if segundos > 0 else 0
+    }
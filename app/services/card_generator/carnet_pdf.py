@@ -1,21 +1,92 @@
 # services/card_generator/carnet_pdf.py
 import os
+import threading
 from io import BytesIO
+from PIL import Image
 from reportlab.pdfgen import canvas
-import qrcode
 from qrcode.constants import ERROR_CORRECT_L
 from reportlab.lib.pagesizes import letter
 from reportlab.lib.utils import ImageReader
+from ..pdf_generator import configurar_reportlab
+from .assets import RUTA_REVERSO
+from .qr import qr_png
 
 
 # Tamaño de carnet real en puntos (≈ 3.37 x 2.13 pulgadas)
 CARNET_WIDTH = 148  # ≈ 8.6 cm
 CARNET_HEIGHT = 251 # ≈ 5.4 cm
 
-def generar_pdf_en_memoria(ruta_anverso, ruta_reverso, cedula=None, modo='horizontal'):
-    buffer = BytesIO()
-    page_width, page_height = letter  # Tamaño carta
-    c = canvas.Canvas(buffer, pagesize=(page_width, page_height))
+# Nombre del form XObject del reverso (se embebe una vez por documento)
+NOMBRE_REVERSO = 'ReversoCarnet'
+
+# Imágenes fijas ya leídas por el proceso: ruta -> ImageReader (o None si no existe)
+_imagenes = {}
+_lock_imagenes = threading.Lock()
+
+
+def imagen_pdf(ruta):
+    """
+    Imagen fija (reverso, plantilla) lista para ReportLab. El archivo se busca y se
+    decodifica una sola vez por proceso; devuelve None si no existe.
+    """
+    if ruta not in _imagenes:
+        with _lock_imagenes:
+            if ruta not in _imagenes:
+                imagen = None
+                if ruta and os.path.exists(ruta):
+                    imagen = ImageReader(ruta)
+                    imagen.getRGBData()  # decodificar ahora y no en cada documento
+                _imagenes[ruta] = imagen
+    return _imagenes[ruta]
+
+
+def obtener_reverso(ruta=RUTA_REVERSO):
+    return imagen_pdf(ruta)
+
+
+# Imágenes fijas ya codificadas en JPEG: ruta -> bytes (o None si no existe)
+_jpeg = {}
+
+
+def imagen_pdf_jpeg(ruta, calidad=95):
+    """
+    Como imagen_pdf, pero codificada en JPEG una sola vez por proceso. ReportLab
+    copia los bytes JPEG tal cual al PDF, así que cada documento se ahorra la
+    compresión zlib de la imagen completa. Se crea un ImageReader nuevo en cada
+    llamada para que los hilos no compartan el mismo archivo en memoria.
+    """
+    if ruta not in _jpeg:
+        with _lock_imagenes:
+            if ruta not in _jpeg:
+                contenido = None
+                if ruta and os.path.exists(ruta):
+                    with Image.open(ruta) as img:
+                        buffer = BytesIO()
+                        img.convert('RGB').save(buffer, format='JPEG', quality=calidad, subsampling=0)
+                        contenido = buffer.getvalue()
+                _jpeg[ruta] = contenido
+    contenido = _jpeg[ruta]
+    return ImageReader(BytesIO(contenido)) if contenido else None
+
+
+def dibujar_reverso(c, x, y, reverso):
+    """
+    Dibuja el reverso en (x, y). La imagen se define como form XObject la primera
+    vez y las demás apariciones en el documento solo lo referencian.
+    """
+    if not c.hasForm(NOMBRE_REVERSO):
+        c.beginForm(NOMBRE_REVERSO, 0, 0, CARNET_WIDTH, CARNET_HEIGHT)
+        c.drawImage(reverso, 0, 0, width=CARNET_WIDTH, height=CARNET_HEIGHT)
+        c.endForm()
+    c.saveState()
+    c.translate(x, y)
+    c.doForm(NOMBRE_REVERSO)
+    c.restoreState()
+
+
+def posiciones_pagina(modo='horizontal', pagina=letter):
+    """Esquinas inferiores izquierdas del anverso y del reverso en la página."""
+    page_width, page_height = pagina
 
     # Coordenadas según modo
     if modo == 'horizontal':
@@ -24,6 +95,14 @@ def generar_pdf_en_memoria(ruta_anverso, ruta_reverso, cedula=None, modo='horizo
     else:  # vertical
         pos_anverso = ((page_width - CARNET_WIDTH) / 2, page_height - CARNET_HEIGHT - 50)
         pos_reverso = (pos_anverso[0], pos_anverso[1] - CARNET_HEIGHT - 30)
+    return pos_anverso, pos_reverso
+
+
+def generar_pdf_en_memoria(ruta_anverso, ruta_reverso=RUTA_REVERSO, cedula=None, modo='horizontal'):
+    configurar_reportlab()
+    buffer = BytesIO()
+    c = canvas.Canvas(buffer, pagesize=letter)  # Tamaño carta
+    pos_anverso, pos_reverso = posiciones_pagina(modo)
 
     # Cargar anverso
     if ruta_anverso and os.path.exists(ruta_anverso):
@@ -35,15 +114,10 @@ def generar_pdf_en_memoria(ruta_anverso, ruta_reverso, cedula=None, modo='horizo
             height=CARNET_HEIGHT
         )
 
-    # Cargar reverso
-    if ruta_reverso and os.path.exists(ruta_reverso):
-        c.drawImage(
-            ImageReader(ruta_reverso),
-            pos_reverso[0],
-            pos_reverso[1],
-            width=CARNET_WIDTH,
-            height=CARNET_HEIGHT
-        )
+    # Reverso compartido (ya leído por el proceso)
+    reverso = obtener_reverso(ruta_reverso) if ruta_reverso else None
+    if reverso is not None:
+        dibujar_reverso(c, pos_reverso[0], pos_reverso[1], reverso)
 
     c.showPage()
     c.save()
@@ -51,17 +125,5 @@ def generar_pdf_en_memoria(ruta_anverso, ruta_reverso, cedula=None, modo='horizo
     return buffer
 
 def generar_qr(cedula):
-    qr = qrcode.QRCode(
-        version=1,
-        error_correction=ERROR_CORRECT_L,
-        box_size=10,
-        border=4,
-    )
-    qr.add_data(cedula)
-    qr.make(fit=True)
-
-    img = qr.make_image(fill_color='black', back_color='white').get_image().convert("RGB")
-    qr_buffer = BytesIO()
-    img.save(qr_buffer, format="PNG")
-    qr_buffer.seek(0)
-    return qr_buffer
\ No newline at end of file
+    # Mismo QR de siempre (corrección L, módulos de 10 px); la matriz queda en caché
+    return qr_png(str(cedula), box_size=10, borde=4, correccion=ERROR_CORRECT_L)
@@ -0,0 +1,204 @@
+# services/card_generator/carnet_vectorial.py
+import os
+import threading
+from io import BytesIO
+from reportlab.pdfgen import canvas
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from ..pdf_generator import configurar_reportlab
+from .assets import (obtener_assets, RUTA_FONDO, RUTA_REVERSO, RUTA_FUENTE_BOLD,
+                     RUTA_FUENTE_REGULAR, TAM_FOTO, RADIO_FOTO)
+from .carnet_pdf import (CARNET_WIDTH, CARNET_HEIGHT, imagen_pdf, imagen_pdf_jpeg,
+                         dibujar_reverso, posiciones_pagina)
+from .batch_service import foto_previa
+from .carnet_service import obtener_generador
+from .huella import huella_carnet
+from .photo_ingest import abrir_foto
+from .photo_store import AlmacenFotos, CARPETA_FOTOS
+from .qr import matriz_qr, contenido_qr_carnet, TAM_QR, POS_QR
+from ..directorio import buscar_estudiante
+
+# Nombre del form XObject con la plantilla del anverso
+NOMBRE_PLANTILLA = 'PlantillaCarnet'
+
+# Fuente de ReportLab y de PIL (assets.fuentes) para cada texto del carnet
+FUENTES = {
+    'nombre': 'Poppins-Bold',
+    'ci': 'Poppins-Regular',
+    'carrera': 'Poppins-Regular',
+    'rol': 'Poppins-Bold',
+    'vence': 'Poppins-Bold',
+}
+
+AZUL = (7 / 255, 41 / 255, 115 / 255)
+
+# Calidad JPEG de la foto embebida (ReportLab copia el JPEG sin recomprimirlo)
+CALIDAD_FOTO = 90
+
+_lock_fuentes = threading.Lock()
+
+
+def registrar_fuentes():
+    """Registra las fuentes Poppins en ReportLab (una vez por proceso)."""
+    with _lock_fuentes:
+        registradas = pdfmetrics.getRegisteredFontNames()
+        for nombre, ruta in (('Poppins-Bold', RUTA_FUENTE_BOLD), ('Poppins-Regular', RUTA_FUENTE_REGULAR)):
+            if nombre not in registradas:
+                pdfmetrics.registerFont(TTFont(nombre, ruta))
+
+
+class CarnetVectorial:
+    """
+    Dibuja el anverso del carnet directamente en ReportLab: la plantilla como
+    imagen (form XObject), los textos con las fuentes Poppins embebidas, el QR
+    como rectángulos y solo la foto como imagen.
+    Se trabaja en las coordenadas en píxeles del carnet rasterizado
+    (las mismas posiciones de CarnetGenerator), escaladas al tamaño real.
+    La foto y el reverso se embeben en JPEG para no recomprimirlos con zlib en
+    cada documento; la plantilla sigue en Flate (en JPEG ocupa más).
+    """
+    def __init__(self):
+        registrar_fuentes()
+        self.generador = obtener_generador()
+        self.plantilla = imagen_pdf(RUTA_FONDO)
+        if self.plantilla is None:
+            raise FileNotFoundError(f"No se encontró la plantilla del carnet en {RUTA_FONDO}")
+        self.ancho_px, self.alto_px = self.plantilla.getSize()
+
+    def _plantilla(self, c):
+        if not c.hasForm(NOMBRE_PLANTILLA):
+            c.beginForm(NOMBRE_PLANTILLA, 0, 0, self.ancho_px, self.alto_px)
+            c.drawImage(self.plantilla, 0, 0, width=self.ancho_px, height=self.alto_px)
+            c.endForm()
+        c.doForm(NOMBRE_PLANTILLA)
+
+    def _texto(self, c, campo, posicion, texto, color):
+        """Texto con la misma posición que draw.text de PIL (ancla en la parte superior)."""
+        fuente = obtener_assets().fuentes[campo]
+        ascendente = fuente.getmetrics()[0]
+        c.setFillColorRGB(*color)
+        c.setFont(FUENTES[campo], fuente.size)
+        c.drawString(posicion[0], self.alto_px - posicion[1] - ascendente, texto)
+
+    def _foto(self, c, foto):
+        if not foto or not os.path.exists(foto):
+            return
+        x, y = self.generador.pos_foto[0], self.alto_px - self.generador.pos_foto[1] - TAM_FOTO[1]
+        c.saveState()
+        marco = c.beginPath()
+        marco.roundRect(x, y, TAM_FOTO[0], TAM_FOTO[1], RADIO_FOTO)
+        c.clipPath(marco, stroke=0, fill=0)
+        jpeg = BytesIO()
+        abrir_foto(foto, TAM_FOTO).convert('RGB').save(jpeg, format='JPEG', quality=CALIDAD_FOTO)
+        jpeg.seek(0)
+        c.drawImage(ImageReader(jpeg), x, y, width=TAM_FOTO[0], height=TAM_FOTO[1])
+        c.restoreState()
+
+    def _qr(self, c, contenido):
+        lado, datos = matriz_qr(contenido)
+        c.saveState()
+        # Coordenadas en módulos, con la fila 0 arriba
+        c.translate(POS_QR[0], self.alto_px - POS_QR[1])
+        c.scale(TAM_QR[0] / lado, -TAM_QR[1] / lado)
+
+        # Fondo claro y un solo trazado con los tramos oscuros de cada fila
+        c.setFillColorRGB(1, 1, 1)
+        c.rect(0, 0, lado, lado, stroke=0, fill=1)
+        trazado = c.beginPath()
+        for fila in range(lado):
+            columna = 0
+            base = fila * lado
+            while columna < lado:
+                if datos[base + columna]:
+                    columna += 1
+                    continue
+                inicio = columna
+                while columna < lado and not datos[base + columna]:
+                    columna += 1
+                trazado.rect(inicio, fila, columna - inicio, 1)
+        c.setFillColorRGB(0, 0, 0)
+        c.drawPath(trazado, stroke=0, fill=1)
+        c.restoreState()
+
+    def dibujar_anverso(self, c, x, y, datos, ancho=CARNET_WIDTH, alto=CARNET_HEIGHT):
+        """
+        Dibuja el anverso con su esquina inferior izquierda en (x, y).
+        datos: el diccionario de CarnetGenerator.preparar_datos().
+        """
+        p = self.generador
+        c.saveState()
+        c.translate(x, y)
+        c.scale(ancho / self.ancho_px, alto / self.alto_px)
+
+        self._plantilla(c)
+        self._foto(c, datos['foto'])
+        self._texto(c, 'nombre', p.pos_nombre, datos['nombre'], AZUL)
+        self._texto(c, 'nombre', p.pos_apellidos, datos['apellidos'], AZUL)
+        self._texto(c, 'ci', p.pos_ci, str(datos['cedula']), AZUL)
+        self._texto(c, 'rol', p.pos_rol, str(datos['rol']).upper(), (1, 1, 1))
+        self._texto(c, 'carrera', p.pos_carrera, str(datos['carrera'] or '').upper(), AZUL)
+        self._texto(c, 'vence', p.pos_vence, datos['vence'], (0, 0, 0))
+        self._qr(c, datos.get('qr') or contenido_qr_carnet(datos['nombre'], datos['apellidos'], datos['cedula'],
+                                                           datos['carrera'], datos['rol'], datos['vence']))
+        c.restoreState()
+
+    def generar_pdf(self, datos, modo='horizontal'):
+        """PDF con el anverso y el reverso, con la misma disposición que generar_pdf_en_memoria."""
+        buffer = BytesIO()
+        c = canvas.Canvas(buffer, pagesize=letter)
+        pos_anverso, pos_reverso = posiciones_pagina(modo)
+        self.dibujar_anverso(c, *pos_anverso, datos)
+        reverso = imagen_pdf_jpeg(RUTA_REVERSO)
+        if reverso is not None:
+            dibujar_reverso(c, pos_reverso[0], pos_reverso[1], reverso)
+        c.showPage()
+        c.save()
+        buffer.seek(0)
+        return buffer
+
+
+# Generador compartido por todas las solicitudes del proceso
+_generador = None
+
+def obtener_generador_vectorial():
+    global _generador
+    if _generador is None:
+        configurar_reportlab()
+        _generador = CarnetVectorial()
+    return _generador
+
+
+def foto_carnet(carnet, carpeta_fotos=CARPETA_FOTOS):
+    """Foto con la que se emitió el carnet: la del almacén o, en los anteriores, la subida con su cédula."""
+    if carnet.foto_hash:
+        foto = AlmacenFotos(carpeta_fotos).ruta(carnet.foto_hash)
+        if os.path.isfile(foto):
+            return foto
+    return foto_previa(carnet.cedula, carpeta_fotos)
+
+
+def pdf_vectorial(carnet, carpeta_fotos=CARPETA_FOTOS, modo='horizontal'):
+    """
+    PDF del carnet registrado, dibujado a partir de los datos del estudiante y su
+    foto subida (no necesita la imagen PNG del carnet).
+    Devuelve None si no se puede volver a dibujar exactamente el carnet emitido: sin
+    huella (registros anteriores), si la foto ya no está o si los datos cambiaron
+    desde la emisión (nombre, carrera, rol...). Entonces se entrega la imagen guardada.
+    """
+    if not carnet.huella:
+        return None
+    foto = foto_carnet(carnet, carpeta_fotos)
+    if foto is None:
+        return None
+
+    estudiante, rol = buscar_estudiante(carnet.cedula)
+    if not estudiante:
+        raise ValueError(f"No se encontró estudiante con cédula {carnet.cedula}")
+    rol = rol or "ESTUDIANTE"
+
+    datos = obtener_generador().preparar_datos(estudiante, rol, foto, carnet.fecha_emision)
+    if huella_carnet(datos) != carnet.huella:
+        return None
+    return obtener_generador_vectorial().generar_pdf(datos, modo)
@@ -0,0 +1,58 @@
+# services/card_generator/huella.py
+import hashlib
+import os
+from ...models.carnet import Carnet, ultimos_carnets
+from .assets import obtener_assets
+from .encoding import obtener_salida
+from .photo_store import hash_archivo, hash_de_ruta
+
+# Subir cuando cambie el dibujo del carnet (posiciones, colores, QR, etc.):
+# invalida las huellas de todos los carnets emitidos
+VERSION_RENDER = 2
+
+# Campos de preparar_datos() que se dibujan en el carnet (qr: el código firmado)
+CAMPOS_RENDER = ('nombre', 'apellidos', 'cedula', 'rol', 'carrera', 'vence', 'qr')
+
+
+def huella_carnet(datos):
+    """
+    Huella de todo lo que determina la imagen del carnet: los campos dibujados,
+    el contenido de la foto, la versión del dibujo, los recursos (plantilla y
+    fuentes) y el formato de salida. Dos solicitudes con la misma huella
+    producirían exactamente el mismo archivo.
+    datos: el diccionario de CarnetGenerator.preparar_datos().
+    """
+    salida = obtener_salida()
+    partes = [
+        f"v{VERSION_RENDER}",
+        obtener_assets().version,
+        salida.formato, str(salida.nivel_png), str(salida.colores), str(salida.calidad_webp),
+        str(salida.metodo_webp), str(salida.metodo_webp_sin_perdida), str(salida.ancho_miniatura),
+        # Las fotos del almacén se llaman por su hash; las demás se leen
+        hash_de_ruta(datos['foto']) or hash_archivo(datos['foto']) or 'sin-foto',
+    ]
+    partes += [str(datos.get(campo) if datos.get(campo) is not None else '').strip() for campo in CAMPOS_RENDER]
+    return hashlib.sha256('\x1f'.join(partes).encode('utf-8')).hexdigest()
+
+
+def _vigente(carnet, huella):
+    if carnet is None or carnet.huella != huella:
+        return None
+    return carnet if carnet.ruta_imagen and os.path.isfile(carnet.ruta_imagen) else None
+
+
+def carnet_reutilizable(cedula, huella):
+    """Último carnet de la cédula si tiene la misma huella y su imagen sigue en disco."""
+    ultimo = Carnet.query.filter_by(cedula=cedula).order_by(Carnet.fecha_emision.desc()).first()
+    return _vigente(ultimo, huella)
+
+
+def carnets_reutilizables(huellas):
+    """Versión por lotes: recibe cédula -> huella y devuelve cédula -> carnet reutilizable."""
+    ultimos = ultimos_carnets(huellas.keys())
+    reutilizables = {}
+    for cedula, huella in huellas.items():
+        carnet = _vigente(ultimos.get(str(cedula)), huella)
+        if carnet is not None:
+            reutilizables[cedula] = carnet
+    return reutilizables
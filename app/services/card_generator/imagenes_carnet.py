@@ -0,0 +1,157 @@
+# services/card_generator/imagenes_carnet.py
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+from urllib.parse import quote
+from flask import current_app, request, send_file, Response
+from werkzeug.http import http_date, is_resource_modified
+from ...models.carnet import Carnet
+from ...models.user import db
+from .encoding import mimetype_carnet, ruta_miniatura
+
+# Modos de entrega por el proxy (CARNET_SENDFILE)
+MODOS_SENDFILE = ('', 'x-accel', 'x-sendfile')
+
+
+def candidatas(carnet):
+    """Ubicaciones posibles de la imagen de un carnet (registros antiguos guardan rutas relativas)."""
+    rutas = [carnet.ruta_imagen]
+    if carnet.ruta_imagen and not os.path.isabs(carnet.ruta_imagen):
+        rutas += [
+            os.path.join('app', carnet.ruta_imagen),                     # Desde directorio app
+            os.path.join('app/assets', 'carnets', f"{carnet.cedula}.png")  # Directorio específico
+        ]
+    return [r for r in rutas if r]
+
+
+class ImagenesCarnet:
+    """
+    Entrega de /api/carnet/imagen/<id>.
+    La ruta de cada carnet se resuelve una sola vez (y se guarda normalizada en
+    la tabla); después cada solicitud es un os.stat, que da el ETag y el
+    Last-Modified para responder 304 sin abrir el archivo. Opcionalmente la
+    transferencia se delega al proxy (X-Accel-Redirect de nginx o X-Sendfile).
+    """
+    def __init__(self, max_entradas=8192, max_age=0, sendfile='', raiz_sendfile=None, prefijo_sendfile='/_carnets/'):
+        if sendfile not in MODOS_SENDFILE:
+            raise ValueError(f"Modo de sendfile no soportado: {sendfile}")
+        self.max_entradas = max_entradas
+        self.max_age = max_age
+        self.sendfile = sendfile
+        self.raiz_sendfile = os.path.abspath(raiz_sendfile) if raiz_sendfile else None
+        self.prefijo_sendfile = prefijo_sendfile.rstrip('/') + '/'
+        self._rutas = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _resolver(self, carnet_id):
+        """Busca el carnet y su imagen en disco; guarda la ruta absoluta si cambió."""
+        carnet = Carnet.query.get(carnet_id)
+        if not carnet:
+            return None
+        ruta = next((r for r in candidatas(carnet) if os.path.isfile(r)), None)
+        if ruta is None:
+            return None
+
+        ruta = os.path.normpath(os.path.abspath(ruta))
+        if carnet.ruta_imagen != ruta:
+            carnet.ruta_imagen = ruta
+            try:
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                current_app.logger.warning("No se pudo normalizar la ruta del carnet %s: %s", carnet_id, e)
+        return ruta
+
+    def ruta(self, carnet_id):
+        """Ruta absoluta de la imagen y su os.stat, o (None, None) si no existe."""
+        with self._lock:
+            ruta = self._rutas.get(carnet_id)
+            if ruta is not None:
+                self._rutas.move_to_end(carnet_id)
+        if ruta is not None:
+            try:
+                return ruta, os.stat(ruta)
+            except OSError:
+                self.invalidar(carnet_id)
+
+        ruta = self._resolver(carnet_id)
+        if ruta is None:
+            return None, None
+        with self._lock:
+            self._rutas[carnet_id] = ruta
+            while len(self._rutas) > self.max_entradas:
+                self._rutas.popitem(last=False)
+        return ruta, os.stat(ruta)
+
+    def invalidar(self, carnet_id=None):
+        with self._lock:
+            if carnet_id is None:
+                self._rutas.clear()
+            else:
+                self._rutas.pop(carnet_id, None)
+
+    def _cache_control(self, respuesta):
+        # Imágenes personales: solo el navegador las guarda, y con max_age 0 revalida siempre
+        respuesta.cache_control.public = False
+        respuesta.cache_control.private = True
+        if self.max_age > 0:
+            respuesta.cache_control.no_cache = None
+            respuesta.cache_control.max_age = self.max_age
+        else:
+            respuesta.cache_control.no_cache = True
+        return respuesta
+
+    def _ruta_proxy(self, ruta):
+        """URI interna para X-Accel-Redirect (None si el archivo queda fuera de la raíz)."""
+        if not self.raiz_sendfile:
+            return None
+        relativa = os.path.relpath(ruta, self.raiz_sendfile)
+        if relativa.startswith('..'):
+            return None
+        return self.prefijo_sendfile + quote(relativa.replace(os.sep, '/'))
+
+    def responder(self, carnet_id, miniatura=False):
+        """Respuesta para la imagen del carnet (o su miniatura, si se pidió y existe)."""
+        ruta, stat = self.ruta(carnet_id)
+        if ruta is None:
+            return None
+
+        if miniatura:
+            try:
+                ruta_min = ruta_miniatura(ruta)
+                ruta, stat = ruta_min, os.stat(ruta_min)
+            except OSError:
+                pass
+
+        # Cambia con cada reescritura del archivo (los carnets se regeneran en el mismo lugar)
+        etag = f"{stat.st_ino:x}-{stat.st_mtime_ns:x}-{stat.st_size:x}"
+        modificado = datetime.fromtimestamp(int(stat.st_mtime), timezone.utc)
+        mimetype = mimetype_carnet(ruta)
+        interna = self._ruta_proxy(ruta) if self.sendfile == 'x-accel' else None
+
+        if not is_resource_modified(request.environ, etag=etag, last_modified=modificado):
+            respuesta = Response(status=304)
+        elif interna:
+            respuesta = Response(mimetype=mimetype)
+            respuesta.headers['X-Accel-Redirect'] = interna
+        elif self.sendfile == 'x-sendfile':
+            respuesta = Response(mimetype=mimetype)
+            respuesta.headers['X-Sendfile'] = ruta
+        else:
+            respuesta = send_file(ruta, mimetype=mimetype, etag=False, last_modified=modificado)
+
+        respuesta.set_etag(etag)
+        respuesta.headers['Last-Modified'] = http_date(modificado)
+        return self._cache_control(respuesta)
+
+
+def init_imagenes(app):
+    app.extensions['imagenes_carnet'] = ImagenesCarnet(
+        max_entradas=app.config['CARNET_IMAGEN_RUTAS'],
+        max_age=app.config['CARNET_IMAGEN_MAX_AGE'],
+        sendfile=app.config['CARNET_SENDFILE'],
+        raiz_sendfile=app.config['CARNET_SENDFILE_RAIZ'],
+        prefijo_sendfile=app.config['CARNET_SENDFILE_PREFIJO'],
+    )
+    return app.extensions['imagenes_carnet']
@@ -0,0 +1,137 @@
+# services/card_generator/imposicion.py
+import os
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from reportlab.pdfgen import canvas
+from reportlab.lib.pagesizes import letter, A4
+from reportlab.lib.units import mm
+from ..pdf_generator import configurar_reportlab
+from .assets import RUTA_REVERSO
+from .carnet_pdf import CARNET_WIDTH, CARNET_HEIGHT, obtener_reverso, dibujar_reverso
+from ..streaming import SalidaZip
+
+PAGINAS = {'carta': letter, 'a4': A4}
+
+# Hojas por archivo PDF en las tiradas grandes (cada parte embebe el reverso una vez)
+HOJAS_POR_PARTE = 50
+
+# Marcas de corte: distancia al borde del carnet y largo
+_SEPARACION_MARCA = 1 * mm
+_LARGO_MARCA = 2 * mm
+
+
+class Imposicion:
+    """
+    Distribuye varios carnets por hoja a su tamaño real. Con duplex, cada hoja de
+    anversos va seguida de una de reversos en las posiciones espejadas, para que
+    al imprimir a doble cara cada reverso caiga detrás de su anverso.
+    volteo: 'largo' (borde largo, se espejan las columnas) o 'corto' (se espejan las filas).
+    """
+    def __init__(self, pagina='carta', margen=10 * mm, separacion=4 * mm, duplex=True,
+                 volteo='largo', marcas_corte=True, ancho=CARNET_WIDTH, alto=CARNET_HEIGHT):
+        if pagina not in PAGINAS:
+            raise ValueError(f"Tamaño de página no soportado: {pagina}")
+        if volteo not in ('largo', 'corto'):
+            raise ValueError("El volteo debe ser 'largo' o 'corto'")
+
+        self.pagina = PAGINAS[pagina]
+        self.duplex = duplex
+        self.marcas_corte = marcas_corte
+        self.ancho = ancho
+        self.alto = alto
+
+        ancho_pagina, alto_pagina = self.pagina
+        self.columnas = int((ancho_pagina - 2 * margen + separacion) // (ancho + separacion))
+        self.filas = int((alto_pagina - 2 * margen + separacion) // (alto + separacion))
+        if self.columnas < 1 or self.filas < 1:
+            raise ValueError("El carnet no cabe en la página con esos márgenes")
+
+        # Rejilla centrada; posiciones de arriba a la izquierda hacia abajo a la derecha
+        x0 = (ancho_pagina - (self.columnas * (ancho + separacion) - separacion)) / 2
+        y0 = (alto_pagina + (self.filas * (alto + separacion) - separacion)) / 2 - alto
+        celdas = [(fila, col) for fila in range(self.filas) for col in range(self.columnas)]
+
+        def posicion(fila, col):
+            return x0 + col * (ancho + separacion), y0 - fila * (alto + separacion)
+
+        self.posiciones = [posicion(fila, col) for fila, col in celdas]
+        if volteo == 'largo':
+            self.posiciones_reverso = [posicion(fila, self.columnas - 1 - col) for fila, col in celdas]
+        else:
+            self.posiciones_reverso = [posicion(self.filas - 1 - fila, col) for fila, col in celdas]
+
+    @property
+    def por_hoja(self):
+        return self.columnas * self.filas
+
+    def hojas_necesarias(self, cantidad):
+        return -(-cantidad // self.por_hoja)
+
+    def _marcas(self, c, x, y):
+        s, l = _SEPARACION_MARCA, _LARGO_MARCA
+        for cx, dx in ((x, -1), (x + self.ancho, 1)):
+            for cy, dy in ((y, -1), (y + self.alto, 1)):
+                c.line(cx + dx * s, cy, cx + dx * (s + l), cy)
+                c.line(cx, cy + dy * s, cx, cy + dy * (s + l))
+
+    def dibujar(self, c, anversos, reverso=None):
+        """Dibuja las hojas (anversos y, con duplex, reversos) de la lista de imágenes."""
+        c.setLineWidth(0.25)
+        for inicio in range(0, len(anversos), self.por_hoja):
+            hoja = anversos[inicio:inicio + self.por_hoja]
+            for ruta, (x, y) in zip(hoja, self.posiciones):
+                c.drawImage(ruta, x, y, width=self.ancho, height=self.alto)
+                if self.marcas_corte:
+                    self._marcas(c, x, y)
+            c.showPage()
+
+            if self.duplex and reverso is not None:
+                for x, y in self.posiciones_reverso[:len(hoja)]:
+                    dibujar_reverso(c, x, y, reverso)
+                c.showPage()
+
+    def generar_pdf(self, anversos, ruta_reverso=RUTA_REVERSO):
+        configurar_reportlab()
+        buffer = BytesIO()
+        c = canvas.Canvas(buffer, pagesize=self.pagina)
+        self.dibujar(c, anversos, obtener_reverso(ruta_reverso) if self.duplex else None)
+        c.save()
+        return buffer.getvalue()
+
+
+def _generar_parte(imposicion, anversos):
+    # Se ejecuta en los procesos del pool
+    return imposicion.generar_pdf(anversos)
+
+
+def stream_partes_zip(anversos, imposicion, hojas_por_parte=HOJAS_POR_PARTE, workers=None):
+    """
+    Tiradas grandes: divide los carnets en PDF de hojas_por_parte hojas, los genera
+    en paralelo y va entregando el ZIP en orden a medida que cada parte termina.
+    Solo hay unas pocas partes en memoria a la vez.
+    """
+    por_parte = imposicion.por_hoja * hojas_por_parte
+    partes = [anversos[i:i + por_parte] for i in range(0, len(anversos), por_parte)]
+    workers = workers or os.cpu_count() or 1
+    salida = SalidaZip()
+
+    with zipfile.ZipFile(salida, 'w', compression=zipfile.ZIP_STORED) as archivo, \
+            ProcessPoolExecutor(max_workers=workers) as pool:
+        en_vuelo = deque()
+        siguientes = iter(enumerate(partes, 1))
+        for numero, parte in siguientes:
+            en_vuelo.append((numero, pool.submit(_generar_parte, imposicion, parte)))
+            if len(en_vuelo) >= workers * 2:
+                break
+
+        while en_vuelo:
+            numero, futuro = en_vuelo.popleft()
+            archivo.writestr(f"carnets_{numero:03d}.pdf", futuro.result())
+            siguiente = next(siguientes, None)
+            if siguiente is not None:
+                en_vuelo.append((siguiente[0], pool.submit(_generar_parte, imposicion, siguiente[1])))
+            yield salida.vaciar()
+
+    yield salida.vaciar()
@@ -0,0 +1,162 @@
+# services/card_generator/listado.py
+"""
+Listado de carnets de todos los estudiantes, del más reciente al más antiguo,
+paginado por clave: cada página termina con un cursor (fecha_emision e id del
+último carnet) y la siguiente empieza con WHERE (fecha_emision, id) < cursor, que
+recorre ix_carnets_fecha desde ese punto sin importar en qué página se esté (con
+OFFSET, SQLite tendría que saltar todas las filas anteriores).
+
+Los filtros de núcleo, carrera, sección y periodo, y los campos del estudiante, se
+toman de ESTUDIANTES; la unión solo se agrega si se piden. La página se escribe como
+JSON a medida que se leen las filas.
+"""
+import base64
+import json
+from datetime import date
+from sqlalchemy import text
+from ...models.student import FILTROS_ESTUDIANTE
+
+# Campos que se pueden pedir (?campos=...): nombre -> expresión SQL
+CAMPOS_CARNET = {
+    'id': 'c.id',
+    'cedula': 'c.cedula',
+    'fecha_emision': 'c.fecha_emision',
+    'fecha_vencimiento': 'c.fecha_vencimiento',
+    'ruta_imagen': 'c.ruta_imagen',
+    'huella': 'c.huella',
+    'foto_hash': 'c.foto_hash',
+}
+CAMPOS_ESTUDIANTE = {
+    'apellido': 'trim(e.apellido)',
+    'nombre': 'trim(e.nombre)',
+    'carrera': 'trim(e.carrera)',
+    'seccion': 'trim(e.seccion)',
+    'periodo': 'trim(e.periodo)',
+    'nucleo': 'trim(e.nucleo)',
+}
+CAMPOS_DEFECTO = ('id', 'cedula', 'fecha_emision', 'fecha_vencimiento', 'ruta_imagen')
+
+LIMITE_DEFECTO = 100
+LIMITE_MAXIMO = 10000
+
+# Filas que se leen del cursor (y se escriben) por vez
+FILAS_POR_BLOQUE = 500
+
+
+class ListadoInvalido(ValueError):
+    """Parámetros del listado inválidos (campo, fecha, límite o cursor)."""
+
+
+def codificar_cursor(fecha_emision, carnet_id):
+    crudo = json.dumps([fecha_emision, carnet_id], separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(crudo).decode('ascii').rstrip('=')
+
+
+def leer_cursor(cursor):
+    """Cursor de la página anterior -> (fecha_emision, id); lanza ListadoInvalido."""
+    try:
+        crudo = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        fecha_emision, carnet_id = json.loads(crudo)
+        if not isinstance(fecha_emision, str) or not isinstance(carnet_id, int):
+            raise ValueError
+    except (ValueError, TypeError):
+        raise ListadoInvalido('Cursor inválido')
+    return fecha_emision, carnet_id
+
+
+def leer_campos(valor):
+    """'id,cedula,carrera' -> ['id', 'cedula', 'carrera']; sin valor, CAMPOS_DEFECTO."""
+    if not valor:
+        return list(CAMPOS_DEFECTO)
+    campos = list(dict.fromkeys(campo.strip() for campo in valor.split(',') if campo.strip()))
+    desconocidos = [campo for campo in campos if campo not in CAMPOS_CARNET and campo not in CAMPOS_ESTUDIANTE]
+    if desconocidos:
+        raise ListadoInvalido(f"Campo no soportado: {', '.join(desconocidos)}")
+    return campos
+
+
+def _fecha(valor, nombre):
+    try:
+        return date.fromisoformat(valor.strip()).isoformat()
+    except ValueError:
+        raise ListadoInvalido(f'{nombre} debe tener el formato AAAA-MM-DD')
+
+
+def consulta_listado(campos, filtros=None, cedula=None, desde=None, hasta=None, cursor=None, limite=LIMITE_DEFECTO):
+    """SQL y parámetros de una página (se pide una fila de más para saber si hay otra página)."""
+    if not 1 <= limite <= LIMITE_MAXIMO:
+        raise ListadoInvalido(f'limite debe estar entre 1 y {LIMITE_MAXIMO}')
+
+    # Las columnas del cursor siempre se leen, aunque no se devuelvan
+    seleccion = [f'{CAMPOS_CARNET.get(campo) or CAMPOS_ESTUDIANTE[campo]} AS {campo}' for campo in campos]
+    seleccion += ['c.fecha_emision AS _fecha_cursor', 'c.id AS _id_cursor']
+    condiciones, parametros = [], {}
+    union = any(campo in CAMPOS_ESTUDIANTE for campo in campos)
+
+    for campo in FILTROS_ESTUDIANTE:
+        valor = (filtros or {}).get(campo)
+        if valor is None or str(valor).strip() == '':
+            continue
+        condiciones.append(f'lower(trim(e.{campo})) = :{campo}')
+        parametros[campo] = str(valor).strip().lower()
+        union = True
+    if cedula:
+        condiciones.append('c.cedula = :cedula')
+        parametros['cedula'] = str(cedula).strip()
+    if desde:
+        condiciones.append('c.fecha_emision >= :desde')
+        parametros['desde'] = _fecha(desde, 'desde')
+    if hasta:
+        condiciones.append("c.fecha_emision < date(:hasta, '+1 day')")
+        parametros['hasta'] = _fecha(hasta, 'hasta')
+    if cursor:
+        parametros['cursor_fecha'], parametros['cursor_id'] = leer_cursor(cursor)
+        condiciones.append('(c.fecha_emision, c.id) < (:cursor_fecha, :cursor_id)')
+
+    # Un carnet con un solo estudiante aunque la cédula esté repetida en ESTUDIANTES (como .first()).
+    # La cédula se compara sin convertir: e.cedula es INTEGER, SQLite convierte a número
+    # el lado de carnets (TEXT) y la búsqueda usa ix_estudiantes_cedula.
+    estudiante = ('LEFT JOIN "ESTUDIANTES" e ON e.rowid = '
+                  '(SELECT e2.rowid FROM "ESTUDIANTES" e2 WHERE e2.cedula = c.cedula LIMIT 1)') if union else ''
+    donde = f"WHERE {' AND '.join(condiciones)}" if condiciones else ''
+    parametros['limite'] = limite + 1
+    sql = f"""
+    SELECT {', '.join(seleccion)}
+    FROM carnets c
+    {estudiante}
+    {donde}
+    ORDER BY c.fecha_emision DESC, c.id DESC
+    LIMIT :limite
+    """
+    return sql, parametros
+
+
+def stream_listado(engine, campos, limite=LIMITE_DEFECTO, **opciones):
+    """
+    Página del listado como JSON (generador de texto):
+    {"carnets": [...], "cantidad": n, "siguiente": cursor o null}.
+    Valida los parámetros antes de devolver el generador (lanza ListadoInvalido).
+    """
+    sql, parametros = consulta_listado(campos, limite=limite, **opciones)
+
+    def generar():
+        yield '{"carnets": ['
+        cantidad, ultimo, hay_mas = 0, None, False
+        with engine.connect() as conn:
+            resultado = conn.execution_options(stream_results=True, yield_per=FILAS_POR_BLOQUE) \
+                .execute(text(sql), parametros)
+            for bloque in resultado.partitions():
+                partes = []
+                for fila in bloque:
+                    if cantidad == limite:
+                        hay_mas = True  # la fila de más
+                        break
+                    partes.append(json.dumps(dict(zip(campos, fila)), ensure_ascii=False, default=str))
+                    ultimo = fila
+                    cantidad += 1
+                if partes:
+                    yield (',' if cantidad > len(partes) else '') + ','.join(partes)
+        siguiente = codificar_cursor(ultimo._fecha_cursor, ultimo._id_cursor) if hay_mas else None
+        yield f'], "cantidad": {cantidad}, "siguiente": {json.dumps(siguiente)}}}'
+
+    return generar()
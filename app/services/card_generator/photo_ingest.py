@@ -0,0 +1,79 @@
+# services/card_generator/photo_ingest.py
+import os
+from PIL import Image, ImageOps
+from .assets import TAM_FOTO
+from ..metrics import medir
+
+# Formatos aceptados según la cabecera del archivo (no según la extensión)
+FORMATOS_PERMITIDOS = {'JPEG', 'PNG'}
+
+# Límites de la foto original
+MAX_BYTES_FOTO = 15 * 1024 * 1024
+MAX_LADO_FOTO = 10000
+MAX_PIXELES_FOTO = 50_000_000
+
+
+class FotoInvalidaError(ValueError):
+    """La foto subida no es una imagen válida o excede los límites."""
+
+
+def _abrir_reducida(origen, tam):
+    """
+    Abre la imagen leyendo solo la cabecera, valida formato y dimensiones y,
+    para JPEG, pide al decodificador una versión reducida (draft) cercana al
+    tamaño final en lugar de decodificar la foto a resolución completa.
+    """
+    try:
+        img = Image.open(origen)
+    except Exception:
+        raise FotoInvalidaError("El archivo no es una imagen válida")
+
+    if img.format not in FORMATOS_PERMITIDOS:
+        img.close()
+        raise FotoInvalidaError("Formato de imagen no permitido (solo JPEG o PNG)")
+
+    ancho, alto = img.size
+    if ancho > MAX_LADO_FOTO or alto > MAX_LADO_FOTO or ancho * alto > MAX_PIXELES_FOTO:
+        img.close()
+        raise FotoInvalidaError(f"La foto es demasiado grande ({ancho}x{alto})")
+
+    if img.format == 'JPEG':
+        img.draft('RGB', tam)
+    return img
+
+
+def abrir_foto(ruta, tam=TAM_FOTO):
+    """
+    Abre una foto para el carnet ya ajustada al tamaño del marco.
+    Las fotos normalizadas al subirlas se devuelven sin redimensionar.
+    """
+    with medir('carnet.foto_decodificar'):
+        original = _abrir_reducida(ruta, tam)
+        try:
+            original.load()
+        except Exception:
+            original.close()
+            raise
+    with original, medir('carnet.foto_ajustar'):
+        img = original.resize(tam, reducing_gap=2.0) if original.size != tam else original
+        return img.convert('RGBA')
+
+
+def normalizar_foto(origen, destino, tam=TAM_FOTO):
+    """
+    Valida la foto subida (un archivo o stream) y la guarda en destino ya
+    normalizada al tamaño de la foto del carnet, en PNG.
+    El original nunca se escribe en disco.
+    """
+    with _abrir_reducida(origen, tam) as img:
+        try:
+            img = ImageOps.exif_transpose(img)
+            img = img.convert('RGB').resize(tam, reducing_gap=2.0)
+        except Exception:
+            raise FotoInvalidaError("No se pudo decodificar la foto")
+
+    os.makedirs(os.path.dirname(destino) or '.', exist_ok=True)
+    temporal = f"{destino}.{os.getpid()}.tmp"
+    img.save(temporal, format='PNG')
+    os.replace(temporal, destino)
+    return destino
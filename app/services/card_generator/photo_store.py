@@ -0,0 +1,224 @@
+# services/card_generator/photo_store.py
+import hashlib
+import os
+import re
+import time
+import uuid
+from collections import Counter
+from .encoding import SUFIJO_MINIATURA, base_imagen
+from .photo_ingest import normalizar_foto
+from ...models.carnet import Carnet
+from ...models.user import db
+
+# Carpeta de las fotos subidas (la misma que usan la ruta /generar y la generación masiva)
+CARPETA_FOTOS = 'uploads/fotos'
+
+# Subcarpeta de las fotos que se están normalizando (todavía sin hash)
+_ENTRANTES = '.entrantes'
+_EXTENSION = '.png'
+_HASH = re.compile(r'^[0-9a-f]{64}$')
+_BLOQUE = 1024 * 1024
+
+
+def hash_archivo(ruta):
+    """sha256 del contenido del archivo, o None si no existe."""
+    if not ruta or not os.path.isfile(ruta):
+        return None
+    digest = hashlib.sha256()
+    with open(ruta, 'rb') as archivo:
+        while bloque := archivo.read(_BLOQUE):
+            digest.update(bloque)
+    return digest.hexdigest()
+
+
+def hash_de_ruta(ruta):
+    """Hash de la foto si la ruta es de un almacén de fotos ("<hash>.png"), si no None."""
+    if not ruta:
+        return None
+    nombre, extension = os.path.splitext(os.path.basename(ruta))
+    return nombre if extension == _EXTENSION and _HASH.match(nombre) else None
+
+
+class AlmacenFotos:
+    """
+    Fotos normalizadas guardadas por el sha256 de su contenido, repartidas en
+    subcarpetas por los primeros caracteres del hash (<raíz>/ab/cd/<hash>.png)
+    para que ninguna carpeta crezca demasiado. La misma foto subida dos veces
+    ocupa un solo archivo; los carnets la referencian por carnets.foto_hash.
+    """
+    def __init__(self, raiz=CARPETA_FOTOS):
+        self.raiz = raiz
+
+    def ruta(self, foto_hash):
+        return os.path.join(self.raiz, foto_hash[:2], foto_hash[2:4], foto_hash + _EXTENSION)
+
+    def guardar(self, origen):
+        """
+        Valida y normaliza la foto (archivo o stream) y la guarda por su hash.
+        Devuelve la ruta final. Lanza FotoInvalidaError si la foto no es válida.
+        """
+        temporal = os.path.join(self.raiz, _ENTRANTES, f"{uuid.uuid4().hex}{_EXTENSION}")
+        normalizar_foto(origen, temporal)
+        try:
+            destino = self.ruta(hash_archivo(temporal))
+            if os.path.exists(destino):
+                # Ya estaba: se renueva la fecha para que el recolector no la tome como antigua
+                os.utime(destino)
+            else:
+                os.makedirs(os.path.dirname(destino), exist_ok=True)
+                os.replace(temporal, destino)
+        finally:
+            if os.path.exists(temporal):
+                os.remove(temporal)
+        return destino
+
+    def fotos(self):
+        """Recorre el almacén: (hash, ruta, os.stat) de cada foto."""
+        if not os.path.isdir(self.raiz):
+            return
+        for nivel1 in os.scandir(self.raiz):
+            if not nivel1.is_dir() or nivel1.name == _ENTRANTES:
+                continue
+            for nivel2 in os.scandir(nivel1.path):
+                if not nivel2.is_dir():
+                    continue
+                for entrada in os.scandir(nivel2.path):
+                    foto_hash = hash_de_ruta(entrada.name)
+                    if foto_hash and entrada.is_file():
+                        yield foto_hash, entrada.path, entrada.stat()
+
+    def entrantes(self):
+        """Temporales de normalización (quedan si el proceso se interrumpió)."""
+        carpeta = os.path.join(self.raiz, _ENTRANTES)
+        if not os.path.isdir(carpeta):
+            return
+        for entrada in os.scandir(carpeta):
+            if entrada.is_file():
+                yield entrada.path, entrada.stat()
+
+    def anteriores(self):
+        """Fotos del formato anterior, sueltas en la raíz ("<cédula>.png")."""
+        if not os.path.isdir(self.raiz):
+            return
+        for entrada in os.scandir(self.raiz):
+            if entrada.is_file():
+                cedula = entrada.name.rsplit('.', 1)[0].split('_', 1)[0].strip()
+                yield cedula, entrada.path, entrada.stat()
+
+
+_almacen = None
+
+def obtener_almacen():
+    global _almacen
+    if _almacen is None:
+        _almacen = AlmacenFotos()
+    return _almacen
+
+
+def _ultimos_por_cedula(filas):
+    ultimos = {}
+    for fila in filas:
+        actual = ultimos.get(str(fila.cedula))
+        if actual is None or (fila.fecha_emision, fila.id) > (actual.fecha_emision, actual.id):
+            ultimos[str(fila.cedula)] = fila
+    return ultimos
+
+
+def _normalizada(ruta):
+    return os.path.normpath(os.path.abspath(ruta)) if ruta else None
+
+
+def recolectar(almacen, carpeta_carnets, presupuesto=None, gracia=3600, simular=False):
+    """
+    Libera espacio de las fotos y de los carnets generados. Las referencias se
+    cuentan a partir de las filas de carnets (foto_hash y ruta_imagen).
+    Siempre se borran, si tienen más de `gracia` segundos:
+      - fotos del almacén sin ningún carnet que las use (subidas huérfanas)
+      - temporales de normalización abandonados
+      - fotos del formato anterior de cédulas cuyo último carnet ya usa el almacén
+      - imágenes de carnet (y miniaturas) reemplazadas por otro archivo en el
+        último carnet de su cédula (otra emisión, o después de cambiar CARNET_FORMATO)
+    Si con eso el total sigue por encima de `presupuesto` (bytes), se borran además
+    las fotos que solo usan carnets anteriores al último de cada cédula, de la más
+    antigua a la más reciente.
+    Devuelve un reporte con lo borrado; con simular=True no borra nada.
+    """
+    ahora = time.time()
+    filas = db.session.query(Carnet.id, Carnet.cedula, Carnet.fecha_emision,
+                             Carnet.foto_hash, Carnet.ruta_imagen).all()
+    referencias = Counter(fila.foto_hash for fila in filas if fila.foto_hash)
+    ultimos = _ultimos_por_cedula(filas)
+    fotos_vigentes = {fila.foto_hash for fila in ultimos.values() if fila.foto_hash}
+    imagenes_vigentes = {str(cedula): _normalizada(fila.ruta_imagen) for cedula, fila in ultimos.items()}
+
+    reporte = Counter()
+    total = 0
+
+    def borrar(ruta, tamano, motivo):
+        reporte[motivo] += 1
+        reporte['bytes_liberados'] += tamano
+        if not simular:
+            try:
+                os.remove(ruta)
+            except FileNotFoundError:
+                pass
+
+    def antiguo(stat):
+        return ahora - stat.st_mtime > gracia
+
+    # Fotos del almacén
+    reemplazadas = []
+    for foto_hash, ruta, stat in list(almacen.fotos()):
+        if referencias[foto_hash] == 0:
+            if antiguo(stat):
+                borrar(ruta, stat.st_size, 'fotos_huerfanas')
+                continue
+        elif foto_hash not in fotos_vigentes:
+            reemplazadas.append((stat.st_mtime, ruta, stat.st_size))
+        total += stat.st_size
+
+    for ruta, stat in list(almacen.entrantes()):
+        if antiguo(stat):
+            borrar(ruta, stat.st_size, 'temporales')
+        else:
+            total += stat.st_size
+
+    # Fotos del formato anterior ("<cédula>.png" en la raíz)
+    for cedula, ruta, stat in list(almacen.anteriores()):
+        ultimo = ultimos.get(cedula)
+        if ultimo is not None and ultimo.foto_hash and antiguo(stat):
+            borrar(ruta, stat.st_size, 'fotos_anteriores')
+        else:
+            total += stat.st_size
+
+    # Imágenes de carnet ("<cédula>_<huella>.<ext>" o "<cédula>.<ext>", y su miniatura)
+    if os.path.isdir(carpeta_carnets):
+        for entrada in list(os.scandir(carpeta_carnets)):
+            if not entrada.is_file():
+                continue
+            stat = entrada.stat()
+            base = base_imagen(entrada.name)
+            vigente = imagenes_vigentes.get(base.split('_', 1)[0])
+            if vigente is None:
+                reemplazada = False
+            elif entrada.name.endswith(SUFIJO_MINIATURA):
+                # La miniatura se conserva mientras sea la de la imagen vigente (cualquier formato)
+                reemplazada = base != base_imagen(vigente)
+            else:
+                reemplazada = vigente != _normalizada(entrada.path)
+            if reemplazada and antiguo(stat):
+                borrar(entrada.path, stat.st_size, 'carnets_reemplazados')
+            else:
+                total += stat.st_size
+
+    # Presupuesto: fotos que solo usan carnets anteriores, de la más antigua a la más nueva
+    if presupuesto is not None:
+        for _, ruta, tamano in sorted(reemplazadas):
+            if total <= presupuesto:
+                break
+            borrar(ruta, tamano, 'fotos_por_presupuesto')
+            total -= tamano
+
+    reporte['bytes_totales'] = total
+    reporte['simulado'] = simular
+    return dict(reporte)
@@ -0,0 +1,60 @@
+# services/card_generator/qr.py
+from functools import lru_cache
+from io import BytesIO
+from PIL import Image
+import qrcode
+from qrcode.constants import ERROR_CORRECT_H, ERROR_CORRECT_L
+
+# Tamaño y posición del QR sobre el carnet
+TAM_QR = (100, 100)
+POS_QR = (470, 780)
+
+# Cantidad de códigos distintos que se conservan por proceso
+MAX_QR_CACHE = 2048
+
+
+@lru_cache(maxsize=MAX_QR_CACHE)
+def matriz_qr(contenido, correccion=ERROR_CORRECT_H, borde=2):
+    """
+    Matriz de módulos del QR (incluido el borde) como (lado, bytes): un byte por
+    módulo, 0 = oscuro y 255 = claro. Se calcula una sola vez por contenido.
+    """
+    qr = qrcode.QRCode(version=None, error_correction=correccion, border=borde)
+    qr.add_data(contenido)
+    qr.make(fit=True)
+    filas = qr.get_matrix()
+    return len(filas), bytes(0 if modulo else 255 for fila in filas for modulo in fila)
+
+
+def imagen_qr(contenido, tam, correccion=ERROR_CORRECT_H, borde=2):
+    """
+    Rasteriza el QR directamente al tamaño pedido (en escala de grises):
+    cada píxel toma el valor del módulo que cubre, sin suavizado.
+    """
+    lado, datos = matriz_qr(contenido, correccion, borde)
+    return Image.frombytes('L', (lado, lado), datos).resize(tam, Image.NEAREST)
+
+
+def contenido_qr_carnet(nombre, apellidos, cedula, carrera, rol, vence):
+    """Texto codificado en el QR del carnet."""
+    return (
+        f"Nombre: {nombre} {apellidos}\n"
+        f"Cédula: {cedula}\n"
+        f"Carrera: {carrera}\n"
+        f"Rol: {rol}\n"
+        f"Vence: {vence}"
+    )
+
+
+def qr_carnet(nombre, apellidos, cedula, carrera, rol, vence, tam=TAM_QR):
+    """QR del carnet listo para pegar sobre la plantilla."""
+    return imagen_qr(contenido_qr_carnet(nombre, apellidos, cedula, carrera, rol, vence), tam)
+
+
+def qr_png(contenido, box_size=10, borde=4, correccion=ERROR_CORRECT_L):
+    """QR en PNG con módulos de box_size píxeles (BytesIO posicionado al inicio)."""
+    lado, _ = matriz_qr(contenido, correccion, borde)
+    buffer = BytesIO()
+    imagen_qr(contenido, (lado * box_size, lado * box_size), correccion, borde).save(buffer, format='PNG')
+    buffer.seek(0)
+    return buffer
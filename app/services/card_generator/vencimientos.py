@@ -0,0 +1,196 @@
+# services/card_generator/vencimientos.py
+"""
+Reporte de vencimiento de carnets de toda la universidad (o de un núcleo, carrera,
+sección o periodo).
+
+Una sola consulta: ROW_NUMBER() sobre carnets (PARTITION BY cedula, el de emisión
+más reciente primero; usa ix_carnets_cedula_fecha) da el último carnet de cada
+cédula. La cédula se compara sin convertir (e.cedula = u.cedula): e.cedula es
+INTEGER, SQLite convierte a número el lado de carnets (TEXT) y la búsqueda usa
+ix_estudiantes_cedula. Por eso la unión parte de los carnets, y los estudiantes
+sin carnet se agregan aparte (NOT IN). El vencimiento es el mismo de verificar_vigencia:
+lo que ocurra primero entre la fecha impresa (MESES_VIGENCIA meses desde la emisión,
+con el día recortado al fin de mes como relativedelta) y fecha_vencimiento.
+
+Las filas salen ordenadas por núcleo, carrera y sección y se leen del cursor por
+bloques mientras se escribe el CSV o NDJSON, así que la memoria del proceso no
+depende de la cantidad de estudiantes.
+"""
+import csv
+import io
+import json
+from datetime import date, timedelta
+from sqlalchemy import text
+from .verificacion import MESES_VIGENCIA
+from ...models.student import FILTROS_ESTUDIANTE
+
+# Estados del reporte, en el orden de las columnas del resumen
+ESTADOS = ('vigente', 'por_vencer', 'vencido', 'sin_carnet')
+
+COLUMNAS_DETALLE = ('nucleo', 'carrera', 'seccion', 'periodo', 'cedula', 'apellido', 'nombre',
+                    'carnet_id', 'emision', 'vence', 'dias_restantes', 'estado')
+COLUMNAS_RESUMEN = ('nucleo', 'carrera', 'seccion') + ESTADOS + ('total',)
+
+FORMATOS = ('csv', 'ndjson')
+
+# Filas que se leen del cursor (y se escriben) por vez
+FILAS_POR_BLOQUE = 1000
+
+# Fecha impresa: emisión + MESES_VIGENCIA meses; si ese mes no tiene el día de la
+# emisión (31 de agosto + 6 meses), el último día del mes, igual que relativedelta
+_VENCE_IMPRESO = f"""CASE
+            WHEN strftime('%d', u.fecha_emision, '+{MESES_VIGENCIA} months') = strftime('%d', u.fecha_emision)
+            THEN date(u.fecha_emision, '+{MESES_VIGENCIA} months')
+            ELSE date(u.fecha_emision, 'start of month', '+{MESES_VIGENCIA + 1} months', '-1 day')
+        END"""
+
+
+# Columnas de ESTUDIANTES del reporte (iguales en los dos lados de la unión)
+_CAMPOS_ESTUDIANTE = ('trim(e.nucleo) AS nucleo, trim(e.carrera) AS carrera, trim(e.seccion) AS seccion, '
+                      'trim(e.periodo) AS periodo, e.cedula AS cedula, trim(e.apellido) AS apellido, '
+                      'trim(e.nombre) AS nombre')
+
+
+def _consulta(filtros, estados):
+    condiciones, parametros = [], {}
+    for campo in FILTROS_ESTUDIANTE:
+        valor = (filtros or {}).get(campo)
+        if valor is None or str(valor).strip() == '':
+            continue
+        # Mismas expresiones que filtrar_estudiantes (e ix_estudiantes_filtros)
+        condiciones.append(f'lower(trim(e.{campo})) = :{campo}')
+        parametros[campo] = str(valor).strip().lower()
+    donde = f"WHERE {' AND '.join(condiciones)}" if condiciones else ''
+    y_filtros = f"AND {' AND '.join(condiciones)}" if condiciones else ''
+    # Con filtros, la ventana solo recorre los carnets de los estudiantes filtrados
+    carnets_filtrados = f'WHERE cedula IN (SELECT e.cedula FROM "ESTUDIANTES" e {donde})' if condiciones else ''
+
+    estados = [estado for estado in ESTADOS if estado in (estados or ESTADOS)]
+    parametros.update({f'estado{i}': estado for i, estado in enumerate(estados)})
+    por_estado = ', '.join(f':estado{i}' for i in range(len(estados)))
+
+    sql = f"""
+    WITH ultimos AS (
+        SELECT id, cedula, fecha_emision, fecha_vencimiento,
+               ROW_NUMBER() OVER (PARTITION BY cedula ORDER BY fecha_emision DESC, id DESC) AS orden
+        FROM carnets
+        {carnets_filtrados}
+    ),
+    fechas AS (
+        SELECT {_CAMPOS_ESTUDIANTE}, u.id AS carnet_id, date(u.fecha_emision) AS emision,
+               {_VENCE_IMPRESO} AS impreso,
+               date(u.fecha_vencimiento) AS registrado
+        FROM ultimos u
+        JOIN "ESTUDIANTES" e ON e.cedula = u.cedula
+        WHERE u.orden = 1 {y_filtros}
+        UNION ALL
+        SELECT {_CAMPOS_ESTUDIANTE}, NULL, NULL, NULL, NULL
+        FROM "ESTUDIANTES" e
+        WHERE e.cedula NOT IN (SELECT cedula FROM carnets) {y_filtros}
+    ),
+    reporte AS (
+        SELECT *,
+               CASE
+                   WHEN carnet_id IS NULL THEN 'sin_carnet'
+                   WHEN vence < :hoy THEN 'vencido'
+                   WHEN vence <= :limite THEN 'por_vencer'
+                   ELSE 'vigente'
+               END AS estado
+        FROM (SELECT *, CASE WHEN registrado < impreso THEN registrado ELSE impreso END AS vence FROM fechas)
+    )
+    """
+    return sql, f'estado IN ({por_estado})', parametros
+
+
+def consulta_detalle(filtros=None, estados=None):
+    """SQL y parámetros (sin :hoy ni :limite) del reporte por estudiante."""
+    sql, por_estado, parametros = _consulta(filtros, estados)
+    sql += f"""
+    SELECT nucleo, carrera, seccion, periodo, cedula, apellido, nombre, carnet_id, emision, vence,
+           CAST(julianday(vence) - julianday(:hoy) AS INTEGER) AS dias_restantes, estado
+    FROM reporte
+    WHERE {por_estado}
+    ORDER BY nucleo, carrera, seccion, cedula
+    """
+    return sql, parametros
+
+
+def consulta_resumen(filtros=None, estados=None):
+    """SQL y parámetros del conteo por núcleo/carrera/sección y estado."""
+    sql, por_estado, parametros = _consulta(filtros, estados)
+    conteos = ', '.join(f"sum(estado = '{estado}') AS {estado}" for estado in ESTADOS)
+    sql += f"""
+    SELECT nucleo, carrera, seccion, {conteos}, count(*) AS total
+    FROM reporte
+    WHERE {por_estado}
+    GROUP BY nucleo, carrera, seccion
+    ORDER BY nucleo, carrera, seccion
+    """
+    return sql, parametros
+
+
+def filas_reporte(engine, filtros=None, estados=None, dias=30, hoy=None, resumen=False):
+    """
+    Generador de filas (tuplas en el orden de COLUMNAS_DETALLE o COLUMNAS_RESUMEN).
+    Vencido: vence antes de hoy; por_vencer: vence en los próximos `dias` días.
+    Abre su propia conexión, así que se puede consumir fuera del contexto de la aplicación.
+    """
+    hoy = hoy or date.today()
+    sql, parametros = (consulta_resumen if resumen else consulta_detalle)(filtros, estados)
+    parametros.update(hoy=hoy.isoformat(), limite=(hoy + timedelta(days=dias)).isoformat())
+    with engine.connect() as conn:
+        resultado = conn.execution_options(stream_results=True, yield_per=FILAS_POR_BLOQUE) \
+            .execute(text(sql), parametros)
+        for bloque in resultado.partitions():
+            yield from bloque
+
+
+def _en_bloques(filas, tamano=FILAS_POR_BLOQUE):
+    bloque = []
+    for fila in filas:
+        bloque.append(fila)
+        if len(bloque) >= tamano:
+            yield bloque
+            bloque = []
+    if bloque:
+        yield bloque
+
+
+def stream_csv(columnas, filas):
+    """Texto CSV por bloques de filas, con encabezado."""
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    escritor.writerow(columnas)
+    for bloque in _en_bloques(filas):
+        escritor.writerows(bloque)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def stream_ndjson(columnas, filas):
+    """Un objeto JSON por línea, por bloques de filas."""
+    for bloque in _en_bloques(filas):
+        yield ''.join(json.dumps(dict(zip(columnas, fila)), ensure_ascii=False) + '\n' for fila in bloque)
+
+
+def stream_reporte(engine, formato='csv', **opciones):
+    """Reporte como texto en CSV o NDJSON (generador); opciones: las de filas_reporte."""
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato no soportado: {formato}")
+    columnas = COLUMNAS_RESUMEN if opciones.get('resumen') else COLUMNAS_DETALLE
+    escribir = stream_csv if formato == 'csv' else stream_ndjson
+    return escribir(columnas, filas_reporte(engine, **opciones))
+
+
+def leer_estados(valor):
+    """'vencido,por_vencer' -> ['vencido', 'por_vencer']; lanza ValueError con un estado desconocido."""
+    if not valor:
+        return None
+    estados = [estado.strip() for estado in valor.split(',') if estado.strip()]
+    desconocidos = [estado for estado in estados if estado not in ESTADOS]
+    if desconocidos:
+        raise ValueError(f"Estado no soportado: {', '.join(desconocidos)} (use {', '.join(ESTADOS)})")
+    return estados
@@ -0,0 +1,222 @@
+# services/card_generator/verificacion.py
+"""
+QR firmado del carnet y verificación en la entrada.
+
+El QR lleva "U1.<cédula>.<emisión aammdd>.<vence aammdd>.<firma>": la fecha de
+emisión (UTC, la de carnets.fecha_emision), la de vencimiento impresa y 80 bits de
+HMAC-SHA256 en base32. Son solo dígitos, mayúsculas y puntos, así que el QR se
+codifica en modo alfanumérico y sale mucho más chico que el texto de antes.
+
+La verificación comprueba la firma y busca la cédula en un índice en memoria con el
+último carnet de cada cédula, sin consultar SQLite por cada lectura. El índice se
+pone al día leyendo solo los carnets con id mayor al último visto: cada
+CARNET_VIGENCIA_REVISION segundos, y antes de rechazar un código más nuevo que lo
+que tiene (un carnet recién emitido en otro worker; los del propio proceso se
+agregan al guardarlos, con registrar_carnets). Cada
+CARNET_VIGENCIA_RECARGA segundos se vuelve a leer completo (carnets borrados).
+"""
+import base64
+import hashlib
+import hmac
+import threading
+import time
+from datetime import date
+from flask import current_app, has_app_context
+from sqlalchemy import text
+from ...database import engine_lectura
+
+VERSION_CODIGO = 'U1'
+BYTES_FIRMA = 10  # 80 bits: 16 caracteres en base32, sin relleno
+
+# El carnet impreso vence a los MESES_VIGENCIA meses de la emisión
+MESES_VIGENCIA = 6
+
+# Mínimo de segundos entre dos puestas al día provocadas por códigos que el índice no conoce
+_MINIMO_ENTRE_REVISIONES = 1.0
+
+
+class CodigoInvalido(ValueError):
+    """El texto leído no es un QR de carnet válido (formato o firma)."""
+
+
+def _aammdd(fecha):
+    return f"{fecha.year % 100:02d}{fecha.month:02d}{fecha.day:02d}"
+
+
+def _fecha(aammdd):
+    if len(aammdd) != 6 or not aammdd.isdigit():
+        raise CodigoInvalido('Fecha inválida en el código')
+    try:
+        return date(2000 + int(aammdd[:2]), int(aammdd[2:4]), int(aammdd[4:]))
+    except ValueError:
+        raise CodigoInvalido('Fecha inválida en el código')
+
+
+def _firma(clave, mensaje):
+    digest = hmac.new(clave.encode('utf-8'), mensaje.encode('ascii'), hashlib.sha256).digest()
+    return base64.b32encode(digest[:BYTES_FIRMA]).decode('ascii')
+
+
+def codigo_carnet(clave, cedula, emision, vence):
+    """Contenido del QR. emision y vence: date o datetime."""
+    mensaje = f"{VERSION_CODIGO}.{cedula}.{_aammdd(emision)}.{_aammdd(vence)}"
+    return f"{mensaje}.{_firma(clave, mensaje)}"
+
+
+def leer_codigo(clave, codigo):
+    """
+    Valida el formato y la firma del código. Devuelve (cedula, emision, vence)
+    como (str, date, date); lanza CodigoInvalido.
+    """
+    partes = codigo.strip().upper().split('.')
+    if len(partes) != 5 or partes[0] != VERSION_CODIGO or not partes[1].isdigit():
+        raise CodigoInvalido('No es un código de carnet')
+    if not hmac.compare_digest(partes[4], _firma(clave, '.'.join(partes[:4]))):
+        raise CodigoInvalido('Firma inválida')
+    return partes[1], _fecha(partes[2]), _fecha(partes[3])
+
+
+def vencimiento_impreso(emision):
+    """Fecha de vencimiento que se imprime en el carnet (la misma de preparar_datos)."""
+    from dateutil.relativedelta import relativedelta
+    return emision + relativedelta(months=MESES_VIGENCIA)
+
+
+def _ordinal(valor):
+    """Ordinal del día de un DATETIME de SQLite ('2025-01-31 10:00:00.000000'); None si no hay."""
+    if not valor:
+        return None
+    if isinstance(valor, str):
+        return date.fromisoformat(valor[:10]).toordinal()
+    return valor.toordinal()
+
+
+class IndiceVigencia:
+    """
+    Último carnet de cada cédula: cédula -> (id, emisión, vencimiento), con las
+    fechas como ordinales de día. Las lecturas no toman el lock; solo un hilo a la
+    vez pone el índice al día.
+    """
+    def __init__(self, clave, revision=30, recarga=600):
+        self.clave = clave
+        self.revision = revision
+        self.recarga = recarga
+        self._ultimos = {}
+        self._ultimo_id = 0
+        self._cargado = None
+        self._revisado = 0.0
+        self._lock = threading.Lock()
+
+    def _leer(self, ultimos, desde_id):
+        """Agrega a ultimos los carnets con id > desde_id; devuelve el id más alto visto."""
+        consulta = text("SELECT id, cedula, fecha_emision, fecha_vencimiento FROM carnets "
+                        "WHERE id > :desde ORDER BY id")
+        with engine_lectura().connect() as conn:
+            for carnet_id, cedula, emision, vencimiento in conn.execute(consulta, {'desde': desde_id}):
+                emision = _ordinal(emision) or 1
+                cedula = str(cedula).strip()
+                actual = ultimos.get(cedula)
+                # Vale el de emisión más reciente; en el mismo día, el de id mayor
+                if actual is None or emision >= actual[1]:
+                    ultimos[cedula] = (carnet_id, emision, _ordinal(vencimiento))
+                desde_id = carnet_id
+        return desde_id
+
+    def poner_al_dia(self, completo=False, esperar=True):
+        """Lee los carnets nuevos (o todos). Con esperar=False no espera si otro hilo ya lo está haciendo."""
+        if not self._lock.acquire(blocking=esperar):
+            return False
+        try:
+            ahora = time.monotonic()
+            if completo:
+                ultimos = {}
+                self._ultimo_id = self._leer(ultimos, 0)
+                self._ultimos = ultimos
+                self._cargado = ahora
+            else:
+                self._ultimo_id = self._leer(self._ultimos, self._ultimo_id)
+            self._revisado = ahora
+            return True
+        finally:
+            self._lock.release()
+
+    def registrar(self, carnet_id, cedula, emision, vencimiento):
+        """Agrega un carnet recién guardado (si el índice ya está cargado; si no, lo leerá al cargarse)."""
+        if self._cargado is None:
+            return
+        emision = _ordinal(emision) or 1
+        cedula = str(cedula).strip()
+        with self._lock:
+            actual = self._ultimos.get(cedula)
+            if actual is None or emision >= actual[1]:
+                self._ultimos[cedula] = (carnet_id, emision, _ordinal(vencimiento))
+
+    def buscar(self, cedula, emision=None):
+        """
+        Último carnet de la cédula como (id, emisión, vencimiento) en date, o None.
+        emision: la del código leído; si el índice no conoce un carnet tan nuevo,
+        se pone al día antes de responder.
+        """
+        ahora = time.monotonic()
+        if self._cargado is None:
+            self.poner_al_dia(completo=True)
+        elif ahora - self._cargado >= self.recarga:
+            self.poner_al_dia(completo=True, esperar=False)
+        elif ahora - self._revisado >= self.revision:
+            self.poner_al_dia(esperar=False)
+
+        entrada = self._ultimos.get(cedula)
+        desconocido = entrada is None or (emision is not None and entrada[1] < emision.toordinal())
+        if desconocido and time.monotonic() - self._revisado >= _MINIMO_ENTRE_REVISIONES:
+            self.poner_al_dia()
+            entrada = self._ultimos.get(cedula)
+        if entrada is None:
+            return None
+        carnet_id, emision_ultimo, vencimiento = entrada
+        return (carnet_id, date.fromordinal(emision_ultimo),
+                date.fromordinal(vencimiento) if vencimiento else None)
+
+    def verificar(self, codigo, hoy=None):
+        """
+        Resultado de leer un QR: {'valido', 'motivo', 'cedula', 'carnet_id', 'emision', 'vence'}.
+        motivo: vigente, vencido, reemplazado (hay un carnet más nuevo) o sin_carnet.
+        Lanza CodigoInvalido si el código no es válido.
+        """
+        cedula, emision, vence = leer_codigo(self.clave, codigo)
+        hoy = hoy or date.today()
+        resultado = {'valido': False, 'cedula': cedula, 'carnet_id': None,
+                     'emision': emision.isoformat(), 'vence': vence.isoformat()}
+
+        entrada = self.buscar(cedula, emision)
+        if entrada is None or entrada[1] < emision:
+            resultado['motivo'] = 'sin_carnet'
+            return resultado
+        carnet_id, emision_ultimo, vencimiento = entrada
+        resultado['carnet_id'] = carnet_id
+        if emision_ultimo > emision:
+            resultado['motivo'] = 'reemplazado'
+        elif hoy > vence or (vencimiento is not None and hoy > vencimiento):
+            resultado['motivo'] = 'vencido'
+        else:
+            resultado['valido'] = True
+            resultado['motivo'] = 'vigente'
+        return resultado
+
+
+def registrar_carnets(carnets):
+    """Pasa al índice de este proceso los carnets que se acaban de guardar."""
+    indice = current_app.extensions.get('vigencia_carnets') if has_app_context() else None
+    if indice is not None:
+        for carnet in carnets:
+            indice.registrar(carnet.id, carnet.cedula, carnet.fecha_emision, carnet.fecha_vencimiento)
+
+
+def init_vigencia(app):
+    """Crea el índice de vigencia en app.extensions['vigencia_carnets'] (se carga con la primera consulta)."""
+    indice = IndiceVigencia(
+        clave=app.config['CARNET_QR_CLAVE'],
+        revision=app.config['CARNET_VIGENCIA_REVISION'],
+        recarga=app.config['CARNET_VIGENCIA_RECARGA']
+    )
+    app.extensions['vigencia_carnets'] = indice
+    return indice
@@ -0,0 +1,406 @@
+# services/directorio.py
+"""
+Directorio de estudiantes en memoria: copia de solo lectura de ESTUDIANTES (más el
+rol de usuarios) para las rutas que buscan un estudiante por cédula o filtran por
+carrera/sección/periodo/núcleo.
+
+- Cada fila es un RegistroEstudiante con __slots__ (sin __dict__ por objeto) y los
+  valores repetidos (carrera, sección, turno, periodo, núcleo, rol) se comparten:
+  todos los registros de una misma carrera apuntan a la misma cadena.
+- Índice por cédula (dict) e índices secundarios por cada campo de filtro, con el
+  valor normalizado como en filtrar_estudiantes (lower(trim(valor))).
+- Se carga en create_app; con preload_app, una sola vez en el máster de gunicorn.
+  Cada DIRECTORIO_REVISION segundos se consulta PRAGMA data_version en una conexión
+  propia y, si otra conexión escribió en la base, se leen las filas nuevas de
+  ESTUDIANTES (rowid mayor al último visto) y de usuarios; si el total de filas no
+  cuadra (hubo borrados) o cambió PRAGMA user_version (lo incrementa la importación
+  de la nómina, services/importacion.py), se recarga completo. Las demás
+  modificaciones en sitio se ven con la recarga completa cada DIRECTORIO_RECARGA
+  segundos, o al llamar a recargar_directorio() después de modificar ESTUDIANTES.
+"""
+import logging
+import os
+import random
+import sqlite3
+import sys
+import threading
+import time
+from flask import current_app
+from sqlalchemy import text
+from ..database import engine_lectura
+from .auth.profile_cache import CAMPOS_PERFIL as CAMPOS
+from ..models.student import FILTROS_ESTUDIANTE, Student, buscar_estudiantes as buscar_estudiantes_sql
+from ..models.user import User
+
+logger = logging.getLogger(__name__)
+
+# Campos con pocos valores distintos: cada valor se guarda una sola vez
+CAMPOS_REPETIDOS = ('carrera', 'seccion', 'turno', 'periodo', 'nucleo', 'rol')
+
+# Límite de parámetros por consulta IN en SQLite
+_TAMANO_IN = 500
+
+
+class RegistroEstudiante:
+    """Fila de ESTUDIANTES con los mismos atributos que Student, más el rol del usuario (o None)."""
+    __slots__ = CAMPOS + ('rol',)
+
+    def __init__(self, cedula, apellido, nombre, carrera, seccion, turno, periodo, nucleo, rol=None):
+        self.cedula = cedula
+        self.apellido = apellido
+        self.nombre = nombre
+        self.carrera = carrera
+        self.seccion = seccion
+        self.turno = turno
+        self.periodo = periodo
+        self.nucleo = nucleo
+        self.rol = rol
+
+    def perfil(self):
+        """Los datos de /api/auth/perfil."""
+        return {campo: getattr(self, campo) for campo in CAMPOS}
+
+
+def clave_cedula(cedula):
+    """Clave del índice por cédula: entero si son solo dígitos (ocupa menos que la cadena)."""
+    if isinstance(cedula, int):
+        return cedula
+    cedula = str(cedula).strip()
+    return int(cedula) if cedula.isdigit() else cedula
+
+
+def _normalizar(valor):
+    return '' if valor is None else str(valor).strip().lower()
+
+
+class _Instantanea:
+    """Los datos del directorio en un momento dado; una recarga completa arma una nueva."""
+    __slots__ = ('por_cedula', 'indices', 'valores', 'normalizados', 'filas', 'ultimo_rowid', 'ultimo_usuario')
+
+    def __init__(self):
+        self.por_cedula = {}
+        self.indices = {campo: {} for campo in FILTROS_ESTUDIANTE}
+        self.valores = {}        # valor -> la instancia compartida de ese valor
+        self.normalizados = {}   # valor compartido -> lower(trim(valor))
+        self.filas = 0
+        self.ultimo_rowid = 0
+        self.ultimo_usuario = 0
+
+    def compartido(self, valor):
+        if valor is None:
+            return None
+        if isinstance(valor, str):
+            valor = sys.intern(valor)
+        valor = self.valores.setdefault(valor, valor)
+        if valor not in self.normalizados:
+            self.normalizados[valor] = _normalizar(valor)
+        return valor
+
+    def agregar(self, fila):
+        """fila: los valores de CAMPOS. Si la cédula se repite, vale la primera (como .first())."""
+        self.filas += 1
+        clave = clave_cedula(fila[0])
+        if clave in self.por_cedula:
+            return None
+        valores = list(fila)
+        for i, campo in enumerate(CAMPOS):
+            if campo in CAMPOS_REPETIDOS:
+                valores[i] = self.compartido(valores[i])
+        registro = RegistroEstudiante(*valores)
+        self.por_cedula[clave] = registro
+        for campo in FILTROS_ESTUDIANTE:
+            self.indices[campo].setdefault(self.normalizados.get(getattr(registro, campo), ''), []).append(registro)
+        return registro
+
+    def asignar_rol(self, cedula, rol):
+        registro = self.por_cedula.get(clave_cedula(cedula))
+        if registro is not None:
+            registro.rol = self.compartido(rol)
+
+
+class DirectorioEstudiantes:
+    """
+    Directorio de estudiantes de solo lectura. Las lecturas no toman el lock;
+    solo un hilo a la vez lo pone al día.
+    """
+    def __init__(self, revision=5, recarga=900):
+        self.revision = revision
+        self.recarga = recarga
+        self._datos = None
+        self._seleccion = None
+        self._cargado = 0.0
+        self._revisado = 0.0
+        self._version = None
+        self._user_version = None
+        self._conexion = None
+        self._heredadas = []
+        self._pid = None
+        self._lock = threading.Lock()
+        self.recargas = 0
+        self.actualizaciones = 0
+        self.segundos_carga = None
+        self.memoria = None
+
+    # --- lectura de la base ---
+
+    def _resolver_esquema(self, conn):
+        """Columnas de ESTUDIANTES (los nombres pueden traer espacios o mayúsculas)."""
+        columnas = {fila[1].strip().lower(): fila[1] for fila in conn.execute(text('PRAGMA table_info("ESTUDIANTES")'))}
+        if not columnas:
+            raise RuntimeError("La tabla ESTUDIANTES no existe")
+        seleccion = ', '.join(f'"{columnas[campo]}"' if campo in columnas else 'NULL' for campo in CAMPOS)
+        self._seleccion = f'SELECT rowid, {seleccion} FROM "ESTUDIANTES" WHERE rowid > :desde ORDER BY rowid'
+
+    def _leer_estudiantes(self, conn, datos):
+        nuevos = []
+        for fila in conn.execute(text(self._seleccion), {'desde': datos.ultimo_rowid}):
+            datos.ultimo_rowid = fila[0]
+            registro = datos.agregar(fila[1:])
+            if registro is not None:
+                nuevos.append(registro)
+        return nuevos
+
+    def _leer_roles(self, conn, datos, cedulas=None):
+        """Roles de los usuarios nuevos (id mayor al último visto) o de las cédulas indicadas."""
+        if cedulas is None:
+            consulta = text("SELECT id, cedula, rol FROM usuarios WHERE id > :desde ORDER BY id")
+            for usuario_id, cedula, rol in conn.execute(consulta, {'desde': datos.ultimo_usuario}):
+                datos.ultimo_usuario = usuario_id
+                datos.asignar_rol(cedula, rol)
+            return
+        cedulas = [str(c) for c in cedulas]
+        for i in range(0, len(cedulas), _TAMANO_IN):
+            bloque = cedulas[i:i + _TAMANO_IN]
+            marcas = ', '.join(f':c{j}' for j in range(len(bloque)))
+            consulta = text(f"SELECT cedula, rol FROM usuarios WHERE cedula IN ({marcas})")
+            for cedula, rol in conn.execute(consulta, {f'c{j}': c for j, c in enumerate(bloque)}):
+                datos.asignar_rol(cedula, rol)
+
+    def _data_version(self):
+        """
+        PRAGMA data_version de una conexión propia del proceso (cambia si otra conexión
+        escribió) y PRAGMA user_version.
+        """
+        if self._conexion is None or self._pid != os.getpid():
+            # Después del fork de gunicorn cada worker abre la suya; la heredada del
+            # máster no se cierra en el worker (SQLite no admite usarla tras un fork)
+            if self._conexion is not None:
+                self._heredadas.append(self._conexion)
+            self._conexion = sqlite3.connect(engine_lectura().url.database, check_same_thread=False)
+            self._pid = os.getpid()
+            self._version = None
+        return (self._conexion.execute('PRAGMA data_version').fetchone()[0],
+                self._conexion.execute('PRAGMA user_version').fetchone()[0])
+
+    def cargar(self):
+        """Lee todo el directorio y reemplaza la instantánea actual."""
+        inicio = time.perf_counter()
+        datos = _Instantanea()
+        version, user_version = self._data_version()
+        with engine_lectura().connect() as conn:
+            self._resolver_esquema(conn)
+            self._leer_estudiantes(conn, datos)
+            self._leer_roles(conn, datos)
+        self._datos = datos
+        self._version = version
+        self._user_version = user_version
+        self._cargado = self._revisado = time.monotonic()
+        self.recargas += 1
+        self.segundos_carga = round(time.perf_counter() - inicio, 4)
+        self.memoria = self._estimar_memoria(datos)
+        logger.info("Directorio de estudiantes: %s estudiantes en %ss (~%s KB)",
+                    len(datos.por_cedula), self.segundos_carga, self.memoria['total_kb'])
+        return datos
+
+    def _actualizar(self):
+        """Filas nuevas de ESTUDIANTES y usuarios; recarga completa si hubo borrados."""
+        datos = self._datos
+        with engine_lectura().connect() as conn:
+            # Las dos consultas van en la misma transacción de lectura (misma foto de la base)
+            total = conn.execute(text('SELECT count(*) FROM "ESTUDIANTES"')).scalar()
+            if total < datos.filas:
+                return self.cargar()
+            nuevos = self._leer_estudiantes(conn, datos)
+            if datos.filas != total:
+                return self.cargar()
+            if nuevos:
+                self._leer_roles(conn, datos, [r.cedula for r in nuevos])
+            self._leer_roles(conn, datos)
+        self.actualizaciones += 1
+        return datos
+
+    def _revisar(self):
+        ahora = time.monotonic()
+        self._revisado = ahora
+        if self._datos is None or ahora - self._cargado >= self.recarga:
+            self.cargar()
+            return
+        version, user_version = self._data_version()
+        if user_version != self._user_version:
+            self.cargar()
+        elif version != self._version:
+            self._actualizar()
+            self._version = version
+
+    def _vigente(self):
+        """Instantánea actual, revisando la base si ya pasó el intervalo (sin esperar a otro hilo)."""
+        if time.monotonic() - self._revisado >= self.revision and self._lock.acquire(blocking=False):
+            try:
+                self._revisar()
+            except Exception as e:
+                logger.warning("No se pudo actualizar el directorio de estudiantes: %s", e)
+            finally:
+                self._lock.release()
+        return self._datos
+
+    def recargar(self):
+        """Recarga completa (usar después de modificar ESTUDIANTES o usuarios)."""
+        with self._lock:
+            return self.cargar()
+
+    # --- consultas ---
+
+    def disponible(self):
+        return self._vigente() is not None
+
+    def estudiante(self, cedula):
+        """Registro de la cédula o None."""
+        datos = self._vigente()
+        return datos.por_cedula.get(clave_cedula(cedula)) if datos is not None else None
+
+    def filtrar(self, filtros, candidatos=None):
+        """
+        Estudiantes que cumplen los filtros (mismas reglas que filtrar_estudiantes).
+        Sin candidatos se parte del índice secundario con menos registros.
+        """
+        datos = self._vigente()
+        condiciones = [(campo, _normalizar(filtros[campo])) for campo in FILTROS_ESTUDIANTE
+                       if (filtros or {}).get(campo) is not None and str(filtros[campo]).strip() != '']
+        if candidatos is None:
+            if not condiciones:
+                return list(datos.por_cedula.values())
+            listas = sorted(((datos.indices[campo].get(valor, []), campo) for campo, valor in condiciones),
+                            key=lambda lista: len(lista[0]))
+            candidatos, primero = listas[0]
+            condiciones = [(campo, valor) for campo, valor in condiciones if campo != primero]
+        normalizados = datos.normalizados
+        return [r for r in candidatos
+                if all(normalizados.get(getattr(r, campo), '') == valor for campo, valor in condiciones)]
+
+    def buscar_varios(self, cedulas=None, filtros=None):
+        """Como buscar_estudiantes: por lista de cédulas (en ese orden), por filtro o ambos."""
+        if not cedulas:
+            return self.filtrar(filtros)
+        datos = self._vigente()
+        registros, vistos = [], set()
+        for cedula in cedulas:
+            clave = clave_cedula(cedula)
+            registro = datos.por_cedula.get(clave)
+            if registro is not None and clave not in vistos:
+                vistos.add(clave)
+                registros.append(registro)
+        return self.filtrar(filtros, registros)
+
+    # --- memoria ---
+
+    @staticmethod
+    def _estimar_memoria(datos, muestra=2000):
+        """
+        Bytes ocupados, estimados a partir de una muestra de registros: el registro,
+        su clave, su entrada en el índice por cédula y los valores propios (nombre y
+        apellido); los valores compartidos se cuentan una sola vez.
+        """
+        registros = list(datos.por_cedula.items())
+        n = len(registros)
+        ejemplo = random.Random(0).sample(registros, min(muestra, n)) if n else []
+        por_registro = 0
+        for clave, registro in ejemplo:
+            por_registro += sys.getsizeof(clave) + sys.getsizeof(registro)
+            por_registro += sum(sys.getsizeof(getattr(registro, campo)) for campo in ('apellido', 'nombre'))
+            if registro.cedula is not clave:
+                por_registro += sys.getsizeof(registro.cedula)
+        registros_kb = (por_registro / len(ejemplo) * n if ejemplo else 0) / 1024
+        indices_kb = (sys.getsizeof(datos.por_cedula) + sum(
+            sys.getsizeof(indice) + sum(sys.getsizeof(lista) for lista in indice.values())
+            for indice in datos.indices.values())) / 1024
+        compartidos_kb = (sum(sys.getsizeof(v) for v in datos.valores) + sys.getsizeof(datos.valores)
+                          + sys.getsizeof(datos.normalizados)) / 1024
+        return {
+            'registros_kb': round(registros_kb),
+            'indices_kb': round(indices_kb),
+            'compartidos_kb': round(compartidos_kb),
+            'total_kb': round(registros_kb + indices_kb + compartidos_kb),
+        }
+
+    def estadisticas(self):
+        datos = self._datos
+        if datos is None:
+            return {'cargado': False}
+        return {
+            'cargado': True,
+            'pid': os.getpid(),
+            'estudiantes': len(datos.por_cedula),
+            'filas': datos.filas,
+            'valores_distintos': {campo: len(datos.indices[campo]) for campo in FILTROS_ESTUDIANTE},
+            'segundos_carga': self.segundos_carga,
+            'antiguedad_s': round(time.monotonic() - self._cargado, 1),
+            'recargas': self.recargas,
+            'actualizaciones': self.actualizaciones,
+            'memoria': self.memoria,
+        }
+
+
+def init_directorio(app):
+    """Crea el directorio en app.extensions['directorio'] y lo carga (si DIRECTORIO_ESTUDIANTES está activo)."""
+    if not app.config['DIRECTORIO_ESTUDIANTES']:
+        return None
+    directorio = DirectorioEstudiantes(revision=app.config['DIRECTORIO_REVISION'],
+                                       recarga=app.config['DIRECTORIO_RECARGA'])
+    with app.app_context():
+        try:
+            directorio.cargar()
+        except Exception as e:
+            # Se reintenta en la primera consulta; mientras tanto se consulta la base
+            print(f"No se pudo cargar el directorio de estudiantes: {str(e)}")
+    app.extensions['directorio'] = directorio
+    return directorio
+
+
+def obtener_directorio():
+    """El directorio de la aplicación actual, o None si está desactivado o no se pudo cargar."""
+    directorio = current_app.extensions.get('directorio')
+    if directorio is None or not directorio.disponible():
+        return None
+    return directorio
+
+
+def recargar_directorio():
+    """Recarga el directorio de este proceso (usar al modificar ESTUDIANTES o usuarios)."""
+    directorio = current_app.extensions.get('directorio')
+    if directorio is not None:
+        directorio.recargar()
+
+
+def buscar_estudiante(cedula):
+    """
+    Estudiante de la cédula y rol de su usuario: (estudiante, rol) o (None, None).
+    Lo toma del directorio; si está desactivado o todavía no tiene la cédula, de la base.
+    """
+    directorio = obtener_directorio()
+    if directorio is not None:
+        registro = directorio.estudiante(cedula)
+        if registro is not None:
+            return registro, registro.rol
+    estudiante = Student.query.filter_by(cedula=cedula).first()
+    if estudiante is None:
+        return None, None
+    usuario = User.query.filter_by(cedula=str(cedula).strip()).first()
+    return estudiante, usuario.rol if usuario else None
+
+
+def buscar_estudiantes(cedulas=None, filtros=None):
+    """Como models.student.buscar_estudiantes, pero desde el directorio si está disponible."""
+    directorio = obtener_directorio()
+    if directorio is None:
+        return buscar_estudiantes_sql(cedulas, filtros)
+    return directorio.buscar_varios(cedulas, filtros)
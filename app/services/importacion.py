@@ -0,0 +1,331 @@
+# services/importacion.py
+"""
+Importación de la nómina de estudiantes (ESTUDIANTES y, opcionalmente, usuarios)
+desde un CSV (el que exporta Excel: separado por coma o punto y coma, UTF-8 con o
+sin BOM).
+
+1. Las filas se leen del archivo a medida que llegan, se validan por bloques de
+   TAMANO_BLOQUE y se cargan con executemany en una tabla temporal
+   (INSERT ... ON CONFLICT(cedula): si una cédula se repite en el archivo, vale la
+   última fila). Esta etapa no bloquea la base.
+2. En una sola transacción (BEGIN IMMEDIATE), con consultas sobre conjuntos, se
+   marca cada cédula como nueva, modificada o sin cambios (comparando los valores
+   recortados, como los leen las rutas), se actualizan las modificadas y se
+   insertan las nuevas. ESTUDIANTES no tiene restricción UNIQUE en cedula (la tabla
+   se carga desde fuera y puede traer repetidas), así que no admite ON CONFLICT;
+   usuarios sí, y sus filas se cargan con INSERT ... ON CONFLICT(cedula).
+   Si hay muchas filas nuevas, los índices de ESTUDIANTES se borran antes de
+   insertarlas y se vuelven a crear al final, dentro de la misma transacción.
+3. Se incrementa PRAGMA user_version: el directorio de estudiantes de cada worker
+   lo ve y se recarga completo. En este proceso se invalida el caché de perfiles
+   de las cédulas nuevas y modificadas y se recarga el directorio.
+
+Las columnas que no trae el archivo no se modifican en las filas existentes.
+
+Con crear_usuarios, la contraseña inicial de un usuario nuevo es la de la columna
+contrasena; si el archivo no la trae (o la fila la deja vacía) se genera una al azar
+y se devuelve una sola vez en el reporte. Nunca es la cédula: está impresa en el
+carnet y en su QR.
+"""
+import csv
+import io
+import secrets
+import sqlite3
+import time
+import unicodedata
+from flask import current_app
+from ..database import INDICES, aplicar_pragmas
+from ..models.user import db
+from .auth.profile_cache import CAMPOS_PERFIL, invalidar_perfil
+from .directorio import recargar_directorio
+
+# Filas que se validan y se cargan en la tabla temporal por vez
+TAMANO_BLOQUE = 5000
+
+# Con más filas nuevas que esto (o que la quinta parte de la tabla) se difieren los índices
+UMBRAL_INDICES = 5000
+
+# Errores de validación que se devuelven en el reporte (se cuentan todos)
+MAX_ERRORES = 100
+
+COLUMNAS_OBLIGATORIAS = ('cedula', 'apellido', 'nombre')
+
+# Encabezados alternativos (ya sin acentos, en minúsculas y con _ en lugar de espacios)
+ALIAS = {
+    'ci': 'cedula',
+    'cedula_de_identidad': 'cedula',
+    'apellidos': 'apellido',
+    'nombres': 'nombre',
+    'clave': 'contrasena',
+}
+
+ROL_DEFECTO = 'estudiante'
+
+# Bytes aleatorios de las contraseñas generadas (12 caracteres en base64 para URL)
+BYTES_CONTRASENA = 9
+
+
+class ImportacionInvalida(ValueError):
+    """El archivo no se puede importar (codificación o columnas obligatorias)."""
+
+
+def _normalizar_encabezado(nombre):
+    nombre = unicodedata.normalize('NFKD', str(nombre or '')).encode('ascii', 'ignore').decode('ascii')
+    nombre = '_'.join(nombre.strip().lower().split())
+    return ALIAS.get(nombre, nombre)
+
+
+def leer_cedula(valor):
+    """'V-12.345.678' -> 12345678; None si no es una cédula válida."""
+    valor = str(valor or '').strip().upper().replace('.', '').replace(' ', '')
+    if valor[:2] in ('V-', 'E-'):
+        valor = valor[2:]
+    elif valor[:1] in ('V', 'E'):
+        valor = valor[1:]
+    return int(valor) if valor.isdigit() else None
+
+
+def _lector(archivo):
+    """Lector CSV con el separador detectado en la primera línea (coma, punto y coma o tabulador)."""
+    primera = archivo.readline()
+    separador = max((',', ';', '\t'), key=primera.count)
+    return csv.reader(_encadenar(primera, archivo), delimiter=separador)
+
+
+def _encadenar(primera, archivo):
+    yield primera
+    yield from archivo
+
+
+def leer_filas(archivo, periodo=None):
+    """
+    Generador de (número de línea, dict de la fila o None, error) a partir de un
+    archivo de texto. El primer valor que produce es la lista de columnas reconocidas.
+    """
+    try:
+        lector = _lector(archivo)
+        encabezado = [_normalizar_encabezado(nombre) for nombre in next(lector, [])]
+    except UnicodeDecodeError:
+        raise ImportacionInvalida('El archivo debe estar en UTF-8')
+    faltantes = [columna for columna in COLUMNAS_OBLIGATORIAS if columna not in encabezado]
+    if faltantes:
+        raise ImportacionInvalida(f"Faltan columnas obligatorias: {', '.join(faltantes)}")
+
+    posiciones = {columna: encabezado.index(columna)
+                  for columna in CAMPOS_PERFIL + ('rol', 'contrasena') if columna in encabezado}
+    columnas = [columna for columna in posiciones if columna in CAMPOS_PERFIL]
+    if periodo and 'periodo' not in columnas:
+        columnas.append('periodo')
+    yield columnas
+
+    linea = 1
+    try:
+        for valores in lector:
+            linea += 1
+            if not any(v.strip() for v in valores):
+                continue
+            fila = {}
+            for columna, posicion in posiciones.items():
+                valor = valores[posicion].strip() if posicion < len(valores) else ''
+                fila[columna] = valor or None
+            if periodo and not fila.get('periodo'):
+                fila['periodo'] = periodo
+            fila['cedula'] = leer_cedula(fila['cedula'])
+            if fila['cedula'] is None:
+                yield linea, None, 'Cédula inválida'
+            elif not fila.get('apellido') or not fila.get('nombre'):
+                yield linea, None, 'Faltan el nombre o el apellido'
+            else:
+                yield linea, fila, None
+    except UnicodeDecodeError:
+        raise ImportacionInvalida(f'El archivo debe estar en UTF-8 (error después de la línea {linea})')
+    except csv.Error as e:
+        raise ImportacionInvalida(f'CSV inválido en la línea {linea}: {str(e)}')
+
+
+def _conectar():
+    """Conexión propia en modo autocommit: las transacciones se abren a mano."""
+    conexion = sqlite3.connect(db.engine.url.database, isolation_level=None,
+                               timeout=current_app.config['SQLITE_PRAGMAS']['busy_timeout'] / 1000)
+    aplicar_pragmas(conexion, current_app.config['SQLITE_PRAGMAS'])
+    return conexion
+
+
+def _crear_temporal(conexion, columnas):
+    tipos = {fila[1].strip().lower(): fila[2] or '' for fila in conexion.execute('PRAGMA table_info("ESTUDIANTES")')}
+    if not tipos:
+        raise ImportacionInvalida('La tabla ESTUDIANTES no existe')
+    definicion = ', '.join(f'{columna} {tipos.get(columna, "TEXT")}' for columna in columnas if columna != 'cedula')
+    conexion.execute('DROP TABLE IF EXISTS temp.importacion')
+    conexion.execute(f'CREATE TEMP TABLE importacion (cedula INTEGER PRIMARY KEY, {definicion}, '
+                     'rol TEXT, contrasena TEXT, estado TEXT)')
+
+
+def _insertar_bloque(conexion, sql, bloque):
+    conexion.execute('BEGIN')
+    conexion.executemany(sql, bloque)
+    conexion.execute('COMMIT')
+
+
+def _cargar_temporal(conexion, filas, columnas, reporte):
+    """Valida y carga las filas en la tabla temporal, un bloque por transacción (solo toca temp)."""
+    todas = columnas + ['rol', 'contrasena']
+    actualizar = ', '.join(f'{columna} = excluded.{columna}' for columna in todas if columna != 'cedula')
+    sql = (f'INSERT INTO importacion ({", ".join(todas)}) VALUES ({", ".join("?" * len(todas))}) '
+           f'ON CONFLICT(cedula) DO UPDATE SET {actualizar}')
+    bloque = []
+    for linea, fila, error in filas:
+        reporte['filas_leidas'] += 1
+        if error:
+            reporte['invalidas'] += 1
+            if len(reporte['errores']) < MAX_ERRORES:
+                reporte['errores'].append({'linea': linea, 'error': error})
+            continue
+        bloque.append(tuple(fila.get(columna) for columna in todas))
+        if len(bloque) >= TAMANO_BLOQUE:
+            _insertar_bloque(conexion, sql, bloque)
+            bloque = []
+    if bloque:
+        _insertar_bloque(conexion, sql, bloque)
+    reporte['validas'] = conexion.execute('SELECT count(*) FROM importacion').fetchone()[0]
+    reporte['repetidas'] = reporte['filas_leidas'] - reporte['invalidas'] - reporte['validas']
+
+
+def _aplicar(conexion, columnas, reporte, crear_usuarios):
+    """Diferencias y escritura en ESTUDIANTES y usuarios (dentro de la transacción abierta)."""
+    datos = [columna for columna in columnas if columna != 'cedula']
+    distinto = ' OR '.join(f'trim(e.{columna}) IS NOT i.{columna}' for columna in datos)
+    conexion.execute(f"""
+        UPDATE importacion AS i SET estado = CASE
+            WHEN NOT EXISTS (SELECT 1 FROM "ESTUDIANTES" e WHERE e.cedula = i.cedula) THEN 'nuevo'
+            WHEN EXISTS (SELECT 1 FROM "ESTUDIANTES" e WHERE e.cedula = i.cedula AND ({distinto})) THEN 'modificado'
+            ELSE 'sin_cambios'
+        END
+    """)
+    conteos = dict(conexion.execute('SELECT estado, count(*) FROM importacion GROUP BY estado').fetchall())
+    for estado in ('nuevo', 'modificado', 'sin_cambios'):
+        reporte[f'{estado}s' if estado != 'sin_cambios' else estado] = conteos.get(estado, 0)
+
+    if reporte['modificados']:
+        asignaciones = ', '.join(f'{columna} = i.{columna}' for columna in datos)
+        conexion.execute(f"""
+            UPDATE "ESTUDIANTES" AS e SET {asignaciones}
+            FROM importacion i WHERE e.cedula = i.cedula AND i.estado = 'modificado'
+        """)
+
+    if reporte['nuevos']:
+        existentes = conexion.execute('SELECT count(*) FROM "ESTUDIANTES"').fetchone()[0]
+        indices = [(nombre, columnas_indice) for nombre, tabla, columnas_indice in INDICES if tabla == 'ESTUDIANTES']
+        diferir = reporte['nuevos'] > min(UMBRAL_INDICES, max(existentes // 5, 1))
+        if diferir:
+            for nombre, _ in indices:
+                conexion.execute(f'DROP INDEX IF EXISTS {nombre}')
+        conexion.execute(f"""
+            INSERT INTO "ESTUDIANTES" ({', '.join(columnas)})
+            SELECT {', '.join(columnas)} FROM importacion WHERE estado = 'nuevo' ORDER BY cedula
+        """)
+        if diferir:
+            for nombre, columnas_indice in indices:
+                conexion.execute(f'CREATE INDEX IF NOT EXISTS {nombre} ON "ESTUDIANTES" {columnas_indice}')
+        reporte['indices_diferidos'] = diferir
+
+    con_rol = conexion.execute('SELECT 1 FROM importacion WHERE rol IS NOT NULL LIMIT 1').fetchone() is not None
+    reporte['roles_modificados'] = conexion.execute("""
+        SELECT count(*) FROM importacion i JOIN usuarios u ON u.cedula = CAST(i.cedula AS TEXT)
+        WHERE i.rol IS NOT NULL AND u.rol IS NOT i.rol
+    """).fetchone()[0] if con_rol else 0
+    if crear_usuarios:
+        reporte['usuarios_nuevos'] = conexion.execute("""
+            SELECT count(*) FROM importacion i
+            WHERE NOT EXISTS (SELECT 1 FROM usuarios u WHERE u.cedula = CAST(i.cedula AS TEXT))
+        """).fetchone()[0]
+        # Contraseña inicial: la del archivo o una generada (se devuelve en el reporte);
+        # a los usuarios existentes solo se les cambia el rol
+        sin_contrasena = [fila[0] for fila in conexion.execute("""
+            SELECT cedula FROM importacion i
+            WHERE contrasena IS NULL
+              AND NOT EXISTS (SELECT 1 FROM usuarios u WHERE u.cedula = CAST(i.cedula AS TEXT))
+            ORDER BY cedula
+        """)]
+        generadas = [(secrets.token_urlsafe(BYTES_CONTRASENA), cedula) for cedula in sin_contrasena]
+        conexion.executemany('UPDATE importacion SET contrasena = ? WHERE cedula = ?', generadas)
+        reporte['contrasenas_generadas'] = [
+            {'cedula': str(cedula), 'contrasena': contrasena} for contrasena, cedula in generadas
+        ]
+        conexion.execute("""
+            INSERT INTO usuarios (cedula, contrasena, rol)
+            SELECT CAST(cedula AS TEXT), contrasena, coalesce(rol, :rol)
+            FROM importacion WHERE true
+            ON CONFLICT(cedula) DO UPDATE SET rol = excluded.rol
+            WHERE excluded.rol IS NOT usuarios.rol AND :con_rol
+        """, {'rol': ROL_DEFECTO, 'con_rol': con_rol})
+    elif reporte['roles_modificados']:
+        conexion.execute("""
+            UPDATE usuarios AS u SET rol = i.rol
+            FROM importacion i WHERE u.cedula = CAST(i.cedula AS TEXT) AND i.rol IS NOT NULL AND u.rol IS NOT i.rol
+        """)
+
+    if reporte['nuevos'] or reporte['modificados'] or reporte['usuarios_nuevos'] or reporte['roles_modificados']:
+        version = conexion.execute('PRAGMA user_version').fetchone()[0]
+        conexion.execute(f'PRAGMA user_version = {version + 1}')
+
+
+def importar_estudiantes(archivo, periodo=None, crear_usuarios=False, simular=False):
+    """
+    Importa la nómina desde un archivo de texto CSV (abierto en modo texto).
+    Con simular=True calcula las diferencias y deshace los cambios.
+    Devuelve el reporte (con crear_usuarios, también las contraseñas generadas, que no se
+    guardan en ningún otro lado); lanza ImportacionInvalida si el archivo no se puede leer.
+    """
+    inicio = time.perf_counter()
+    reporte = {
+        'filas_leidas': 0, 'validas': 0, 'invalidas': 0, 'repetidas': 0,
+        'nuevos': 0, 'modificados': 0, 'sin_cambios': 0,
+        'usuarios_nuevos': 0, 'roles_modificados': 0,
+        'indices_diferidos': False, 'simulado': simular, 'errores': [],
+        'contrasenas_generadas': [],
+    }
+    filas = leer_filas(archivo, periodo)
+    columnas = next(filas)
+
+    conexion = _conectar()
+    try:
+        _crear_temporal(conexion, columnas)
+        _cargar_temporal(conexion, filas, columnas, reporte)
+        lectura = time.perf_counter()
+
+        conexion.execute('BEGIN IMMEDIATE')
+        try:
+            _aplicar(conexion, columnas, reporte, crear_usuarios)
+            cambiadas = [fila[0] for fila in conexion.execute(
+                "SELECT cedula FROM importacion WHERE estado IN ('nuevo', 'modificado')")]
+            conexion.execute('ROLLBACK' if simular else 'COMMIT')
+            if simular:
+                reporte['contrasenas_generadas'] = []  # no se creó ningún usuario
+        except Exception:
+            conexion.execute('ROLLBACK')
+            raise
+        reporte['segundos_escritura'] = round(time.perf_counter() - lectura, 3)
+    finally:
+        conexion.close()
+
+    if not simular:
+        # Los perfiles en caché también guardan las cédulas que no existían
+        cache = current_app.extensions.get('perfil_cache')
+        if cache is not None and len(cambiadas) > cache.max_entradas:
+            invalidar_perfil()
+        else:
+            for cedula in cambiadas:
+                invalidar_perfil(cedula)
+        if cambiadas or reporte['roles_modificados'] or reporte['usuarios_nuevos']:
+            recargar_directorio()
+
+    segundos = time.perf_counter() - inicio
+    reporte['segundos'] = round(segundos, 3)
+    reporte['filas_por_segundo'] = round(reporte['filas_leidas'] / segundos) if segundos > 0 else 0
+    return reporte
+
+
+def abrir_texto(binario, codificacion='utf-8-sig'):
+    """Envuelve un archivo binario (subida o archivo abierto en 'rb') para leerlo como texto CSV."""
+    return io.TextIOWrapper(binario, encoding=codificacion, newline='')
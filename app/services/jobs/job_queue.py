@@ -0,0 +1,357 @@
+# services/jobs/job_queue.py
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+
+# Estados posibles de un trabajo
+PENDIENTE = 'pendiente'
+EN_PROCESO = 'en_proceso'
+COMPLETADO = 'completado'
+FALLIDO = 'fallido'
+
+# Cantidad de trabajos recientes usados para calcular los tiempos de espera
+VENTANA_METRICAS = 500
+
+# Un trabajo en proceso por más de PLAZO segundos se da por abandonado (el proceso
+# que lo tomó murió o se reinició): vuelve a pendiente, o se marca fallido si ya
+# se intentó MAX_INTENTOS veces
+PLAZO = 3600
+MAX_INTENTOS = 3
+
+
+def _error_intentos(intentos):
+    return f"El trabajo quedó sin terminar en {intentos} intentos"
+
+
+def _resumen_esperas(esperas):
+    esperas = sorted(esperas)
+    if not esperas:
+        return {'promedio': 0, 'p95': 0, 'maximo': 0}
+    p95 = esperas[min(len(esperas) - 1, int(len(esperas) * 0.95))]
+    return {
+        'promedio': round(sum(esperas) / len(esperas), 3),
+        'p95': round(p95, 3),
+        'maximo': round(esperas[-1], 3)
+    }
+
+
+class SQLiteJobStore:
+    """
+    Cola de trabajos persistida en un archivo SQLite propio.
+    Al ser un archivo compartido, cualquier worker de gunicorn puede consultar
+    el estado de un trabajo encolado por otro, y retomar los que dejó sin
+    terminar un proceso que ya no existe (ver PLAZO).
+    """
+    def __init__(self, ruta, plazo=PLAZO, max_intentos=MAX_INTENTOS):
+        self.ruta = ruta
+        self.plazo = plazo
+        self.max_intentos = max_intentos
+        with self._conectar() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS trabajos (
+                    id TEXT PRIMARY KEY,
+                    tipo TEXT NOT NULL,
+                    estado TEXT NOT NULL,
+                    payload TEXT,
+                    resultado TEXT,
+                    mimetype TEXT,
+                    nombre TEXT,
+                    error TEXT,
+                    creado REAL NOT NULL,
+                    iniciado REAL,
+                    terminado REAL,
+                    intentos INTEGER NOT NULL DEFAULT 0
+                )
+            """)
+            # Archivos creados antes de la columna intentos
+            columnas = {fila['name'] for fila in conn.execute("PRAGMA table_info(trabajos)")}
+            if 'intentos' not in columnas:
+                conn.execute("ALTER TABLE trabajos ADD COLUMN intentos INTEGER NOT NULL DEFAULT 0")
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_trabajos_estado ON trabajos (estado, creado)")
+
+    @contextmanager
+    def _conectar(self):
+        conn = sqlite3.connect(self.ruta, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def encolar(self, tipo, payload):
+        job_id = uuid.uuid4().hex
+        with self._conectar() as conn:
+            conn.execute(
+                "INSERT INTO trabajos (id, tipo, estado, payload, creado) VALUES (?, ?, ?, ?, ?)",
+                (job_id, tipo, PENDIENTE, json.dumps(payload), time.time())
+            )
+        return job_id
+
+    def _recuperar(self, conn, ahora):
+        """Devuelve a pendiente (o da por fallidos) los trabajos en proceso con el plazo vencido."""
+        vencidos = (EN_PROCESO, ahora - self.plazo)
+        for fila in conn.execute(
+            "SELECT id, intentos FROM trabajos WHERE estado = ? AND iniciado < ? AND intentos >= ?",
+            vencidos + (self.max_intentos,)
+        ).fetchall():
+            conn.execute(
+                "UPDATE trabajos SET estado = ?, error = ?, terminado = ? WHERE id = ?",
+                (FALLIDO, _error_intentos(fila['intentos']), ahora, fila['id'])
+            )
+        conn.execute(
+            "UPDATE trabajos SET estado = ?, iniciado = NULL WHERE estado = ? AND iniciado < ?",
+            (PENDIENTE,) + vencidos
+        )
+
+    def tomar(self):
+        with self._conectar() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._recuperar(conn, time.time())
+                fila = conn.execute(
+                    "SELECT * FROM trabajos WHERE estado = ? ORDER BY creado LIMIT 1", (PENDIENTE,)
+                ).fetchone()
+                if fila is None:
+                    conn.execute("COMMIT")
+                    return None
+                iniciado = time.time()
+                conn.execute(
+                    "UPDATE trabajos SET estado = ?, iniciado = ?, intentos = intentos + 1 WHERE id = ?",
+                    (EN_PROCESO, iniciado, fila['id'])
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        trabajo = dict(fila)
+        trabajo.update(estado=EN_PROCESO, iniciado=iniciado, intentos=fila['intentos'] + 1,
+                       payload=json.loads(fila['payload']))
+        return trabajo
+
+    def completar(self, job_id, resultado, mimetype, nombre):
+        with self._conectar() as conn:
+            conn.execute(
+                "UPDATE trabajos SET estado = ?, resultado = ?, mimetype = ?, nombre = ?, terminado = ? WHERE id = ?",
+                (COMPLETADO, resultado, mimetype, nombre, time.time(), job_id)
+            )
+
+    def fallar(self, job_id, error):
+        with self._conectar() as conn:
+            conn.execute(
+                "UPDATE trabajos SET estado = ?, error = ?, terminado = ? WHERE id = ?",
+                (FALLIDO, error, time.time(), job_id)
+            )
+
+    def obtener(self, job_id):
+        with self._conectar() as conn:
+            fila = conn.execute("SELECT * FROM trabajos WHERE id = ?", (job_id,)).fetchone()
+        if fila is None:
+            return None
+        trabajo = dict(fila)
+        trabajo['payload'] = json.loads(trabajo['payload'] or 'null')
+        return trabajo
+
+    def purgar(self, antes_de):
+        """Elimina los trabajos terminados antes de la fecha dada y devuelve sus resultados."""
+        with self._conectar() as conn:
+            filas = conn.execute(
+                "SELECT resultado, tipo FROM trabajos WHERE terminado IS NOT NULL AND terminado < ?", (antes_de,)
+            ).fetchall()
+            conn.execute("DELETE FROM trabajos WHERE terminado IS NOT NULL AND terminado < ?", (antes_de,))
+        return [dict(f) for f in filas]
+
+    def metricas(self):
+        with self._conectar() as conn:
+            conteos = dict(conn.execute("SELECT estado, COUNT(*) FROM trabajos GROUP BY estado").fetchall())
+            mas_antiguo = conn.execute(
+                "SELECT MIN(creado) FROM trabajos WHERE estado = ?", (PENDIENTE,)
+            ).fetchone()[0]
+            esperas = [f[0] for f in conn.execute(
+                "SELECT iniciado - creado FROM trabajos WHERE iniciado IS NOT NULL ORDER BY iniciado DESC LIMIT ?",
+                (VENTANA_METRICAS,)
+            )]
+        return conteos, mas_antiguo, esperas
+
+
+class MemoryJobStore:
+    """
+    Cola de trabajos en memoria del proceso (sin persistencia).
+    Útil en desarrollo o con un único worker.
+    """
+    def __init__(self, plazo=PLAZO, max_intentos=MAX_INTENTOS):
+        self.plazo = plazo
+        self.max_intentos = max_intentos
+        self._trabajos = {}
+        self._pendientes = deque()
+        self._lock = threading.Lock()
+
+    def encolar(self, tipo, payload):
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._trabajos[job_id] = {
+                'id': job_id, 'tipo': tipo, 'estado': PENDIENTE, 'payload': payload,
+                'resultado': None, 'mimetype': None, 'nombre': None, 'error': None,
+                'creado': time.time(), 'iniciado': None, 'terminado': None, 'intentos': 0
+            }
+            self._pendientes.append(job_id)
+        return job_id
+
+    def _recuperar(self, ahora):
+        """Igual que en SQLiteJobStore: los trabajos en proceso con el plazo vencido."""
+        for trabajo in self._trabajos.values():
+            if trabajo['estado'] != EN_PROCESO or trabajo['iniciado'] >= ahora - self.plazo:
+                continue
+            if trabajo['intentos'] >= self.max_intentos:
+                trabajo.update(estado=FALLIDO, error=_error_intentos(trabajo['intentos']), terminado=ahora)
+            else:
+                trabajo.update(estado=PENDIENTE, iniciado=None)
+                self._pendientes.append(trabajo['id'])
+
+    def tomar(self):
+        with self._lock:
+            ahora = time.time()
+            self._recuperar(ahora)
+            if not self._pendientes:
+                return None
+            trabajo = self._trabajos[self._pendientes.popleft()]
+            trabajo.update(estado=EN_PROCESO, iniciado=ahora, intentos=trabajo['intentos'] + 1)
+            return dict(trabajo)
+
+    def completar(self, job_id, resultado, mimetype, nombre):
+        with self._lock:
+            self._trabajos[job_id].update(
+                estado=COMPLETADO, resultado=resultado, mimetype=mimetype, nombre=nombre, terminado=time.time()
+            )
+
+    def fallar(self, job_id, error):
+        with self._lock:
+            self._trabajos[job_id].update(estado=FALLIDO, error=error, terminado=time.time())
+
+    def obtener(self, job_id):
+        with self._lock:
+            trabajo = self._trabajos.get(job_id)
+            return dict(trabajo) if trabajo else None
+
+    def purgar(self, antes_de):
+        with self._lock:
+            viejos = [t for t in self._trabajos.values() if t['terminado'] and t['terminado'] < antes_de]
+            for trabajo in viejos:
+                del self._trabajos[trabajo['id']]
+        return [{'resultado': t['resultado'], 'tipo': t['tipo']} for t in viejos]
+
+    def metricas(self):
+        with self._lock:
+            conteos = {}
+            for trabajo in self._trabajos.values():
+                conteos[trabajo['estado']] = conteos.get(trabajo['estado'], 0) + 1
+            pendientes = [self._trabajos[i]['creado'] for i in self._pendientes]
+            iniciados = sorted(
+                (t for t in self._trabajos.values() if t['iniciado']), key=lambda t: t['iniciado'], reverse=True
+            )[:VENTANA_METRICAS]
+        esperas = [t['iniciado'] - t['creado'] for t in iniciados]
+        return conteos, min(pendientes) if pendientes else None, esperas
+
+
+class JobQueue:
+    """
+    Cola de trabajos con un pool de hilos que ejecuta los servicios de render.
+    Cada tipo de trabajo tiene un manejador que recibe el payload y devuelve
+    (ruta_resultado, mimetype, nombre_descarga).
+    """
+    def __init__(self, app, store, workers=2, intervalo=0.5, ttl=24 * 3600):
+        self.app = app
+        self.store = store
+        self.workers = workers
+        self.intervalo = intervalo
+        self.ttl = ttl
+        self.manejadores = {}
+        # Tipos de trabajo cuyo resultado es un archivo temporal que se puede borrar al purgar
+        self.temporales = set()
+        self._hilos = []
+        self._pid = None
+        self._aviso = threading.Event()
+        self._lock = threading.Lock()
+        self._ultima_purga = 0.0
+
+    def registrar(self, tipo, manejador, temporal=False):
+        self.manejadores[tipo] = manejador
+        if temporal:
+            self.temporales.add(tipo)
+
+    def iniciar(self):
+        """Arranca los hilos del pool (una vez por proceso, también después de un fork)."""
+        with self._lock:
+            if self._pid == os.getpid() and self._hilos:
+                return
+            self._pid = os.getpid()
+            self._hilos = []
+            for i in range(self.workers):
+                hilo = threading.Thread(target=self._ciclo, name=f"job-worker-{i}", daemon=True)
+                hilo.start()
+                self._hilos.append(hilo)
+
+    def encolar(self, tipo, payload):
+        if tipo not in self.manejadores:
+            raise ValueError(f"Tipo de trabajo desconocido: {tipo}")
+        self.iniciar()
+        job_id = self.store.encolar(tipo, payload)
+        self._aviso.set()
+        return job_id
+
+    def obtener(self, job_id):
+        self.iniciar()
+        return self.store.obtener(job_id)
+
+    def metricas(self):
+        conteos, mas_antiguo, esperas = self.store.metricas()
+        return {
+            'profundidad': conteos.get(PENDIENTE, 0),
+            'en_proceso': conteos.get(EN_PROCESO, 0),
+            'completados': conteos.get(COMPLETADO, 0),
+            'fallidos': conteos.get(FALLIDO, 0),
+            'espera_pendiente_max': round(time.time() - mas_antiguo, 3) if mas_antiguo else 0,
+            'espera_segundos': _resumen_esperas(esperas),
+            'workers': self.workers
+        }
+
+    def _ciclo(self):
+        while True:
+            try:
+                trabajo = self.store.tomar()
+            except Exception as e:
+                print(f"Error al tomar trabajo de la cola: {str(e)}")
+                trabajo = None
+
+            if trabajo is None:
+                self._purgar()
+                self._aviso.wait(self.intervalo)
+                self._aviso.clear()
+                continue
+
+            self._ejecutar(trabajo)
+
+    def _ejecutar(self, trabajo):
+        with self.app.app_context():
+            try:
+                resultado, mimetype, nombre = self.manejadores[trabajo['tipo']](trabajo['payload'], trabajo['id'])
+                self.store.completar(trabajo['id'], resultado, mimetype, nombre)
+            except Exception as e:
+                self.store.fallar(trabajo['id'], str(e))
+
+    def _purgar(self):
+        ahora = time.time()
+        if ahora - self._ultima_purga < 600:
+            return
+        self._ultima_purga = ahora
+        try:
+            for trabajo in self.store.purgar(ahora - self.ttl):
+                if trabajo['tipo'] in self.temporales and trabajo['resultado'] and os.path.exists(trabajo['resultado']):
+                    os.remove(trabajo['resultado'])
+        except Exception as e:
+            print(f"Error al purgar trabajos antiguos: {str(e)}")
@@ -0,0 +1,48 @@
+# services/jobs/render_jobs.py
+import os
+from .job_queue import JobQueue, SQLiteJobStore, MemoryJobStore
+from ..card_generator.carnet_service import obtener_generador
+from ..card_generator.encoding import mimetype_carnet
+from flask import current_app
+from ..pdf_generator.constancy_generator import obtener_generador_constancias, fecha_constancia
+from ..pdf_generator.render_cache import clave_constancia
+
+# Carpeta donde se guardan los PDF generados por la cola
+CARPETA_RESULTADOS = os.path.join('uploads', 'trabajos')
+
+
+def renderizar_carnet(payload, job_id):
+    carnet = obtener_generador().generar_carnet(payload['cedula'], payload.get('foto_path'))
+    extension = os.path.splitext(carnet.ruta_imagen)[1]
+    return carnet.ruta_imagen, mimetype_carnet(carnet.ruta_imagen), f"carnet_{payload['cedula']}{extension}"
+
+
+def renderizar_constancia(payload, job_id):
+    hoy = fecha_constancia()
+    pdf = current_app.extensions['constancy_cache'].obtener_o_generar(
+        clave_constancia(payload, hoy),
+        lambda: obtener_generador_constancias().generate_pdf(payload, hoy).getvalue()
+    )
+    os.makedirs(CARPETA_RESULTADOS, exist_ok=True)
+    ruta = os.path.join(CARPETA_RESULTADOS, f"{job_id}.pdf")
+    with open(ruta, 'wb') as archivo:
+        archivo.write(pdf)
+    return os.path.abspath(ruta), 'application/pdf', f"constancia_{payload['cedula']}.pdf"
+
+
+def init_jobs(app):
+    """
+    Crea la cola de trabajos de render y la deja en app.extensions['job_queue'].
+    Los hilos del pool arrancan con el primer trabajo de cada proceso.
+    """
+    recuperacion = {'plazo': app.config['JOB_PLAZO'], 'max_intentos': app.config['JOB_MAX_INTENTOS']}
+    if app.config['JOB_STORE'] == 'memoria':
+        store = MemoryJobStore(**recuperacion)
+    else:
+        store = SQLiteJobStore(app.config['JOB_DB_PATH'], **recuperacion)
+
+    cola = JobQueue(app, store, workers=app.config['JOB_WORKERS'])
+    cola.registrar('carnet', renderizar_carnet)
+    cola.registrar('constancia', renderizar_constancia, temporal=True)
+    app.extensions['job_queue'] = cola
+    return cola
@@ -0,0 +1,337 @@
+# services/metrics.py
+import bisect
+import glob
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Límites superiores (en ms) de los intervalos de los histogramas
+LIMITES_MS = (0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+# Archivos de estado compartido en la carpeta de métricas
+ARCHIVO_REINICIO = 'reinicio'
+ARCHIVO_LOG_DEBUG = 'log_debug'
+
+logger = logging.getLogger('app.metricas')
+
+
+class Histograma:
+    """Histograma de duraciones en milisegundos con intervalos fijos."""
+    def __init__(self, limites=LIMITES_MS):
+        self.limites = limites
+        self.conteos = [0] * (len(limites) + 1)  # el último intervalo es +inf
+        self.total = 0
+        self.suma = 0.0
+        self.minimo = None
+        self.maximo = None
+
+    def registrar(self, ms):
+        self.conteos[bisect.bisect_left(self.limites, ms)] += 1
+        self.total += 1
+        self.suma += ms
+        self.minimo = ms if self.minimo is None else min(self.minimo, ms)
+        self.maximo = ms if self.maximo is None else max(self.maximo, ms)
+
+    def exportar(self):
+        return {
+            'conteos': list(self.conteos),
+            'total': self.total,
+            'suma': self.suma,
+            'minimo': self.minimo,
+            'maximo': self.maximo
+        }
+
+    def fusionar(self, datos):
+        for i, conteo in enumerate(datos['conteos']):
+            self.conteos[i] += conteo
+        self.total += datos['total']
+        self.suma += datos['suma']
+        for valor in (datos['minimo'], datos['maximo']):
+            if valor is not None:
+                self.minimo = valor if self.minimo is None else min(self.minimo, valor)
+                self.maximo = valor if self.maximo is None else max(self.maximo, valor)
+
+    def percentil(self, p):
+        """Estimación del percentil p: límite superior del intervalo que lo contiene."""
+        if not self.total:
+            return None
+        objetivo = p / 100 * self.total
+        acumulado = 0
+        for i, conteo in enumerate(self.conteos):
+            acumulado += conteo
+            if acumulado >= objetivo:
+                return self.limites[i] if i < len(self.limites) else self.maximo
+        return self.maximo
+
+    def resumen(self):
+        return {
+            'total': self.total,
+            'promedio_ms': round(self.suma / self.total, 3) if self.total else None,
+            'minimo_ms': round(self.minimo, 3) if self.minimo is not None else None,
+            'maximo_ms': round(self.maximo, 3) if self.maximo is not None else None,
+            'p50_ms': self.percentil(50),
+            'p95_ms': self.percentil(95),
+            'p99_ms': self.percentil(99)
+        }
+
+
+class Metricas:
+    """
+    Histogramas por etapa del proceso actual.
+    Cada proceso (worker de gunicorn o del pool) lleva los suyos.
+    """
+    def __init__(self):
+        self._histogramas = {}
+        self._lock = threading.Lock()
+        self.version = 0  # cambia con cada medición, fusión o reinicio
+
+    def registrar(self, etapa, ms):
+        with self._lock:
+            self.version += 1
+            histograma = self._histogramas.get(etapa)
+            if histograma is None:
+                histograma = self._histogramas[etapa] = Histograma()
+            histograma.registrar(ms)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("%s %.2f ms", etapa, ms)
+
+    @contextmanager
+    def medir(self, etapa):
+        """Mide la duración del bloque y la registra en el histograma de la etapa."""
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.registrar(etapa, (time.perf_counter() - inicio) * 1000)
+
+    def exportar(self):
+        with self._lock:
+            return {etapa: h.exportar() for etapa, h in self._histogramas.items()}
+
+    def fusionar(self, datos):
+        """Suma los histogramas exportados por otro proceso (p. ej. un worker del pool)."""
+        with self._lock:
+            self.version += 1
+            for etapa, valores in datos.items():
+                histograma = self._histogramas.get(etapa)
+                if histograma is None:
+                    histograma = self._histogramas[etapa] = Histograma()
+                histograma.fusionar(valores)
+
+    def reiniciar(self):
+        with self._lock:
+            self.version += 1
+            self._histogramas.clear()
+
+    def resumen(self):
+        with self._lock:
+            return {etapa: h.resumen() for etapa, h in sorted(self._histogramas.items())}
+
+    def prometheus(self):
+        """Histogramas en el formato de texto de Prometheus (segundos)."""
+        lineas = [
+            '# HELP render_etapa_segundos Duración de cada etapa de generación.',
+            '# TYPE render_etapa_segundos histogram'
+        ]
+        with self._lock:
+            for etapa, h in sorted(self._histogramas.items()):
+                acumulado = 0
+                for limite, conteo in zip(h.limites + ('+Inf',), h.conteos):
+                    acumulado += conteo
+                    le = limite if limite == '+Inf' else f"{limite / 1000:g}"
+                    lineas.append(f'render_etapa_segundos_bucket{{etapa="{etapa}",le="{le}"}} {acumulado}')
+                lineas.append(f'render_etapa_segundos_sum{{etapa="{etapa}"}} {h.suma / 1000:.6f}')
+                lineas.append(f'render_etapa_segundos_count{{etapa="{etapa}"}} {h.total}')
+        return '\n'.join(lineas) + '\n'
+
+
+# Métricas del proceso
+metricas = Metricas()
+
+
+def medir(etapa):
+    return metricas.medir(etapa)
+
+
+def activar_log_debug(activo=True):
+    """Activa o desactiva el log de cada medición (logger 'app.metricas')."""
+    if activo and not logger.handlers:
+        manejador = logging.StreamHandler()
+        manejador.setFormatter(logging.Formatter('%(asctime)s %(process)d %(name)s %(message)s'))
+        logger.addHandler(manejador)
+    logger.setLevel(logging.DEBUG if activo else logging.INFO)
+    return activo
+
+
+def log_debug_activo():
+    return logger.isEnabledFor(logging.DEBUG)
+
+
+class MetricasCompartidas:
+    """
+    Métricas de todos los workers de gunicorn (cada uno lleva las suyas en `metricas`).
+
+    Al terminar una solicitud que midió algo, el worker escribe sus histogramas exportados
+    en <carpeta>/<pid>_<inicio>.json, y /api/metricas suma los archivos de todos: un scrape
+    de Prometheus ve los mismos contadores sin importar qué worker lo atienda. Los archivos
+    de los workers que terminaron se conservan hasta el próximo reinicio, para que los
+    contadores no retrocedan (como el modo multiproceso de prometheus_client). Los procesos
+    del pool de render no publican: sus tiempos ya se suman en el worker que los lanzó.
+
+    El reinicio y el log de debug se comparten con dos archivos de estado que cada worker
+    revisa al empezar una solicitud (un stat por archivo). Sin carpeta (METRICAS_DIR), las
+    métricas son las del proceso que atiende la solicitud.
+    """
+    def __init__(self, carpeta=None):
+        self.carpeta = carpeta
+        self._lock = threading.Lock()
+        self._pid = None
+        self._archivo = None
+        self._publicada = None  # metricas.version de la última publicación
+        self._marca_reinicio = self._marca(ARCHIVO_REINICIO) if carpeta else None
+        self._reinicio = self._leer(ARCHIVO_REINICIO) if carpeta else None
+
+    def _ruta(self, nombre):
+        return os.path.join(self.carpeta, nombre)
+
+    def _marca(self, nombre):
+        try:
+            return os.stat(self._ruta(nombre)).st_mtime_ns
+        except OSError:
+            return None
+
+    def _leer(self, nombre):
+        try:
+            with open(self._ruta(nombre)) as archivo:
+                return archivo.read().strip()
+        except OSError:
+            return None
+
+    def _escribir(self, ruta, contenido):
+        os.makedirs(self.carpeta, exist_ok=True)
+        temporal = f"{ruta}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temporal, 'w') as archivo:
+            archivo.write(contenido)
+        os.replace(temporal, ruta)
+
+    def _instantaneas(self):
+        return glob.glob(self._ruta('*.json'))
+
+    def revisar(self):
+        """Aplica en este worker un reinicio o un cambio del log de debug hecho por otro."""
+        if self.carpeta is None:
+            return
+        marca = self._marca(ARCHIVO_REINICIO)
+        if marca != self._marca_reinicio:
+            with self._lock:
+                self._marca_reinicio = marca
+                reinicio = self._leer(ARCHIVO_REINICIO)
+                if reinicio != self._reinicio:
+                    self._reinicio = reinicio
+                    metricas.reiniciar()
+        debug = os.path.exists(self._ruta(ARCHIVO_LOG_DEBUG))
+        if debug != log_debug_activo():
+            activar_log_debug(debug)
+
+    def publicar(self):
+        """Escribe las métricas de este worker si cambiaron desde la última publicación."""
+        if self.carpeta is None or metricas.version == self._publicada:
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                # Primera publicación de este proceso (los workers heredan el objeto del máster)
+                self._pid = os.getpid()
+                self._archivo = self._ruta(f"{self._pid}_{time.time_ns()}.json")
+            version = metricas.version
+            try:
+                self._escribir(self._archivo, json.dumps({
+                    'pid': self._pid, 'reinicio': self._reinicio, 'etapas': metricas.exportar()
+                }))
+            except OSError as e:
+                print(f"No se pudieron publicar las métricas: {str(e)}")
+                return
+            self._publicada = version
+
+    def agregadas(self):
+        """(Metricas con la suma de todos los workers, cantidad de procesos sumados)."""
+        if self.carpeta is None:
+            return metricas, 1
+        self.publicar()
+        total = Metricas()
+        procesos = 0
+        for ruta in self._instantaneas():
+            try:
+                with open(ruta) as archivo:
+                    datos = json.load(archivo)
+            except (OSError, ValueError):
+                continue  # borrado por un reinicio mientras se leía
+            if datos.get('reinicio') != self._reinicio:
+                continue  # escrito antes del último reinicio
+            total.fusionar(datos['etapas'])
+            procesos += 1
+        return total, procesos
+
+    def reiniciar(self):
+        """Vacía los histogramas de todos los workers."""
+        metricas.reiniciar()
+        if self.carpeta is None:
+            return
+        with self._lock:
+            self._reinicio = f"{os.getpid()}_{time.time_ns()}"
+            self._escribir(self._ruta(ARCHIVO_REINICIO), self._reinicio)
+            self._marca_reinicio = self._marca(ARCHIVO_REINICIO)
+            for ruta in self._instantaneas():
+                try:
+                    os.remove(ruta)
+                except OSError:
+                    pass
+            self._publicada = None
+
+    def activar_log_debug(self, activo=True):
+        """Activa o desactiva el log de debug de todos los workers (cada uno en su próxima solicitud)."""
+        if self.carpeta is not None:
+            if activo:
+                self._escribir(self._ruta(ARCHIVO_LOG_DEBUG), '1')
+            elif os.path.exists(self._ruta(ARCHIVO_LOG_DEBUG)):
+                os.remove(self._ruta(ARCHIVO_LOG_DEBUG))
+        return activar_log_debug(activo)
+
+    def log_debug_activo(self):
+        if self.carpeta is None:
+            return log_debug_activo()
+        return os.path.exists(self._ruta(ARCHIVO_LOG_DEBUG))
+
+
+def limpiar_carpeta(carpeta):
+    """Borra las métricas y el estado de una ejecución anterior (gunicorn.conf.py, al arrancar)."""
+    for ruta in glob.glob(os.path.join(carpeta, '*.json')) + [
+        os.path.join(carpeta, ARCHIVO_REINICIO), os.path.join(carpeta, ARCHIVO_LOG_DEBUG)
+    ]:
+        try:
+            os.remove(ruta)
+        except OSError:
+            pass
+
+
+def init_metricas(app):
+    """Métricas compartidas entre workers (app.extensions['metricas']), revisadas y publicadas en cada solicitud."""
+    compartidas = MetricasCompartidas(app.config['METRICAS_DIR'])
+    if app.config['RENDER_DEBUG_LOG']:
+        compartidas.activar_log_debug()
+    elif compartidas.carpeta is not None:
+        # El log de debug sigue el archivo compartido (un worker nuevo toma el valor actual)
+        activar_log_debug(compartidas.log_debug_activo())
+
+    @app.before_request
+    def _revisar_metricas():
+        compartidas.revisar()
+
+    @app.teardown_request
+    def _publicar_metricas(error=None):
+        compartidas.publicar()
+
+    app.extensions['metricas'] = compartidas
+    return compartidas
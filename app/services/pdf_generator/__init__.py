@@ -0,0 +1,29 @@
+# services/pdf_generator/__init__.py
+from flask import current_app, has_app_context
+
+_reportlab_configurado = False
+
+
+def configurar_reportlab():
+    """
+    Opciones globales de ReportLab para todos los PDF del proceso (constancias,
+    carnets, hojas de impresión), tomadas de la configuración de la aplicación.
+    La llaman los generadores antes de abrir su primer canvas, no create_app:
+    así un worker no importa reportlab hasta la primera solicitud que lo usa
+    (ver app/arranque.py). Se aplica una sola vez y siempre con el mismo valor,
+    porque rl_config se lee al crear y al guardar cada documento.
+    """
+    global _reportlab_configurado
+    if _reportlab_configurado:
+        return
+    if has_app_context():
+        ascii85 = current_app.config['PDF_ASCII85']
+    else:
+        # Procesos del pool creados sin fork, scripts y benchmarks
+        from ...config import Config
+        ascii85 = Config.PDF_ASCII85
+    from reportlab import rl_config
+    # Imágenes y contenido en binario: la codificación ASCII85 de ReportLab es
+    # Python puro y era lo más costoso de cada documento (los logos JPEG)
+    rl_config.useA85 = 1 if ascii85 else 0
+    _reportlab_configurado = True
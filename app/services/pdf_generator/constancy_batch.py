@@ -0,0 +1,106 @@
+# services/pdf_generator/constancy_batch.py
+import io
+import os
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from reportlab.pdfgen import canvas
+from reportlab.lib.pagesizes import A4
+from .constancy_generator import obtener_generador_constancias
+from ..streaming import SalidaZip
+
+# Tamaño de los bloques que se envían al cliente en el PDF único
+TAMANO_BLOQUE = 64 * 1024
+
+# Entrada del ZIP con las constancias que no se pudieron generar ("cédula: error" por línea)
+ERRORES_ZIP = 'errores.txt'
+
+
+def datos_constancia(estudiante):
+    """Convierte una fila de ESTUDIANTES en los datos que espera la constancia."""
+    datos = {}
+    for campo in ('nombre', 'apellido', 'cedula', 'nucleo', 'periodo', 'carrera', 'seccion', 'turno'):
+        valor = getattr(estudiante, campo)
+        datos[campo] = '' if valor is None else str(valor).strip()
+    return datos
+
+
+def _renderizar(data, hoy):
+    # Se ejecuta en los procesos del pool (el generador se crea una vez por proceso)
+    return data['cedula'], obtener_generador_constancias().generate_pdf(data, hoy).getvalue()
+
+
+def _linea_error(data, error):
+    return f"{data.get('cedula', '')}: {str(error).splitlines()[0] if str(error) else type(error).__name__}"
+
+
+def stream_zip(lista_datos, hoy, workers=None):
+    """
+    Genera las constancias en paralelo y va entregando el ZIP a medida que cada
+    documento termina. Solo hay unas pocas constancias en vuelo a la vez, así que
+    la memoria no crece con el tamaño de la sección.
+    Los encabezados ya se enviaron cuando se renderiza cada constancia: si alguna
+    falla se omite y se anota en ERRORES_ZIP, y el ZIP siempre termina completo.
+    """
+    workers = workers or os.cpu_count() or 1
+    salida = SalidaZip()
+    pendientes = iter(lista_datos)
+    fallidos = []
+
+    with zipfile.ZipFile(salida, 'w', compression=zipfile.ZIP_DEFLATED) as archivo, \
+            ProcessPoolExecutor(max_workers=workers) as pool:
+        en_vuelo = {}
+
+        def enviar(data):
+            """Pone la constancia en el pool; si el pool ya no acepta trabajos, la anota como fallida."""
+            try:
+                en_vuelo[pool.submit(_renderizar, data, hoy)] = data
+                return True
+            except Exception as e:
+                fallidos.append(_linea_error(data, e))
+                return False
+
+        for data in pendientes:
+            enviar(data)
+            if len(en_vuelo) >= workers * 2:
+                break
+
+        while en_vuelo:
+            listos, _ = wait(en_vuelo, return_when=FIRST_COMPLETED)
+            for futuro in listos:
+                data = en_vuelo.pop(futuro)
+                try:
+                    cedula, pdf = futuro.result()
+                    archivo.writestr(f"constancia_{cedula}.pdf", pdf)
+                except Exception as e:
+                    fallidos.append(_linea_error(data, e))
+                for siguiente in pendientes:
+                    if enviar(siguiente):
+                        break
+            yield salida.vaciar()
+
+        if fallidos:
+            archivo.writestr(ERRORES_ZIP, '\n'.join(fallidos) + '\n')
+
+    yield salida.vaciar()
+
+
+def stream_pdf_unico(lista_datos, hoy):
+    """
+    Genera un solo PDF con una página por estudiante. La parte fija de la página
+    se embebe una vez y todas las páginas la reutilizan, por lo que cada página
+    adicional solo agrega sus párrafos (unos 2 KB).
+    """
+    generador = obtener_generador_constancias()
+    buffer = io.BytesIO()
+    c = canvas.Canvas(buffer, pagesize=A4)
+    for data in lista_datos:
+        generador.dibujar_pagina(c, data, hoy)
+        c.showPage()
+    c.save()
+
+    buffer.seek(0)
+    while True:
+        bloque = buffer.read(TAMANO_BLOQUE)
+        if not bloque:
+            break
+        yield bloque
@@ -1,13 +1,25 @@
 from reportlab.lib.pagesizes import A4
 from reportlab.pdfgen import canvas
 from reportlab.lib.units import mm
-from reportlab.lib.utils import ImageReader
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.platypus import Paragraph
+from reportlab.pdfbase.pdfmetrics import stringWidth
 from io import BytesIO
 import os
 from datetime import datetime
 from babel.dates import format_date
+from . import configurar_reportlab
+
+# Nombre del form XObject con la parte fija de la página
+NOMBRE_PLANTILLA = 'PlantillaConstancia'
+
+def fecha_constancia(fecha=None):
+    """Fecha en español con Babel, tal como aparece en la constancia."""
+    return format_date(
+        fecha or datetime.now(),
+        "d 'de' MMMM 'de' yyyy",
+        locale='es'
+    ) + '.'
 
 class ConstancyPDFGenerator:
     def __init__(self):
@@ -36,67 +48,116 @@ class ConstancyPDFGenerator:
                 alignment=1  # Centrado
             ))
 
+        # Estilo del título
+        self.title_style = ParagraphStyle(
+            name='TitleStyle',
+            parent=self.styles['Heading2'],
+            fontSize=16,
+            alignment=1,
+            spaceAfter=14
+        )
+
         # Rutas a assets
         self.base_dir = os.path.dirname(os.path.abspath(__file__))
         self.assets_dir = os.path.join(self.base_dir, 'assets')
         self.logo_unexca = os.path.join(self.assets_dir, 'unexca_logo.jpg')
         self.logo_gobierno = os.path.join(self.assets_dir, 'gobierno_logo.jpg')
 
-    def generate_pdf(self, data):
-        buffer = BytesIO()
-        c = canvas.Canvas(buffer, pagesize=A4)
-
-        left_margin = 25 * mm
-        right_margin = 25 * mm
-        doc_width = A4[0] - (2 * left_margin)
-        center_x = A4[0] / 2
-
-        # Logos
-        try:
-            logo = ImageReader(self.logo_unexca)
-            c.drawImage(logo, left_margin, 255*mm, width=45*mm, height=25*mm, preserveAspectRatio=True)
-        except Exception as e:
-            print("Error cargando logo UNEXCA:", e)
-
-        try:
-            logo = ImageReader(self.logo_gobierno)
-            c.drawImage(logo, A4[0] - right_margin - 45*mm, 255*mm, width=45*mm, height=25*mm, preserveAspectRatio=True)
-        except Exception as e:
-            print("Error cargando logo Gobierno:", e)
+        # Medidas de la página
+        self.left_margin = 25 * mm
+        self.right_margin = 25 * mm
+        self.doc_width = A4[0] - (2 * self.left_margin)
+        self.center_x = A4[0] / 2
+
+        # Logos (se verifican una sola vez)
+        self.logos = []
+        for ruta, x, nombre in (
+            (self.logo_unexca, self.left_margin, 'UNEXCA'),
+            (self.logo_gobierno, A4[0] - self.right_margin - 45*mm, 'Gobierno'),
+        ):
+            if os.path.exists(ruta):
+                self.logos.append((ruta, x))
+            else:
+                print(f"Error cargando logo {nombre}: no existe {ruta}")
+
+        # Textos fijos ya medidos: (fuente, tamaño, x, y, texto)
+        self.textos_fijos = []
 
         # Encabezados
-        c.setFont("Helvetica-Bold", 12)
         header_lines = [
             "REPÚBLICA BOLIVARIANA DE VENEZUELA",
             "MINISTERIO DEL PODER POPULAR PARA LA EDUCACIÓN UNIVERSITARIA",
             "UNIVERSIDAD NACIONAL EXPERIMENTAL DE LA GRAN CARACAS - \"UNEXCA\""
         ]
-        y_position = 245 * mm
-        for line in header_lines:
-            text_width = c.stringWidth(line, "Helvetica-Bold", 12)
-            c.drawString(center_x - (text_width / 2), y_position, line)
-            y_position -= 6 * mm
-
-        # Título
-        subtitle = Paragraph(
-            "<b>CONSTANCIA DE ESTUDIOS</b>",
-            ParagraphStyle(
-                name='TitleStyle',
-                parent=self.styles['Heading2'],
-                fontSize=16,
-                alignment=1,
-                spaceAfter=14
-            )
-        )
-        subtitle.wrapOn(c, doc_width, 40*mm)
-        subtitle.drawOn(c, left_margin, 210*mm)
+        self._agregar_centrados(header_lines, "Helvetica-Bold", 12, 245 * mm, 6 * mm)
+
+        # Firma
+        self._agregar_centrados(["Atentamente"], "Helvetica-Bold", 11, 115 * mm, 0)
+        texts = [
+            "ING. YOVANY DIAZ",
+            "JEFE(E) COORDINACIÓN CONTROL DE ESTUDIOS",
+            "NUCLEO - ALTAGRACIA"
+        ]
+        self._agregar_centrados(texts, "Helvetica-Bold", 11, 85 * mm, 5 * mm)
+
+        # Pie de página
+        contact_lines = [
+            "Esq. De Mijares. Av.Oeste 3. Caracas-Venezuela 1010A. Correo: cesolicitudes.unexca@gmail.com",
+            "Telefono:0212-860.51.81 Extensión 128. COORDINACION CONTROL DE ESTUDIOS - UNEXCA",
+            "RIF G-200128259"
+        ]
+        self._agregar_centrados(contact_lines, "Helvetica", 9, 30 * mm, 5 * mm)
+
+    def _agregar_centrados(self, lineas, fuente, tamano, y_position, interlineado):
+        for line in lineas:
+            text_width = stringWidth(line, fuente, tamano)
+            self.textos_fijos.append((fuente, tamano, self.center_x - (text_width / 2), y_position, line))
+            y_position -= interlineado
+
+    def _dibujar_plantilla(self, c):
+        """
+        Dibuja la parte fija de la página (logos, encabezado, título, firma y pie)
+        como un form XObject. Se define una vez por documento y cada página lo reutiliza,
+        así los logos quedan embebidos una sola vez.
+        """
+        if not c.hasForm(NOMBRE_PLANTILLA):
+            c.beginForm(NOMBRE_PLANTILLA)
+
+            # Logos
+            for logo, x in self.logos:
+                c.drawImage(logo, x, 255*mm, width=45*mm, height=25*mm, preserveAspectRatio=True)
+
+            # Encabezados, firma y pie de página
+            fuente_actual = None
+            for fuente, tamano, x, y, texto in self.textos_fijos:
+                if (fuente, tamano) != fuente_actual:
+                    c.setFont(fuente, tamano)
+                    fuente_actual = (fuente, tamano)
+                c.drawString(x, y, texto)
+
+            # Línea de la firma
+            line_length = 60 * mm
+            c.line(self.center_x - (line_length / 2), 90*mm, self.center_x + (line_length / 2), 90*mm)
+
+            # Título
+            subtitle = Paragraph("<b>CONSTANCIA DE ESTUDIOS</b>", self.title_style)
+            subtitle.wrapOn(c, self.doc_width, 40*mm)
+            subtitle.drawOn(c, self.left_margin, 210*mm)
+
+            c.endForm()
+
+        c.doForm(NOMBRE_PLANTILLA)
+
+    def dibujar_pagina(self, c, data, hoy=None):
+        """
+        Dibuja una constancia completa en la página actual del canvas.
+        Solo se maquetan los párrafos que dependen del estudiante.
+        """
+        self._dibujar_plantilla(c)
 
         # Fecha en español con Babel
-        hoy = format_date(
-            datetime.now(),
-            "d 'de' MMMM 'de' yyyy",
-            locale='es'
-        ) + '.'
+        if hoy is None:
+            hoy = fecha_constancia()
 
         # Texto principal
         texto_constancia = (
@@ -109,48 +170,32 @@ class ConstancyPDFGenerator:
             f"sección <b>{data['seccion']}</b>, turno <b>{data['turno']}</b>."
         )
         paragraph = Paragraph(texto_constancia, self.styles['BodyTextJustified'])
-        paragraph.wrapOn(c, doc_width, 100*mm)
-        paragraph.drawOn(c, left_margin, 160*mm)
+        paragraph.wrapOn(c, self.doc_width, 100*mm)
+        paragraph.drawOn(c, self.left_margin, 160*mm)
 
         # Texto de la fecha
         texto_fecha = (
             f"Constancia que se expide a petición de la parte interesada en Caracas a los {hoy}"
         )
         paragraph = Paragraph(texto_fecha, self.styles['BodyTextJustified'])
-        paragraph.wrapOn(c, doc_width, 20*mm)
-        paragraph.drawOn(c, left_margin, 140*mm)
-
-        # Firma
-        c.setFont("Helvetica-Bold", 11)
-        text_width = c.stringWidth("Atentamente", "Helvetica-Bold", 11)
-        c.drawString(center_x - (text_width / 2), 115*mm, "Atentamente")
-        line_length = 60 * mm
-        c.line(center_x - (line_length / 2), 90*mm, center_x + (line_length / 2), 90*mm)
-
-        texts = [
-            "ING. YOVANY DIAZ",
-            "JEFE(E) COORDINACIÓN CONTROL DE ESTUDIOS",
-            "NUCLEO - ALTAGRACIA"
-        ]
-        y_position = 85 * mm
-        for text in texts:
-            text_width = c.stringWidth(text, "Helvetica-Bold", 11)
-            c.drawString(center_x - (text_width / 2), y_position, text)
-            y_position -= 5 * mm
-
-        # Pie de página
-        c.setFont("Helvetica", 9)
-        contact_lines = [
-            "Esq. De Mijares. Av.Oeste 3. Caracas-Venezuela 1010A. Correo: cesolicitudes.unexca@gmail.com",
-            "Telefono:0212-860.51.81 Extensión 128. COORDINACION CONTROL DE ESTUDIOS - UNEXCA",
-            "RIF G-200128259"
-        ]
-        y_position = 30 * mm
-        for line in contact_lines:
-            text_width = c.stringWidth(line, "Helvetica", 9)
-            c.drawString(center_x - (text_width / 2), y_position, line)
-            y_position -= 5 * mm
+        paragraph.wrapOn(c, self.doc_width, 20*mm)
+        paragraph.drawOn(c, self.left_margin, 140*mm)
 
+    def generate_pdf(self, data, hoy=None):
+        buffer = BytesIO()
+        c = canvas.Canvas(buffer, pagesize=A4)
+        self.dibujar_pagina(c, data, hoy)
         c.save()
         buffer.seek(0)
         return buffer
+
+
+# Generador compartido por todas las solicitudes del proceso
+_generador = None
+
+def obtener_generador_constancias():
+    global _generador
+    if _generador is None:
+        configurar_reportlab()
+        _generador = ConstancyPDFGenerator()
+    return _generador
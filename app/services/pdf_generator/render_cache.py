@@ -0,0 +1,134 @@
+# services/pdf_generator/render_cache.py
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# Subir este valor cuando cambie el diseño de la constancia (invalida todo el caché)
+VERSION_PLANTILLA = 2
+
+# Campos que intervienen en el texto de la constancia
+CAMPOS_CONSTANCIA = ('nombre', 'apellido', 'cedula', 'nucleo', 'periodo', 'carrera', 'seccion', 'turno')
+
+
+def clave_constancia(data, hoy):
+    """
+    Hash de los campos normalizados de la constancia más la fecha ya formateada.
+    Dos solicitudes con la misma clave producen exactamente el mismo PDF.
+    """
+    campos = {campo: ' '.join(str(data.get(campo, '')).split()) for campo in CAMPOS_CONSTANCIA}
+    contenido = json.dumps([VERSION_PLANTILLA, hoy, campos], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(contenido.encode('utf-8')).hexdigest()
+
+
+class RenderCache:
+    """
+    Caché de documentos generados: LRU acotado en memoria y, opcionalmente, en disco.
+    """
+    def __init__(self, max_entradas=256, max_bytes=64 * 1024 * 1024, directorio=None,
+                 extension='.pdf', ttl_disco=2 * 24 * 3600):
+        self.max_entradas = max_entradas
+        self.max_bytes = max_bytes
+        self.directorio = directorio
+        self.extension = extension
+        self.ttl_disco = ttl_disco
+        self._entradas = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._escrituras = 0
+        self.aciertos = 0
+        self.fallos = 0
+        if directorio:
+            os.makedirs(directorio, exist_ok=True)
+
+    def _ruta(self, clave):
+        return os.path.join(self.directorio, clave[:2], clave + self.extension)
+
+    def obtener(self, clave):
+        with self._lock:
+            contenido = self._entradas.get(clave)
+            if contenido is not None:
+                self._entradas.move_to_end(clave)
+                self.aciertos += 1
+                return contenido
+
+        if self.directorio:
+            try:
+                with open(self._ruta(clave), 'rb') as archivo:
+                    contenido = archivo.read()
+            except OSError:
+                contenido = None
+            if contenido is not None:
+                self._guardar_memoria(clave, contenido)
+                with self._lock:
+                    self.aciertos += 1
+                return contenido
+
+        with self._lock:
+            self.fallos += 1
+        return None
+
+    def guardar(self, clave, contenido):
+        self._guardar_memoria(clave, contenido)
+        if self.directorio:
+            self._guardar_disco(clave, contenido)
+
+    def obtener_o_generar(self, clave, generar):
+        """Devuelve el documento en caché o lo genera con generar() y lo guarda."""
+        contenido = self.obtener(clave)
+        if contenido is None:
+            contenido = generar()
+            self.guardar(clave, contenido)
+        return contenido
+
+    def _guardar_memoria(self, clave, contenido):
+        if len(contenido) > self.max_bytes:
+            return
+        with self._lock:
+            anterior = self._entradas.pop(clave, None)
+            if anterior is not None:
+                self._bytes -= len(anterior)
+            self._entradas[clave] = contenido
+            self._bytes += len(contenido)
+            while len(self._entradas) > self.max_entradas or self._bytes > self.max_bytes:
+                _, viejo = self._entradas.popitem(last=False)
+                self._bytes -= len(viejo)
+
+    def _guardar_disco(self, clave, contenido):
+        ruta = self._ruta(clave)
+        try:
+            os.makedirs(os.path.dirname(ruta), exist_ok=True)
+            temporal = f"{ruta}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(temporal, 'wb') as archivo:
+                archivo.write(contenido)
+            os.replace(temporal, ruta)
+        except OSError as e:
+            print(f"No se pudo guardar en el caché de disco: {str(e)}")
+            return
+
+        self._escrituras += 1
+        if self._escrituras % 100 == 0:
+            self._limpiar_disco()
+
+    def _limpiar_disco(self):
+        """Elimina del disco los documentos más antiguos que ttl_disco."""
+        limite = time.time() - self.ttl_disco
+        for raiz, _, archivos in os.walk(self.directorio):
+            for nombre in archivos:
+                ruta = os.path.join(raiz, nombre)
+                try:
+                    if os.path.getmtime(ruta) < limite:
+                        os.remove(ruta)
+                except OSError:
+                    pass
+
+    def estadisticas(self):
+        with self._lock:
+            return {
+                'entradas': len(self._entradas),
+                'bytes': self._bytes,
+                'aciertos': self.aciertos,
+                'fallos': self.fallos
+            }
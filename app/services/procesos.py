@@ -0,0 +1,22 @@
+# services/procesos.py
+import os
+
+
+def leer_workers(valor):
+    """
+    Procesos del pool pedidos en una solicitud ("workers"): un entero que se
+    recorta a 1..os.cpu_count(); sin valor, uno por CPU. Lanza ValueError si
+    no es un entero.
+    """
+    maximo = os.cpu_count() or 1
+    if valor is None or (isinstance(valor, str) and not valor.strip()):
+        return maximo
+    if isinstance(valor, bool):
+        raise ValueError('workers debe ser un número entero')
+    try:
+        workers = int(valor)
+    except (TypeError, ValueError):
+        raise ValueError('workers debe ser un número entero')
+    if workers != valor and not isinstance(valor, str):
+        raise ValueError('workers debe ser un número entero')
+    return min(max(workers, 1), maximo)
@@ -0,0 +1,25 @@
+# services/streaming.py
+import io
+
+
+class SalidaZip(io.RawIOBase):
+    """Destino no posicionable para zipfile: acumula lo escrito hasta que se vacía."""
+    def __init__(self):
+        self._partes = []
+        self._posicion = 0
+
+    def writable(self):
+        return True
+
+    def write(self, datos):
+        self._partes.append(bytes(datos))
+        self._posicion += len(datos)
+        return len(datos)
+
+    def tell(self):
+        return self._posicion
+
+    def vaciar(self):
+        datos = b''.join(self._partes)
+        self._partes.clear()
+        return datos
@@ -0,0 +1,145 @@
+"""
+Tiempo de arranque de la aplicación, con los generadores cargados en la primera
+solicitud (perezoso) o dentro de create_app (precarga, PRECARGAR_RENDER=1).
+
+- proceso: procesos de Python nuevos que importan la app y llaman a create_app;
+  se mide el tiempo total del proceso, el de importación, el de create_app y la
+  primera y la segunda constancia (la primera paga la carga perezosa).
+- gunicorn: un solo worker, con y sin preload_app (gunicorn.conf.py); se mata el
+  worker y se mide cuánto tarda gunicorn en tener otro atendiendo solicitudes.
+
+Uso (desde la raíz del proyecto):
+    python benchmarks/datos_sinteticos.py --estudiantes 10000 --salida /tmp/bench_unexca
+    python benchmarks/bench_arranque.py --datos /tmp/bench_unexca --n 10 --json resultados/arranque.json
+"""
+import argparse
+import http.client
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+
+from comun import RAIZ, resumen_latencias, procesos_hijos, guardar_resultados
+
+SCRIPT_PROCESO = r'''
+import json, sys, time
+inicio = time.perf_counter()
+sys.path.insert(0, %(raiz)r)
+from app import create_app
+app = create_app()
+listo = time.perf_counter()
+cliente = app.test_client()
+datos = {'nombre': 'Eber David', 'apellido': 'Cordova Maiz', 'cedula': '28136554', 'nucleo': 'Altagracia',
+         'periodo': '2024-I', 'carrera': 'Informatica', 'seccion': '10122', 'turno': 'matutino'}
+tiempos = []
+for i in range(2):
+    datos['cedula'] = str(28136554 + i)  # otra constancia: sin caché
+    t = time.perf_counter()
+    assert cliente.post('/api/constancy/generate', json=datos).status_code == 200
+    tiempos.append(time.perf_counter() - t)
+arranque = app.extensions['arranque']
+print(json.dumps({'importacion_s': arranque['importacion_s'], 'create_app_s': arranque['create_app_s'],
+                  'hasta_listo_s': listo - inicio, 'primera_s': tiempos[0], 'segunda_s': tiempos[1]}))
+'''
+
+
+def medir_procesos(n, entorno):
+    muestras = {'proceso_s': [], 'importacion_s': [], 'create_app_s': [], 'hasta_listo_s': [],
+                'primera_s': [], 'segunda_s': []}
+    for _ in range(n):
+        inicio = time.perf_counter()
+        salida = subprocess.run([sys.executable, '-c', SCRIPT_PROCESO % {'raiz': RAIZ}], env=entorno,
+                                capture_output=True, text=True, check=True)
+        muestras['proceso_s'].append(time.perf_counter() - inicio)
+        medidas = json.loads(salida.stdout.strip().splitlines()[-1])
+        for clave, valor in medidas.items():
+            muestras[clave].append(valor)
+    return {clave.replace('_s', ''): resumen_latencias(valores) for clave, valores in muestras.items()}
+
+
+def pid_que_atiende(puerto):
+    conexion = http.client.HTTPConnection('127.0.0.1', puerto, timeout=5)
+    conexion.request('GET', '/api/metricas')
+    cuerpo = json.loads(conexion.getresponse().read())
+    conexion.close()
+    return cuerpo['pid'], cuerpo.get('arranque')
+
+
+def medir_reemplazo(n, entorno, datos, puerto, preload):
+    """Mata el único worker n veces y mide hasta que el reemplazo responde."""
+    entorno = dict(entorno, GUNICORN_PRELOAD='1' if preload else '0', PYTHONPATH=RAIZ)
+    comando = [sys.executable, '-m', 'gunicorn', 'run:app', '-c', os.path.join(RAIZ, 'gunicorn.conf.py'),
+               '--bind', f'127.0.0.1:{puerto}', '--workers', '1', '--chdir', datos,
+               '--pythonpath', RAIZ, '--log-level', 'warning']
+    inicio = time.perf_counter()
+    proceso = subprocess.Popen(comando, env=entorno)
+    try:
+        pid, arranque = esperar_worker(puerto, None, proceso)
+        resultado = {'arranque_servidor_s': round(time.perf_counter() - inicio, 4), 'arranque_worker': arranque}
+        tiempos = []
+        for _ in range(n):
+            inicio = time.perf_counter()
+            os.kill(pid, signal.SIGKILL)
+            pid, _ = esperar_worker(puerto, pid, proceso)
+            tiempos.append(time.perf_counter() - inicio)
+        resultado['reemplazo'] = resumen_latencias(tiempos)
+        resultado['workers'] = len(procesos_hijos(proceso.pid))
+        return resultado
+    finally:
+        proceso.send_signal(signal.SIGTERM)
+        proceso.wait(timeout=30)
+
+
+def esperar_worker(puerto, pid_anterior, proceso, limite=60):
+    fin = time.time() + limite
+    while time.time() < fin:
+        if proceso.poll() is not None:
+            raise RuntimeError(f"gunicorn terminó (código {proceso.returncode})")
+        try:
+            pid, arranque = pid_que_atiende(puerto)
+            if pid != pid_anterior:
+                return pid, arranque
+        except (OSError, http.client.HTTPException, ValueError):
+            pass
+        time.sleep(0.005)
+    raise RuntimeError("gunicorn no respondió a tiempo")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--datos', default='/tmp/bench_unexca', help='Carpeta de datos_sinteticos.py')
+    parser.add_argument('--n', type=int, default=10, help='Procesos y reemplazos de worker por modo')
+    parser.add_argument('--puerto', type=int, default=8766)
+    parser.add_argument('--sin-gunicorn', action='store_true')
+    parser.add_argument('--json', help='Archivo de resultados')
+    args = parser.parse_args()
+
+    with open(os.path.join(args.datos, 'manifiesto.json'), encoding='utf-8') as archivo:
+        base = json.load(archivo)['base']
+    entorno = dict(os.environ, DB_PATH=base, APP_ENV='production')
+    entorno.pop('PRECARGAR_RENDER', None)
+
+    resultados = {}
+    for nombre, precarga in (('perezoso', '0'), ('precarga', '1')):
+        r = medir_procesos(args.n, dict(entorno, PRECARGAR_RENDER=precarga))
+        resultados[f'proceso_{nombre}'] = r
+        print(f"proceso {nombre:<9} total p50 {r['proceso']['p50_ms']:7.1f} ms  importación {r['importacion']['p50_ms']:7.1f} ms  "
+              f"create_app {r['create_app']['p50_ms']:7.1f} ms  1ª constancia {r['primera']['p50_ms']:7.1f} ms  "
+              f"2ª {r['segunda']['p50_ms']:6.1f} ms")
+
+    if not args.sin_gunicorn:
+        for nombre, preload in (('sin_preload', False), ('preload', True)):
+            r = medir_reemplazo(args.n, entorno, args.datos, args.puerto, preload)
+            resultados[f'gunicorn_{nombre}'] = r
+            print(f"gunicorn {nombre:<11} arranque {r['arranque_servidor_s']:6.2f} s  "
+                  f"reemplazo de worker p50 {r['reemplazo']['p50_ms']:7.1f} ms  p99 {r['reemplazo']['p99_ms']:7.1f} ms")
+
+    if args.json:
+        guardar_resultados(args.json, 'arranque', vars(args), resultados)
+        print(f"Resultados en {args.json}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+"""
+Benchmark de los formatos de salida del carnet (CARNET_FORMATO).
+
+Para cada formato mide el tiempo de codificación, el tamaño del archivo, el tiempo
+de decodificación (lo que paga la exportación a PDF al releerlo) y el ancho de banda
+que consumiría servir la imagen completa o la miniatura.
+
+Uso (desde la raíz del proyecto):
+    python benchmarks/bench_codificacion_carnet.py --n 20 --solicitudes 10000
+"""
+import argparse
+import os
+import sys
+import time
+from io import BytesIO
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from PIL import Image
+from app.services.card_generator.encoding import SalidaCarnet, FORMATOS_CARNET
+
+CARNET_EJEMPLO = os.path.join('app', 'assets', 'carnets', '28136554.png')
+
+
+def cronometrar(n, funcion):
+    funcion()  # calentamiento
+    inicio = time.perf_counter()
+    for _ in range(n):
+        resultado = funcion()
+    return (time.perf_counter() - inicio) / n * 1000, resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--carnet', default=CARNET_EJEMPLO, help='Carnet ya generado (PNG RGBA)')
+    parser.add_argument('--n', type=int, default=20, help='Repeticiones por formato')
+    parser.add_argument('--solicitudes', type=int, default=10000,
+                        help='Solicitudes a /api/carnet/imagen para estimar el ancho de banda')
+    args = parser.parse_args()
+
+    with Image.open(args.carnet) as original:
+        img = original.convert('RGBA')
+
+    print(f"Carnet {img.size[0]}x{img.size[1]}, {args.n} repeticiones, {args.solicitudes} solicitudes\n")
+    print(f"{'formato':<12} {'codificar':>10} {'decodificar':>12} {'tamaño':>10} {'transferido':>12}")
+    for formato in FORMATOS_CARNET:
+        salida = SalidaCarnet(formato=formato)
+        ms_cod, contenido = cronometrar(args.n, lambda: salida.codificar(img))
+        ms_dec, _ = cronometrar(args.n, lambda: Image.open(BytesIO(contenido)).load())
+        total = len(contenido) * args.solicitudes / 1024 / 1024
+        print(f"{formato:<12} {ms_cod:8.1f} ms {ms_dec:9.1f} ms {len(contenido) / 1024:7.1f} KB {total:9.1f} MB")
+
+    salida = SalidaCarnet()
+    ms_min, miniatura = cronometrar(args.n, lambda: salida.miniatura(img))
+    total = len(miniatura) * args.solicitudes / 1024 / 1024
+    print(f"\nminiatura {salida.ancho_miniatura}px: {ms_min:.1f} ms, {len(miniatura) / 1024:.1f} KB, {total:.1f} MB transferidos")
+
+
+if __name__ == '__main__':
+    main()
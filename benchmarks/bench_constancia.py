@@ -0,0 +1,80 @@
+"""
+Benchmark de la generación de constancias de estudio.
+
+Uso (desde la raíz del proyecto):
+    python benchmarks/bench_constancia.py --n 200
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from reportlab import rl_config
+from reportlab.pdfgen import canvas
+from reportlab.lib.pagesizes import A4
+from io import BytesIO
+from app.services.pdf_generator import configurar_reportlab
+from app.services.pdf_generator.constancy_generator import ConstancyPDFGenerator, fecha_constancia
+
+DATOS = {
+    'nombre': 'Eber David', 'apellido': 'Cordova Maiz', 'cedula': '28136554',
+    'nucleo': 'Altagracia', 'periodo': '2024-I', 'carrera': 'Informatica',
+    'seccion': '10122', 'turno': 'matutino'
+}
+
+
+def medir(nombre, n, funcion, paginas=1):
+    funcion()  # calentamiento
+    inicio = time.perf_counter()
+    for _ in range(n):
+        tamano = funcion()
+    ms = (time.perf_counter() - inicio) / (n * paginas) * 1000
+    print(f"{nombre:<36} {ms:8.2f} ms/pág  {tamano / paginas / 1024:8.1f} KB/pág")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--n', type=int, default=200, help='Documentos por escenario')
+    args = parser.parse_args()
+
+    # Lo mismo que hacen los generadores antes de su primer canvas
+    configurar_reportlab()
+    hoy = fecha_constancia()
+    compartido = ConstancyPDFGenerator()
+
+    # Escenario anterior: generador nuevo por solicitud e imágenes en ASCII85
+    def anterior():
+        rl_config.useA85 = 1
+        try:
+            return len(ConstancyPDFGenerator().generate_pdf(DATOS, hoy).getvalue())
+        finally:
+            rl_config.useA85 = 0
+
+    def por_solicitud():
+        return len(ConstancyPDFGenerator().generate_pdf(DATOS, hoy).getvalue())
+
+    def reutilizable():
+        return len(compartido.generate_pdf(DATOS, hoy).getvalue())
+
+    # Varias constancias en un mismo PDF: la plantilla se embebe una sola vez
+    paginas = 50
+
+    def multipagina():
+        buffer = BytesIO()
+        c = canvas.Canvas(buffer, pagesize=A4)
+        for _ in range(paginas):
+            compartido.dibujar_pagina(c, DATOS, hoy)
+            c.showPage()
+        c.save()
+        return len(buffer.getvalue())
+
+    medir('anterior (nuevo + ASCII85)', args.n, anterior)
+    medir('generador nuevo por solicitud', args.n, por_solicitud)
+    medir('generador reutilizable', args.n, reutilizable)
+    medir(f'un PDF de {paginas} páginas', max(1, args.n // paginas), multipagina, paginas)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+"""
+Micro-benchmarks de las funciones de render, sin HTTP ni base de datos:
+CarnetGenerator._generar_imagen, generar_pdf_en_memoria (raster), el PDF vectorial
+del carnet y ConstancyPDFGenerator.generate_pdf.
+
+Para cada una mide la latencia (percentiles), el rendimiento y el pico de memoria,
+y escribe los resultados en JSON para compararlos con benchmarks/comparar.py.
+
+Uso (desde la raíz del proyecto):
+    python benchmarks/bench_micro.py --n 200 --json resultados/micro.json
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from comun import resumen_latencias, rss_maximo_propio_kb, guardar_resultados
+from datos_sinteticos import foto_sintetica
+
+DATOS_CONSTANCIA = {
+    'nombre': 'Eber David', 'apellido': 'Cordova Maiz', 'cedula': '28136554',
+    'nucleo': 'Altagracia', 'periodo': '2024-I', 'carrera': 'Informatica',
+    'seccion': '10122', 'turno': 'matutino'
+}
+
+
+def cronometrar(n, funcion, calentamiento=3):
+    for _ in range(calentamiento):
+        funcion()
+    tiempos = []
+    inicio_total = time.perf_counter()
+    for _ in range(n):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    total = time.perf_counter() - inicio_total
+    resultado = resumen_latencias(tiempos)
+    resultado['operaciones_por_segundo'] = round(n / total, 2)
+    return resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--n', type=int, default=100, help='Repeticiones por función')
+    parser.add_argument('--solo', action='append', help='Ejecutar solo esta función (se puede repetir)')
+    parser.add_argument('--json', help='Archivo de resultados')
+    args = parser.parse_args()
+
+    carpeta = tempfile.mkdtemp(prefix='bench_micro_')
+    # Que la aplicación nunca abra la base real mientras se importan sus módulos
+    os.environ.setdefault('DB_PATH', os.path.join(carpeta, 'vacia.db'))
+
+    from app.services.card_generator.carnet_service import CarnetGenerator
+    from app.services.card_generator.carnet_pdf import generar_pdf_en_memoria
+    from app.services.card_generator.carnet_vectorial import obtener_generador_vectorial
+    from app.services.card_generator.photo_store import AlmacenFotos
+    from app.services.pdf_generator.constancy_generator import ConstancyPDFGenerator, fecha_constancia
+    from app.services.pdf_generator import configurar_reportlab
+
+    # Lo mismo que hacen los generadores antes de su primer canvas
+    configurar_reportlab()
+
+    ruta_jpg = os.path.join(carpeta, 'foto.jpg')
+    foto_sintetica(0).save(ruta_jpg, format='JPEG', quality=88)
+    with open(ruta_jpg, 'rb') as origen:
+        foto = AlmacenFotos(os.path.join(carpeta, 'fotos')).guardar(origen)
+
+    generador = CarnetGenerator()
+    generador.carnets_dir = carpeta
+    datos = {
+        'nombre': 'Eber David', 'apellidos': 'Cordova Maiz', 'cedula': '28136554', 'foto': foto,
+        'rol': 'ESTUDIANTE', 'carrera': 'Informatica', 'vence': '18/04/2027'
+    }
+    imagen = generador._generar_imagen(**datos)
+    constancias = ConstancyPDFGenerator()
+    hoy = fecha_constancia()
+
+    funciones = {
+        'carnet_generar_imagen': lambda: generador._generar_imagen(**datos),
+        'carnet_pdf_raster': lambda: generar_pdf_en_memoria(imagen, cedula=datos['cedula']),
+        'carnet_pdf_vectorial': lambda: obtener_generador_vectorial().generar_pdf(datos),
+        'constancia_generate_pdf': lambda: constancias.generate_pdf(DATOS_CONSTANCIA, hoy),
+    }
+
+    resultados = {}
+    for nombre, funcion in funciones.items():
+        if args.solo and nombre not in args.solo:
+            continue
+        resultados[nombre] = cronometrar(args.n, funcion)
+        resultados[nombre]['rss_max_kb'] = rss_maximo_propio_kb()
+        r = resultados[nombre]
+        print(f"{nombre:<26} p50 {r['p50_ms']:8.2f} ms  p99 {r['p99_ms']:8.2f} ms  "
+              f"{r['operaciones_por_segundo']:8.1f} op/s  RSS {r['rss_max_kb'] / 1024:6.1f} MB")
+
+    if args.json:
+        guardar_resultados(args.json, 'micro', vars(args), resultados)
+        print(f"Resultados en {args.json}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+"""
+Benchmark de lecturas y escrituras concurrentes sobre SQLite.
+
+Compara la configuración por defecto de SQLite (journal DELETE) con los PRAGMAs
+de app/config.py (WAL, busy_timeout, synchronous, mmap_size, cache_size).
+Cada proceso lector busca estudiantes por cédula; cada escritor registra carnets.
+
+Uso (desde la raíz del proyecto):
+    python benchmarks/bench_sqlite_concurrencia.py --lectores 6 --escritores 2 --segundos 5
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.config import ProductionConfig
+from app.database import aplicar_pragmas
+
+ESTUDIANTES = 20000
+
+
+def crear_base(ruta):
+    conn = sqlite3.connect(ruta)
+    conn.execute('CREATE TABLE ESTUDIANTES (cedula INTEGER, apellido TEXT, nombre TEXT, carrera TEXT, '
+                 'seccion INTEGER, turno TEXT, periodo TEXT, nucleo TEXT)')
+    conn.execute('CREATE INDEX ix_estudiantes_cedula ON ESTUDIANTES (cedula)')
+    conn.execute('CREATE TABLE carnets (id INTEGER PRIMARY KEY, cedula TEXT NOT NULL, '
+                 'fecha_emision NUMERIC, fecha_vencimiento NUMERIC, ruta_imagen TEXT)')
+    conn.execute('CREATE INDEX ix_carnets_cedula_fecha ON carnets (cedula, fecha_emision)')
+    conn.executemany(
+        'INSERT INTO ESTUDIANTES VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+        ((10000000 + i, f'Apellido {i}', f'Nombre {i}', 'Informatica', 10122, 'matutino', '2024-I', 'Altagracia')
+         for i in range(ESTUDIANTES))
+    )
+    conn.commit()
+    conn.close()
+
+
+def conectar(ruta, ajustado):
+    if ajustado:
+        pragmas = ProductionConfig.SQLITE_PRAGMAS
+        conn = sqlite3.connect(ruta, timeout=pragmas['busy_timeout'] / 1000)
+        aplicar_pragmas(conn, pragmas)
+    else:
+        conn = sqlite3.connect(ruta)
+        conn.execute('PRAGMA journal_mode = DELETE')
+    return conn
+
+
+def trabajador(ruta, ajustado, escritor, segundos, resultados):
+    conn = conectar(ruta, ajustado)
+    operaciones = errores = 0
+    fin = time.perf_counter() + segundos
+    while time.perf_counter() < fin:
+        cedula = 10000000 + random.randrange(ESTUDIANTES)
+        try:
+            if escritor:
+                conn.execute(
+                    "INSERT INTO carnets (cedula, fecha_emision, fecha_vencimiento, ruta_imagen) "
+                    "VALUES (?, datetime('now'), datetime('now', '+6 months'), ?)",
+                    (str(cedula), f'app/assets/carnets/{cedula}.png')
+                )
+                conn.commit()
+            else:
+                conn.execute('SELECT * FROM ESTUDIANTES WHERE cedula = ?', (cedula,)).fetchone()
+                conn.execute('SELECT * FROM carnets WHERE cedula = ? ORDER BY fecha_emision DESC LIMIT 1',
+                             (str(cedula),)).fetchone()
+            operaciones += 1
+        except sqlite3.OperationalError:
+            errores += 1
+            conn.rollback()
+    conn.close()
+    resultados.put((escritor, operaciones, errores))
+
+
+def escenario(nombre, ajustado, args):
+    with tempfile.TemporaryDirectory() as carpeta:
+        ruta = os.path.join(carpeta, 'bench.db')
+        crear_base(ruta)
+        resultados = multiprocessing.Queue()
+        procesos = [
+            multiprocessing.Process(target=trabajador, args=(ruta, ajustado, i < args.escritores, args.segundos, resultados))
+            for i in range(args.escritores + args.lectores)
+        ]
+        for p in procesos:
+            p.start()
+        totales = {True: [0, 0], False: [0, 0]}
+        for _ in procesos:
+            escritor, operaciones, errores = resultados.get()
+            totales[escritor][0] += operaciones
+            totales[escritor][1] += errores
+        for p in procesos:
+            p.join()
+
+    lecturas, errores_lectura = totales[False]
+    escrituras, errores_escritura = totales[True]
+    print(f"{nombre:<12} lecturas {lecturas / args.segundos:9.0f}/s  escrituras {escrituras / args.segundos:7.0f}/s"
+          f"  total {(lecturas + escrituras) / args.segundos:9.0f}/s"
+          f"  'database is locked': {errores_lectura + errores_escritura}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--lectores', type=int, default=6)
+    parser.add_argument('--escritores', type=int, default=2)
+    parser.add_argument('--segundos', type=float, default=5)
+    args = parser.parse_args()
+
+    escenario('por defecto', False, args)
+    escenario('ajustado', True, args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,336 @@
+"""
+Prueba de carga HTTP de los endpoints principales contra un gunicorn local.
+
+Escenarios: login, perfil, generar (carnet con foto), descargar_pdf, constancia, imagen
+y verificar (QR firmado de carnets de la base sintética).
+Cada escenario se ejecuta con varios niveles de concurrencia (clientes en paralelo,
+cada uno con su propia conexión keep-alive) durante un tiempo fijo. Se miden los
+percentiles de latencia, el rendimiento, los códigos de respuesta y la memoria (RSS)
+del máster y de los workers de gunicorn, y se escriben en JSON.
+
+Primero se generan los datos sintéticos (benchmarks/datos_sinteticos.py); el
+servidor se arranca con esa carpeta como directorio de trabajo y DB_PATH apuntando
+a su base. El escenario "generar" escribe imágenes en app/assets/carnets; las que
+se crean durante la prueba se borran al terminar.
+
+Uso (desde la raíz del proyecto):
+    python benchmarks/datos_sinteticos.py --estudiantes 100000 --salida /tmp/bench_unexca
+    python benchmarks/carga_http.py --datos /tmp/bench_unexca --clientes 1 8 32 --segundos 10 \\
+        --json resultados/http.json
+    # Contra un servidor ya levantado (sin medir su memoria, salvo que se indique --pid):
+    python benchmarks/carga_http.py --datos /tmp/bench_unexca --url http://127.0.0.1:8000
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import signal
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from urllib.parse import urlsplit
+
+from comun import RAIZ, resumen_latencias, rss_arbol_kb, guardar_resultados
+
+sys.path.insert(0, RAIZ)
+
+ESCENARIOS = ('login', 'perfil', 'generar', 'descargar_pdf', 'constancia', 'imagen', 'verificar')
+CARPETA_CARNETS = os.path.join(RAIZ, 'app', 'assets', 'carnets')
+
+# Tokens distintos que se obtienen antes de medir (perfil, generar, descargar_pdf)
+TOKENS = 50
+
+
+class Cliente:
+    """Conexión keep-alive propia de cada hilo."""
+    def __init__(self, host, puerto, timeout=60):
+        self.host, self.puerto, self.timeout = host, puerto, timeout
+        self.conexion = None
+
+    def solicitar(self, metodo, ruta, cuerpo=None, cabeceras=None):
+        if self.conexion is None:
+            self.conexion = http.client.HTTPConnection(self.host, self.puerto, timeout=self.timeout)
+        try:
+            self.conexion.request(metodo, ruta, body=cuerpo, headers=cabeceras or {})
+            respuesta = self.conexion.getresponse()
+            contenido = respuesta.read()
+            return respuesta.status, respuesta.getheader('ETag'), contenido
+        except (OSError, http.client.HTTPException):
+            self.conexion.close()
+            self.conexion = None
+            raise
+
+
+def multipart(campos, archivos):
+    """Cuerpo multipart/form-data: campos {nombre: valor}, archivos {nombre: (archivo, bytes, tipo)}."""
+    limite = uuid.uuid4().hex
+    partes = []
+    for nombre, valor in campos.items():
+        partes.append(f'--{limite}\r\nContent-Disposition: form-data; name="{nombre}"\r\n\r\n{valor}\r\n'.encode())
+    for nombre, (archivo, contenido, tipo) in archivos.items():
+        partes.append(f'--{limite}\r\nContent-Disposition: form-data; name="{nombre}"; filename="{archivo}"\r\n'
+                      f'Content-Type: {tipo}\r\n\r\n'.encode() + contenido + b'\r\n')
+    partes.append(f'--{limite}--\r\n'.encode())
+    return b''.join(partes), {'Content-Type': f'multipart/form-data; boundary={limite}'}
+
+
+class Escenarios:
+    """Arma la solicitud de cada escenario a partir del manifiesto de los datos sintéticos."""
+    def __init__(self, manifiesto, tokens, condicional=False):
+        self.inicial = manifiesto['cedula_inicial']
+        self.estudiantes = manifiesto['conteos']['estudiantes']
+        self.usuarios = manifiesto['conteos']['usuarios']
+        self.carnets = manifiesto['conteos']['carnets']
+        self.fotos = []
+        for ruta in manifiesto['fotos_subida']:
+            with open(ruta, 'rb') as archivo:
+                self.fotos.append(archivo.read())
+        self.tokens = tokens
+        self.condicional = condicional
+        self.codigos = codigos_qr(manifiesto['base'])
+
+    def _token(self, aleatorio):
+        cedula, token = aleatorio.choice(self.tokens)
+        return cedula, {'Authorization': f'Bearer {token}'}
+
+    def login(self, aleatorio, estado):
+        cedula = str(self.inicial + aleatorio.randrange(self.usuarios))
+        cuerpo = json.dumps({'cedula': cedula, 'password': cedula})
+        return 'POST', '/api/auth/login', cuerpo, {'Content-Type': 'application/json'}
+
+    def perfil(self, aleatorio, estado):
+        return ('GET', '/api/auth/perfil', None) + (self._token(aleatorio)[1],)
+
+    def generar(self, aleatorio, estado):
+        cedula, cabeceras = self._token(aleatorio)
+        cuerpo, tipo = multipart({'cedula': cedula}, {'foto': ('foto.jpg', aleatorio.choice(self.fotos), 'image/jpeg')})
+        return 'POST', '/api/carnet/generar', cuerpo, dict(cabeceras, **tipo)
+
+    def descargar_pdf(self, aleatorio, estado):
+        cabeceras = self._token(aleatorio)[1]
+        cedula = self.inicial + aleatorio.randrange(self.carnets)
+        return 'GET', f'/api/carnet/descargar-pdf/{cedula}', None, cabeceras
+
+    def constancia(self, aleatorio, estado):
+        cedula = self.inicial + aleatorio.randrange(self.estudiantes)
+        cuerpo = json.dumps({
+            'nombre': 'Nombre', 'apellido': f'Apellido {cedula}', 'cedula': str(cedula), 'nucleo': 'Altagracia',
+            'periodo': '2024-I', 'carrera': 'Informatica', 'seccion': '10122', 'turno': 'matutino'
+        })
+        return 'POST', '/api/constancy/generate', cuerpo, {'Content-Type': 'application/json'}
+
+    def imagen(self, aleatorio, estado):
+        carnet_id = 1 + aleatorio.randrange(self.carnets)
+        cabeceras = {}
+        if self.condicional and carnet_id in estado:
+            cabeceras['If-None-Match'] = estado[carnet_id]
+        estado['ultimo'] = carnet_id
+        return 'GET', f'/api/carnet/imagen/{carnet_id}', None, cabeceras
+
+    def verificar(self, aleatorio, estado):
+        return 'GET', f'/api/carnet/verificar/{aleatorio.choice(self.codigos)}', None, {}
+
+
+def codigos_qr(base, cantidad=2000):
+    """Contenido del QR de algunos carnets de la base, firmado con la clave del servidor (CARNET_QR_CLAVE)."""
+    from datetime import datetime
+    from app.config import Config
+    from app.services.card_generator.verificacion import codigo_carnet, vencimiento_impreso
+
+    conn = sqlite3.connect(base)
+    filas = conn.execute('SELECT cedula, fecha_emision FROM carnets ORDER BY random() LIMIT ?', (cantidad,)).fetchall()
+    conn.close()
+    codigos = []
+    for cedula, emision in filas:
+        emision = datetime.fromisoformat(emision).date()
+        codigos.append(codigo_carnet(Config.CARNET_QR_CLAVE, cedula, emision, vencimiento_impreso(emision)))
+    return codigos
+
+
+def obtener_tokens(cliente, manifiesto, cantidad=TOKENS):
+    tokens = []
+    for i in range(min(cantidad, manifiesto['conteos']['usuarios'])):
+        cedula = str(manifiesto['cedula_inicial'] + i)
+        estado, _, cuerpo = cliente.solicitar('POST', '/api/auth/login', json.dumps({'cedula': cedula, 'password': cedula}),
+                                              {'Content-Type': 'application/json'})
+        if estado != 200:
+            raise RuntimeError(f"No se pudo iniciar sesión con {cedula}: {estado} {cuerpo[:200]!r}")
+        tokens.append((cedula, json.loads(cuerpo)['access_token']))
+    return tokens
+
+
+class MuestreoMemoria(threading.Thread):
+    """Mide cada cierto tiempo el RSS del máster de gunicorn y de sus workers."""
+    def __init__(self, pid, intervalo=0.25):
+        super().__init__(daemon=True)
+        self.pid, self.intervalo = pid, intervalo
+        self.maximo = 0
+        self.ultimo = {}
+        self._detener = threading.Event()
+
+    def run(self):
+        while not self._detener.is_set():
+            total, por_proceso = rss_arbol_kb(self.pid)
+            self.maximo = max(self.maximo, total)
+            self.ultimo = por_proceso
+            self._detener.wait(self.intervalo)
+
+    def detener(self):
+        self._detener.set()
+        self.join()
+        return {'rss_max_kb': self.maximo, 'rss_final_kb': sum(self.ultimo.values()),
+                'procesos': len(self.ultimo)}
+
+
+def ejecutar(host, puerto, escenarios, nombre, clientes, segundos, pid=None, semilla=1):
+    generar_solicitud = getattr(escenarios, nombre)
+    latencias, codigos, errores = [], Counter(), Counter()
+    lock = threading.Lock()
+    fin = time.perf_counter() + segundos
+    muestreo = MuestreoMemoria(pid) if pid else None
+
+    def hilo(numero):
+        aleatorio = random.Random(semilla * 1000 + numero)
+        cliente = Cliente(host, puerto)
+        estado = {}
+        propias, propios, propios_errores = [], Counter(), Counter()
+        while time.perf_counter() < fin:
+            metodo, ruta, cuerpo, cabeceras = generar_solicitud(aleatorio, estado)
+            inicio = time.perf_counter()
+            try:
+                codigo, etag, _ = cliente.solicitar(metodo, ruta, cuerpo, cabeceras)
+            except Exception as e:
+                propios_errores[type(e).__name__] += 1
+                continue
+            propias.append(time.perf_counter() - inicio)
+            propios[codigo] += 1
+            if etag and 'ultimo' in estado:
+                estado[estado['ultimo']] = etag
+        with lock:
+            latencias.extend(propias)
+            codigos.update(propios)
+            errores.update(propios_errores)
+
+    if muestreo:
+        muestreo.start()
+    inicio = time.perf_counter()
+    hilos = [threading.Thread(target=hilo, args=(i,)) for i in range(clientes)]
+    for h in hilos:
+        h.start()
+    for h in hilos:
+        h.join()
+    duracion = time.perf_counter() - inicio
+
+    correctas = sum(n for codigo, n in codigos.items() if codigo < 400)
+    resultado = {
+        'escenario': nombre,
+        'clientes': clientes,
+        'segundos': round(duracion, 3),
+        'solicitudes': len(latencias),
+        'correctas': correctas,
+        'codigos': {str(codigo): n for codigo, n in sorted(codigos.items())},
+        'errores_conexion': dict(errores),
+        'rendimiento_rps': round(correctas / duracion, 2) if duracion else 0,
+    }
+    resultado.update(resumen_latencias(latencias))
+    if muestreo:
+        resultado.update(muestreo.detener())
+    return resultado
+
+
+def esperar_servidor(host, puerto, proceso, limite=60):
+    fin = time.time() + limite
+    while time.time() < fin:
+        if proceso is not None and proceso.poll() is not None:
+            raise RuntimeError(f"gunicorn terminó al arrancar (código {proceso.returncode})")
+        try:
+            conexion = http.client.HTTPConnection(host, puerto, timeout=2)
+            conexion.request('GET', '/api/carnet/imagen/0')
+            conexion.getresponse().read()
+            conexion.close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError("gunicorn no respondió a tiempo")
+
+
+def iniciar_gunicorn(args, manifiesto):
+    entorno = dict(os.environ, DB_PATH=manifiesto['base'], APP_ENV=args.entorno, PYTHONPATH=RAIZ)
+    comando = [
+        sys.executable, '-m', 'gunicorn', 'run:app',
+        '--bind', f'127.0.0.1:{args.puerto}',
+        '--workers', str(args.workers),
+        '--worker-class', 'gthread', '--threads', str(args.threads),
+        '--chdir', args.datos, '--pythonpath', RAIZ,
+        '--timeout', '120', '--log-level', 'warning',
+    ]
+    return subprocess.Popen(comando, env=entorno)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--datos', default='/tmp/bench_unexca', help='Carpeta de datos_sinteticos.py')
+    parser.add_argument('--url', help='Servidor ya levantado (si no, se arranca gunicorn)')
+    parser.add_argument('--pid', type=int, help='PID del máster de gunicorn para medir su memoria (con --url)')
+    parser.add_argument('--puerto', type=int, default=8765)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--entorno', default='production', help='APP_ENV del servidor')
+    parser.add_argument('--escenario', action='append', choices=ESCENARIOS, help='Por defecto, todos')
+    parser.add_argument('--clientes', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--segundos', type=float, default=10)
+    parser.add_argument('--condicional', action='store_true', help='imagen: reenviar el ETag recibido (If-None-Match)')
+    parser.add_argument('--json', help='Archivo de resultados')
+    args = parser.parse_args()
+
+    with open(os.path.join(args.datos, 'manifiesto.json'), encoding='utf-8') as archivo:
+        manifiesto = json.load(archivo)
+
+    proceso = None
+    carnets_previos = set(os.listdir(CARPETA_CARNETS)) if os.path.isdir(CARPETA_CARNETS) else set()
+    if args.url:
+        partes = urlsplit(args.url)
+        host, puerto, pid = partes.hostname, partes.port or 80, args.pid
+    else:
+        host, puerto = '127.0.0.1', args.puerto
+        proceso = iniciar_gunicorn(args, manifiesto)
+        pid = proceso.pid
+
+    resultados = {}
+    try:
+        esperar_servidor(host, puerto, proceso)
+        escenarios = Escenarios(manifiesto, obtener_tokens(Cliente(host, puerto), manifiesto), args.condicional)
+        for nombre in args.escenario or ESCENARIOS:
+            for clientes in args.clientes:
+                r = ejecutar(host, puerto, escenarios, nombre, clientes, args.segundos, pid)
+                resultados[f'{nombre}@{clientes}'] = r
+                memoria = f"  RSS {r['rss_max_kb'] / 1024:7.1f} MB" if 'rss_max_kb' in r else ''
+                print(f"{nombre:<14} {clientes:>3} clientes  {r['rendimiento_rps']:8.1f} rps  "
+                      f"p50 {r.get('p50_ms', 0):8.2f} ms  p99 {r.get('p99_ms', 0):8.2f} ms  "
+                      f"códigos {r['codigos']}{memoria}")
+    finally:
+        if proceso is not None:
+            proceso.send_signal(signal.SIGTERM)
+            try:
+                proceso.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                proceso.kill()
+            # Imágenes escritas por el escenario "generar"
+            if os.path.isdir(CARPETA_CARNETS):
+                for nombre in set(os.listdir(CARPETA_CARNETS)) - carnets_previos:
+                    os.remove(os.path.join(CARPETA_CARNETS, nombre))
+
+    if args.json:
+        parametros = {k: v for k, v in vars(args).items() if k != 'pid'}
+        parametros['conteos'] = manifiesto['conteos']
+        guardar_resultados(args.json, 'http', parametros, resultados)
+        print(f"Resultados en {args.json}")
+
+
+if __name__ == '__main__':
+    main()
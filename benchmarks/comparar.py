@@ -0,0 +1,56 @@
+"""
+Compara dos archivos de resultados (bench_micro.py o carga_http.py).
+
+Para cada caso presente en ambos muestra la mediana, el p99, el rendimiento y la
+memoria, con la variación porcentual de la corrida nueva respecto de la base.
+
+Uso:
+    python benchmarks/comparar.py resultados/antes.json resultados/despues.json
+"""
+import argparse
+import json
+
+# (métrica, etiqueta)
+METRICAS = (
+    ('p50_ms', 'p50 ms'),
+    ('p99_ms', 'p99 ms'),
+    ('rendimiento_rps', 'rps'),
+    ('operaciones_por_segundo', 'op/s'),
+    ('rss_max_kb', 'RSS KB'),
+)
+
+
+def variacion(base, nuevo):
+    if not base:
+        return ''
+    return f"{(nuevo - base) / base * 100:+6.1f}%"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('base')
+    parser.add_argument('nuevo')
+    args = parser.parse_args()
+
+    with open(args.base, encoding='utf-8') as archivo:
+        base = json.load(archivo)
+    with open(args.nuevo, encoding='utf-8') as archivo:
+        nuevo = json.load(archivo)
+    if base['tipo'] != nuevo['tipo']:
+        raise SystemExit(f"Los archivos son de tipos distintos: {base['tipo']} y {nuevo['tipo']}")
+
+    print(f"base:  {base['fecha']} (commit {base['commit']})")
+    print(f"nuevo: {nuevo['fecha']} (commit {nuevo['commit']})\n")
+    for caso in base['resultados']:
+        if caso not in nuevo['resultados']:
+            continue
+        antes, despues = base['resultados'][caso], nuevo['resultados'][caso]
+        columnas = []
+        for clave, etiqueta in METRICAS:
+            if clave in antes and clave in despues:
+                columnas.append(f"{etiqueta} {antes[clave]:>10} -> {despues[clave]:>10} {variacion(antes[clave], despues[clave])}")
+        print(f"{caso:<26} " + '  '.join(columnas))
+
+
+if __name__ == '__main__':
+    main()
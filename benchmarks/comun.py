@@ -0,0 +1,106 @@
+"""
+Utilidades comunes de los benchmarks: percentiles, memoria (RSS) y resultados en JSON.
+"""
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+
+RAIZ = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+
+def percentil(ordenados, p):
+    """Percentil p (0-100) de una lista ya ordenada, con interpolación lineal."""
+    if not ordenados:
+        return 0.0
+    posicion = (len(ordenados) - 1) * p / 100
+    inferior = int(posicion)
+    superior = min(inferior + 1, len(ordenados) - 1)
+    return ordenados[inferior] + (ordenados[superior] - ordenados[inferior]) * (posicion - inferior)
+
+
+def resumen_latencias(segundos):
+    """Resumen en ms de una lista de latencias en segundos."""
+    ordenados = sorted(s * 1000 for s in segundos)
+    if not ordenados:
+        return {'n': 0}
+    return {
+        'n': len(ordenados),
+        'media_ms': round(sum(ordenados) / len(ordenados), 3),
+        'min_ms': round(ordenados[0], 3),
+        'p50_ms': round(percentil(ordenados, 50), 3),
+        'p90_ms': round(percentil(ordenados, 90), 3),
+        'p95_ms': round(percentil(ordenados, 95), 3),
+        'p99_ms': round(percentil(ordenados, 99), 3),
+        'max_ms': round(ordenados[-1], 3),
+    }
+
+
+def rss_maximo_propio_kb():
+    """Pico de memoria residente de este proceso (KB en Linux)."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def rss_kb(pid):
+    """Memoria residente actual de un proceso (KB), leyendo /proc; 0 si no existe."""
+    try:
+        with open(f'/proc/{pid}/status') as archivo:
+            for linea in archivo:
+                if linea.startswith('VmRSS:'):
+                    return int(linea.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+def procesos_hijos(pid):
+    """PIDs de los hijos directos de un proceso (los workers de gunicorn)."""
+    hijos = []
+    for entrada in os.listdir('/proc'):
+        if not entrada.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entrada}/stat') as archivo:
+                # El nombre del proceso va entre paréntesis y puede tener espacios
+                campos = archivo.read().rsplit(')', 1)[1].split()
+        except OSError:
+            continue
+        if int(campos[1]) == pid:
+            hijos.append(int(entrada))
+    return hijos
+
+
+def rss_arbol_kb(pid):
+    """RSS del proceso y de sus hijos: (total, por proceso)."""
+    pids = [pid] + procesos_hijos(pid)
+    por_proceso = {p: rss_kb(p) for p in pids}
+    return sum(por_proceso.values()), por_proceso
+
+
+def commit_actual():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=RAIZ,
+                              capture_output=True, text=True, timeout=10).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def guardar_resultados(ruta, tipo, parametros, resultados):
+    """Escribe los resultados con lo necesario para comparar corridas (benchmarks/comparar.py)."""
+    documento = {
+        'tipo': tipo,
+        'fecha': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'commit': commit_actual(),
+        'python': sys.version.split()[0],
+        'plataforma': platform.platform(),
+        'cpus': os.cpu_count(),
+        'parametros': parametros,
+        'resultados': resultados,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(ruta)), exist_ok=True)
+    with open(ruta, 'w', encoding='utf-8') as archivo:
+        json.dump(documento, archivo, indent=2, ensure_ascii=False)
+    return documento
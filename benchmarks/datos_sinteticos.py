@@ -0,0 +1,224 @@
+"""
+Datos sintéticos para los benchmarks: una base SQLite con el mismo esquema que
+"Base de datos UNEXCA.db" (ESTUDIANTES, usuarios y carnets) a la escala pedida,
+fotos sintéticas y algunas imágenes de carnet ya generadas.
+
+Estructura de la carpeta de salida (se usa como directorio de trabajo del servidor):
+    unexca.db            base de datos
+    uploads/fotos/       almacén de fotos (las de los carnets registrados)
+    subidas/*.jpg        fotos para subir a /api/carnet/generar
+    carnets/*.png        imágenes de carnet a las que apuntan los registros
+    manifiesto.json      conteos, credenciales y cédulas de ejemplo
+
+Cada usuario tiene como contraseña su propia cédula; uno de cada ADMIN_CADA es admin.
+La tabla carnets se crea con el esquema de la base real (cedula UNIQUE) y pasa por
+la misma migración que hace la aplicación al arrancar (app.database.migrar_tabla_carnets).
+
+Uso (desde la raíz del proyecto):
+    python benchmarks/datos_sinteticos.py --estudiantes 100000 --salida /tmp/bench_unexca
+"""
+import argparse
+import json
+import os
+import random
+import sqlite3
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from PIL import Image, ImageDraw, ImageFilter
+
+CEDULA_INICIAL = 90_000_000
+ADMIN_CADA = 1000
+_LOTE_INSERCION = 50_000
+
+NOMBRES = ('Ana', 'Luis', 'María', 'José', 'Carmen', 'Pedro', 'Eber', 'Daniela', 'Andrés', 'Valentina',
+           'Carlos', 'Gabriela', 'Miguel', 'Sofía', 'Jesús', 'Rosa', 'Manuel', 'Isabel', 'David', 'Yorman')
+APELLIDOS = ('Pérez', 'González', 'Rodríguez', 'Hernández', 'García', 'Martínez', 'López', 'Díaz',
+             'Cordova', 'Ramírez', 'Torres', 'Rojas', 'Mendoza', 'Silva', 'Castillo', 'Márquez')
+CARRERAS = ('Informatica', 'Administracion', 'Turismo', 'Contaduria', 'Distribucion y Logistica')
+NUCLEOS = ('Altagracia', 'La Floresta', 'La Guaira', 'Urbina')
+TURNOS = ('matutino', 'vespertino', 'nocturno')
+PERIODOS = ('2024-I', '2024-II', '2025-I')
+
+ESQUEMA = (
+    'CREATE TABLE "ESTUDIANTES" ("cedula" INTEGER, "apellido" TEXT, "nombre" TEXT, "carrera" TEXT, '
+    '"seccion" INTEGER, "turno" TEXT, "periodo" TEXT, "nucleo" TEXT)',
+    'CREATE TABLE usuarios (id INTEGER PRIMARY KEY AUTOINCREMENT, cedula TEXT UNIQUE NOT NULL, '
+    'contrasena TEXT NOT NULL, rol TEXT NOT NULL)',
+    'CREATE TABLE carnets (cedula TEXT UNIQUE NOT NULL, id INTEGER PRIMARY KEY, fecha_emision NUMERIC, '
+    'fecha_vencimiento NUMERIC, ruta_imagen TEXT)',
+)
+
+
+def foto_sintetica(semilla, tam=(600, 800)):
+    """Retrato sintético: fondo degradado, silueta y algo de ruido (comprime como una foto real)."""
+    aleatorio = random.Random(semilla)
+    fondo = tuple(aleatorio.randrange(60, 200) for _ in range(3))
+    img = Image.linear_gradient('L').resize(tam).convert('RGB')
+    img = Image.blend(img, Image.new('RGB', tam, fondo), 0.6)
+    dibujo = ImageDraw.Draw(img)
+    piel = tuple(aleatorio.randrange(120, 230) for _ in range(3))
+    ancho, alto = tam
+    dibujo.ellipse((ancho * 0.3, alto * 0.15, ancho * 0.7, alto * 0.55), fill=piel)
+    dibujo.rectangle((ancho * 0.2, alto * 0.6, ancho * 0.8, alto), fill=tuple(aleatorio.randrange(0, 120) for _ in range(3)))
+    ruido = Image.effect_noise(tam, 25).convert('RGB')
+    return Image.blend(img, ruido, 0.15).filter(ImageFilter.SMOOTH)
+
+
+def filas_estudiantes(cantidad, aleatorio):
+    for i in range(cantidad):
+        yield (
+            CEDULA_INICIAL + i,
+            f'{aleatorio.choice(APELLIDOS)} {aleatorio.choice(APELLIDOS)}',
+            f'{aleatorio.choice(NOMBRES)} {aleatorio.choice(NOMBRES)}',
+            aleatorio.choice(CARRERAS),
+            10000 + aleatorio.randrange(300),
+            aleatorio.choice(TURNOS),
+            aleatorio.choice(PERIODOS),
+            aleatorio.choice(NUCLEOS),
+        )
+
+
+def insertar(conn, sql, filas):
+    lote = []
+    for fila in filas:
+        lote.append(fila)
+        if len(lote) >= _LOTE_INSERCION:
+            conn.executemany(sql, lote)
+            lote.clear()
+    if lote:
+        conn.executemany(sql, lote)
+
+
+def crear_base(ruta, estudiantes, proporcion_usuarios, proporcion_carnets, rutas_carnets, hashes_fotos, semilla=1):
+    """Crea la base sintética. Devuelve los conteos por tabla."""
+    if os.path.exists(ruta):
+        os.remove(ruta)
+    aleatorio = random.Random(semilla)
+    conn = sqlite3.connect(ruta)
+    # Carga masiva: sin diario ni fsync; los índices se crean al final
+    conn.execute('PRAGMA journal_mode = OFF')
+    conn.execute('PRAGMA synchronous = OFF')
+    for sentencia in ESQUEMA:
+        conn.execute(sentencia)
+    conn.commit()
+    from app.database import migrar_tabla_carnets
+    migrar_tabla_carnets(conn)
+
+    insertar(conn, 'INSERT INTO ESTUDIANTES VALUES (?, ?, ?, ?, ?, ?, ?, ?)', filas_estudiantes(estudiantes, aleatorio))
+
+    con_usuario = int(estudiantes * proporcion_usuarios)
+    insertar(conn, 'INSERT INTO usuarios (cedula, contrasena, rol) VALUES (?, ?, ?)', (
+        (str(CEDULA_INICIAL + i), str(CEDULA_INICIAL + i), 'admin' if i % ADMIN_CADA == 0 else 'estudiante')
+        for i in range(con_usuario)
+    ))
+
+    con_carnet = int(estudiantes * proporcion_carnets)
+    hoy = datetime.utcnow()
+
+    def carnets():
+        for i in range(con_carnet):
+            emision = hoy - timedelta(days=aleatorio.randrange(365), seconds=aleatorio.randrange(86400))
+            yield (
+                str(CEDULA_INICIAL + i),
+                emision.strftime('%Y-%m-%d %H:%M:%S.%f'),
+                (emision + timedelta(days=360)).strftime('%Y-%m-%d %H:%M:%S.%f'),
+                rutas_carnets[i % len(rutas_carnets)],
+                hashes_fotos[i % len(hashes_fotos)],
+            )
+    insertar(conn, 'INSERT INTO carnets (cedula, fecha_emision, fecha_vencimiento, ruta_imagen, foto_hash) '
+                   'VALUES (?, ?, ?, ?, ?)', carnets())
+    conn.commit()
+
+    # Los mismos índices que crea la aplicación al arrancar
+    from app.database import INDICES
+    for nombre, tabla, columnas in INDICES:
+        conn.execute(f'CREATE INDEX IF NOT EXISTS {nombre} ON "{tabla}" {columnas}')
+    conn.execute('ANALYZE')
+    conn.commit()
+    conn.execute('PRAGMA journal_mode = WAL')
+    conn.close()
+    return {'estudiantes': estudiantes, 'usuarios': con_usuario, 'carnets': con_carnet}
+
+
+def crear_fotos(salida, cantidad):
+    """Fotos para subir (JPEG) y las mismas ya normalizadas en el almacén. Devuelve (rutas jpg, hashes)."""
+    from app.services.card_generator.photo_store import AlmacenFotos
+
+    carpeta_subidas = os.path.join(salida, 'subidas')
+    os.makedirs(carpeta_subidas, exist_ok=True)
+    almacen = AlmacenFotos(os.path.join(salida, 'uploads', 'fotos'))
+    subidas, hashes = [], []
+    for i in range(cantidad):
+        ruta = os.path.join(carpeta_subidas, f'foto_{i:03d}.jpg')
+        foto_sintetica(i).save(ruta, format='JPEG', quality=88)
+        subidas.append(ruta)
+        with open(ruta, 'rb') as origen:
+            hashes.append(os.path.splitext(os.path.basename(almacen.guardar(origen)))[0])
+    return subidas, hashes
+
+
+def crear_carnets(salida, fotos_almacen, cantidad):
+    """Renderiza algunas imágenes de carnet (los registros las comparten de forma cíclica)."""
+    from app.services.card_generator.carnet_service import CarnetGenerator
+
+    generador = CarnetGenerator()
+    generador.carnets_dir = os.path.join(salida, 'carnets')
+    os.makedirs(generador.carnets_dir, exist_ok=True)
+    rutas = []
+    for i in range(cantidad):
+        rutas.append(os.path.abspath(generador._generar_imagen(
+            nombre=NOMBRES[i % len(NOMBRES)], apellidos=APELLIDOS[i % len(APELLIDOS)],
+            cedula=f'muestra{i:03d}', foto=fotos_almacen[i % len(fotos_almacen)], rol='ESTUDIANTE',
+            carrera=CARRERAS[i % len(CARRERAS)], vence='01/01/2030'
+        )))
+    return rutas
+
+
+def generar(salida, estudiantes, proporcion_usuarios=1.0, proporcion_carnets=0.5, fotos=20, imagenes=10, semilla=1):
+    # Que la aplicación nunca abra la base real mientras se importan sus módulos
+    os.environ['DB_PATH'] = os.path.abspath(os.path.join(salida, 'unexca.db'))
+    os.makedirs(salida, exist_ok=True)
+    from app.services.card_generator.photo_store import AlmacenFotos
+
+    inicio = time.perf_counter()
+    subidas, hashes = crear_fotos(salida, fotos)
+    almacen = AlmacenFotos(os.path.join(salida, 'uploads', 'fotos'))
+    rutas_carnets = crear_carnets(salida, [almacen.ruta(h) for h in hashes], imagenes)
+    ruta_base = os.path.join(salida, 'unexca.db')
+    conteos = crear_base(ruta_base, estudiantes, proporcion_usuarios, proporcion_carnets, rutas_carnets, hashes, semilla)
+
+    manifiesto = {
+        'base': os.path.abspath(ruta_base),
+        'conteos': conteos,
+        'cedula_inicial': CEDULA_INICIAL,
+        'admin_cada': ADMIN_CADA,
+        'contrasena': 'la cédula',
+        'fotos_subida': [os.path.abspath(r) for r in subidas],
+        'segundos': round(time.perf_counter() - inicio, 2),
+    }
+    with open(os.path.join(salida, 'manifiesto.json'), 'w', encoding='utf-8') as archivo:
+        json.dump(manifiesto, archivo, indent=2, ensure_ascii=False)
+    return manifiesto
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--salida', default='/tmp/bench_unexca')
+    parser.add_argument('--estudiantes', type=int, default=10000)
+    parser.add_argument('--usuarios', type=float, default=1.0, help='Proporción de estudiantes con usuario')
+    parser.add_argument('--carnets', type=float, default=0.5, help='Proporción de estudiantes con carnet')
+    parser.add_argument('--fotos', type=int, default=20, help='Fotos sintéticas distintas')
+    parser.add_argument('--imagenes', type=int, default=10, help='Imágenes de carnet distintas')
+    parser.add_argument('--semilla', type=int, default=1)
+    args = parser.parse_args()
+
+    manifiesto = generar(args.salida, args.estudiantes, args.usuarios, args.carnets, args.fotos, args.imagenes, args.semilla)
+    print(json.dumps(manifiesto['conteos']), f"en {manifiesto['segundos']} s -> {args.salida}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+# gunicorn.conf.py
+"""
+Configuración de gunicorn (se lee sola desde el directorio de trabajo: gunicorn run:app).
+
+Con preload_app el máster construye la aplicación una sola vez, junto con los
+generadores de PDF e imágenes (PRECARGAR_RENDER), y los workers la heredan al hacer
+fork: un worker nuevo o reemplazado no vuelve a importar nada y las páginas de esos
+módulos quedan compartidas entre procesos (copy-on-write). GUNICORN_PRELOAD=0 vuelve
+al arranque por worker, con los generadores cargados en la primera solicitud.
+
+El número de workers y el puerto se toman de WEB_CONCURRENCY y PORT, como siempre.
+Tiempos de arranque: /api/metricas (clave "arranque") y benchmarks/bench_arranque.py.
+
+Cada worker publica sus métricas en METRICAS_DIR (por defecto una carpeta temporal
+de esta ejecución) y /api/metricas las suma (services/metrics.py).
+"""
+import gc
+import os
+import tempfile
+
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1') == '1'
+if preload_app:
+    os.environ.setdefault('PRECARGAR_RENDER', '1')
+os.environ.setdefault('METRICAS_DIR', os.path.join(tempfile.gettempdir(), f'unexca-metricas-{os.getpid()}'))
+
+
+def on_starting(server):
+    # Las métricas de una ejecución anterior no se suman a las de esta
+    from app.services.metrics import limpiar_carpeta
+    limpiar_carpeta(os.environ['METRICAS_DIR'])
+
+
+def when_ready(server):
+    # Lo que cargó el máster no vuelve a recorrerlo el GC de los workers
+    # (recorrerlo escribe en esas páginas y deja de compartirlas)
+    if preload_app:
+        gc.freeze()
+
+
+def post_fork(server, worker):
+    if preload_app:
+        from app.database import descartar_conexiones
+        descartar_conexiones(server.app.wsgi())